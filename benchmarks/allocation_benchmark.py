@@ -0,0 +1,94 @@
+"""Per-call allocation profile of the hot lookup-table functions
+
+Imports a version of the backend module and, for each function below, reports the
+median peak traced memory of one call (tracemalloc, measured from just before the
+call) and the mean wall time per call without tracing. Every function is warmed up
+first so caches and lazily built tables are not counted.
+
+- build_open_meteo_weather on a fixed seven-day Open-Meteo payload
+- get_kenya_market_prices, detect_crop_disease_ai (no image), get_real_time_market_prices
+
+To compare with the tree before the tables were frozen, profile that version of the
+module from the repository root:
+
+    git show 6c57564^:smart_farmer_kenya.py > smart_farmer_before.py
+    python benchmarks/allocation_benchmark.py --module smart_farmer_before.py
+    python benchmarks/allocation_benchmark.py [--calls 500]
+"""
+import argparse
+import importlib.util
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("SMART_FARMER_USER_STORE", "memory")
+os.environ.setdefault("SMART_FARMER_PRICE_STORE_PATH", "")
+
+OPEN_METEO_PAYLOAD = {
+    "current": {
+        "temperature_2m": 24.3, "relative_humidity_2m": 71, "precipitation": 0.4, "weather_code": 61,
+        "wind_speed_10m": 11.2, "wind_direction_10m": 140, "pressure_msl": 1014.2
+    },
+    "daily": {
+        "time": [f"2024-04-{day:02d}" for day in range(1, 8)],
+        "weather_code": [61, 63, 3, 2, 80, 95, 1],
+        "temperature_2m_max": [26.1, 25.4, 27.0, 27.8, 25.9, 24.7, 26.5],
+        "temperature_2m_min": [14.2, 14.8, 13.9, 14.1, 15.0, 15.2, 14.4],
+        "precipitation_sum": [4.2, 12.5, 0.0, 0.0, 6.1, 18.3, 0.2],
+        "wind_speed_10m_max": [14.1, 16.3, 10.2, 9.8, 12.7, 20.5, 11.0]
+    }
+}
+
+def load_module(path):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+    spec = importlib.util.spec_from_file_location("smart_farmer_profiled", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def profile(function, calls):
+    """(median peak bytes per call, mean microseconds per call)"""
+    for _ in range(20):
+        function()
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        function()
+    wall = (time.perf_counter() - started) / calls * 1e6
+
+    peaks = []
+    tracemalloc.start()
+    for _ in range(calls):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        function()
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return statistics.median(peaks), wall
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default=os.path.join(ROOT, "smart_farmer_kenya.py"), help="Backend module to profile")
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+
+    app = load_module(args.module)
+    cases = [
+        ("build_open_meteo_weather", lambda: app.build_open_meteo_weather(OPEN_METEO_PAYLOAD, -0.30, 36.07)),
+        ("get_kenya_market_prices", lambda: app.get_kenya_market_prices("Maize", "Nakuru")),
+        ("detect_crop_disease_ai", lambda: app.detect_crop_disease_ai("Maize")),
+        ("get_real_time_market_prices", lambda: app.get_real_time_market_prices("Maize", "Nakuru")),
+    ]
+
+    print(f"module: {args.module} | {args.calls} calls each")
+    print(f"{'function':<30} {'peak B/call':>12} {'us/call':>9}")
+    for name, function in cases:
+        peak, wall = profile(function, args.calls)
+        print(f"{name:<30} {peak:>12.0f} {wall:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Microbenchmark for coordinate -> county lookup
+
+Times the original get_county_from_coords (ten hard-coded boxes, copied below from the
+baseline tree) against the CountyIndex behind the current get_county_from_coords and
+the vectorized get_counties_from_coords, on the same random points inside Kenya's
+bounding box. The built-in index is 47 overlapping boxes resolved by priority, so the
+"resolved" column counts points given a county, not points given the right one.
+
+    python benchmarks/county_lookup_benchmark.py [--points 100000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("SMART_FARMER_USER_STORE", "memory")
+os.environ.setdefault("SMART_FARMER_PRICE_STORE_PATH", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import smart_farmer_kenya as app
+
+def baseline_get_county_from_coords(lat, lng):
+    """get_county_from_coords as it was before the spatial index"""
+    county_coordinates = {
+        "Nairobi": {"lat_range": (-1.45, -1.15), "lng_range": (36.65, 37.05)},
+        "Kiambu": {"lat_range": (-1.30, -0.80), "lng_range": (36.50, 37.20)},
+        "Nakuru": {"lat_range": (-0.90, 0.10), "lng_range": (35.50, 36.50)},
+        "Kisumu": {"lat_range": (-0.30, 0.30), "lng_range": (34.50, 35.20)},
+        "Mombasa": {"lat_range": (-4.20, -3.90), "lng_range": (39.50, 39.80)},
+        "Machakos": {"lat_range": (-1.80, -1.20), "lng_range": (37.10, 37.60)},
+        "Meru": {"lat_range": (-0.50, 0.50), "lng_range": (37.50, 38.20)},
+        "Kakamega": {"lat_range": (0.10, 0.60), "lng_range": (34.50, 35.10)},
+        "Uasin Gishu": {"lat_range": (0.30, 0.80), "lng_range": (35.10, 35.60)},
+        "Kericho": {"lat_range": (-0.50, 0.00), "lng_range": (35.00, 35.50)},
+    }
+
+    for county, ranges in county_coordinates.items():
+        if (ranges["lat_range"][0] <= lat <= ranges["lat_range"][1] and
+            ranges["lng_range"][0] <= lng <= ranges["lng_range"][1]):
+            return county
+
+    if -1.5 <= lat <= -1.0 and 36.5 <= lng <= 37.0:
+        return "Nairobi"
+    elif -1.0 <= lat <= 0.5 and 36.0 <= lng <= 37.0:
+        return "Kiambu"
+    elif -0.5 <= lat <= 0.5 and 35.0 <= lng <= 36.0:
+        return "Nakuru"
+    elif -0.5 <= lat <= 0.5 and 34.5 <= lng <= 35.5:
+        return "Kisumu"
+    elif -4.5 <= lat <= -3.5 and 39.0 <= lng <= 40.0:
+        return "Mombasa"
+
+    return "Other"
+
+def random_points(count, seed):
+    rng = random.Random(seed)
+    return [(rng.uniform(-4.7, 5.0), rng.uniform(33.9, 42.0)) for _ in range(count)]
+
+def best_of(repeat, function):
+    """Fastest wall time over repeat runs, and the last run's result"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    points = random_points(args.points, args.seed)
+    cases = [
+        ("baseline get_county_from_coords", lambda: [baseline_get_county_from_coords(lat, lng) for lat, lng in points]),
+        ("get_county_from_coords", lambda: [app.get_county_from_coords(lat, lng) for lat, lng in points]),
+        ("get_counties_from_coords", lambda: app.get_counties_from_coords(points)),
+    ]
+
+    print(f"{args.points} points, best of {args.repeat} | county index: {app.county_index.source}")
+    print(f"{'lookup':<34} {'total ms':>10} {'us/point':>9} {'resolved':>9} {'counties':>9}")
+    for name, function in cases:
+        elapsed, counties = best_of(args.repeat, function)
+        resolved = sum(1 for county in counties if county != "Other")
+        print(f"{name:<34} {elapsed * 1000:>10.1f} {elapsed / len(points) * 1e6:>9.2f} {resolved / len(points):>8.1%} {len(set(counties) - {'Other'}):>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Load test for the concurrent HTTP server
+
+Starts SmartFarmerHTTPServer in-process on a free port and drives mixed traffic
+(GET /kenya/counties, POST /market/prices, POST /weather/forecast, POST /crop/detect)
+from 1, 8 and 64 keep-alive clients, reporting p50/p99 latency and status counts.
+Weather upstream calls are replaced by a fixed sleep so results do not depend on
+the network. A second scenario parks one idle keep-alive connection per worker and
+times a fresh client, which must not wait for the idle connections to time out.
+
+    python benchmarks/load_test.py [--workers 32] [--clients 1,8,64] [--upstream-delay 0.2]
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault("SMART_FARMER_USER_STORE", "memory")
+os.environ.setdefault("SMART_FARMER_PRICE_STORE_PATH", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import smart_farmer_kenya as app
+
+def simulated_weather(delay):
+    def get_real_time_weather(lat, lng):
+        time.sleep(delay)
+        return app.get_mock_kenya_weather(lat, lng)
+    return get_real_time_weather
+
+def start_server(workers, queue_size):
+    server = app.SmartFarmerHTTPServer(("127.0.0.1", 0), app.SmartFarmerKenyaHandler, workers=workers, queue_size=queue_size)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+def login(port):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    connection.request("POST", "/login", json.dumps({"username": "farmer", "password": "password123"}), {"Content-Type": "application/json"})
+    token = json.loads(connection.getresponse().read())["token"]
+    connection.close()
+    return token
+
+def mixed_requests(token):
+    auth = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    return [
+        ("GET", "/kenya/counties", None, {}),
+        ("POST", "/market/prices", json.dumps({"crop": "Maize", "county": "Nakuru"}), auth),
+        ("POST", "/weather/forecast", json.dumps({"latitude": -0.30, "longitude": 36.07}), auth),
+        ("POST", "/crop/detect", json.dumps({"crop_type": "Maize"}), auth),
+    ]
+
+def run_client(port, requests_to_send, latencies, statuses, lock):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    for method, path, body, headers in requests_to_send:
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+            if response.getheader("Connection", "").lower() == "close":
+                connection.close()
+        except (OSError, http.client.HTTPException):
+            status = "error"
+            connection.close()
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+    connection.close()
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def mixed_traffic(port, token, clients, per_client):
+    plan = mixed_requests(token)
+    latencies, statuses, lock = [], {}, threading.Lock()
+    threads = []
+    for index in range(clients):
+        sequence = [plan[(index + step) % len(plan)] for step in range(per_client)]
+        threads.append(threading.Thread(target=run_client, args=(port, sequence, latencies, statuses, lock)))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    return percentile(latencies, 0.5), percentile(latencies, 0.99), len(latencies) / wall, statuses
+
+def idle_keepalive(port, idle_count):
+    """Park idle_count keep-alive connections, then time one new client"""
+    idle = []
+    for _ in range(idle_count):
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        connection.request("GET", "/kenya/counties")
+        connection.getresponse().read()
+        idle.append(connection)
+    time.sleep(0.2)
+
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    started = time.perf_counter()
+    connection.request("GET", "/kenya/counties")
+    connection.getresponse().read()
+    elapsed = (time.perf_counter() - started) * 1000
+    for item in idle + [connection]:
+        item.close()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=app.SERVER_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=app.SERVER_QUEUE_SIZE)
+    parser.add_argument("--clients", default="1,8,64", help="Comma-separated client counts")
+    parser.add_argument("--requests-per-client", type=int, default=8)
+    parser.add_argument("--upstream-delay", type=float, default=0.2, help="Seconds each simulated weather call takes")
+    args = parser.parse_args()
+
+    app.get_real_time_weather = simulated_weather(args.upstream_delay)
+    app.market_analytics.current()  # Build today's indicators before timing
+    server, port = start_server(args.workers, args.queue_size)
+    token = login(port)
+
+    print(f"workers={args.workers} queue={args.queue_size} upstream={args.upstream_delay * 1000:.0f} ms")
+    print(f"{'clients':>8} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>8}  statuses")
+    for clients in [int(value) for value in args.clients.split(",")]:
+        p50, p99, throughput, statuses = mixed_traffic(port, token, clients, args.requests_per_client)
+        print(f"{clients:>8} {p50:>9.1f} {p99:>9.1f} {throughput:>8.1f}  {statuses}")
+
+    elapsed = idle_keepalive(port, args.workers)
+    print(f"\nnew client with {args.workers} idle keep-alive connections open: {elapsed:.1f} ms")
+    print(f"server: {server.stats()}")
+    server.shutdown()
+    server.server_close()
+
+if __name__ == "__main__":
+    main()
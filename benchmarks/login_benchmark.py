@@ -0,0 +1,134 @@
+"""Login throughput benchmark for the credential pool
+
+Three measurements:
+
+- per scheme: verify_password in a loop on one thread for --seconds, as logins/s/core,
+  for scrypt and PBKDF2-SHA256 at the configured costs
+- pool scaling: the same scrypt verifications from 1..N threads at once; hashlib
+  releases the GIL, so throughput should grow with threads up to the core count
+- hot path: an in-process SmartFarmerHTTPServer under --logins concurrent POST /login
+  calls, timing GET /kenya/counties against the idle server
+
+    python benchmarks/login_benchmark.py [--seconds 3] [--logins 40]
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault("SMART_FARMER_USER_STORE", "memory")
+os.environ.setdefault("SMART_FARMER_PRICE_STORE_PATH", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import smart_farmer_kenya as app
+
+PASSWORD = "bench-password-1"
+
+def stored_hash(scheme):
+    """An encoded hash of PASSWORD made with scheme at its configured cost"""
+    configured = app.PASSWORD_SCHEME
+    app.PASSWORD_SCHEME = scheme
+    try:
+        return app.hash_password(PASSWORD)
+    finally:
+        app.PASSWORD_SCHEME = configured
+
+def verify_loop(stored, seconds, counts, index):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        matches, _ = app.verify_password(PASSWORD, stored)
+        assert matches
+        counts[index] += 1
+
+def threaded_rate(stored, threads, seconds):
+    counts = [0] * threads
+    workers = [threading.Thread(target=verify_loop, args=(stored, seconds, counts, index)) for index in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(counts) / (time.perf_counter() - started)
+
+def request(port, method, path, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    connection.request(method, path, json.dumps(body) if body is not None else None, {"Content-Type": "application/json"})
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response.status
+
+def counties_latencies(port, count):
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        request(port, "GET", "/kenya/counties")
+        latencies.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.01)
+    return sorted(latencies)
+
+def hot_path(logins):
+    server = app.SmartFarmerHTTPServer(("127.0.0.1", 0), app.SmartFarmerKenyaHandler, workers=max(logins + 8, app.SERVER_WORKERS))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    request(port, "POST", "/register", {"username": "bench-login", "password": PASSWORD, "county": "Nakuru"})
+
+    idle = counties_latencies(port, 50)
+
+    stop = threading.Event()
+    completed = [0]
+
+    def login_loop():
+        while not stop.is_set():
+            request(port, "POST", "/login", {"username": "bench-login", "password": PASSWORD})
+            completed[0] += 1
+
+    clients = [threading.Thread(target=login_loop, daemon=True) for _ in range(logins)]
+    started = time.perf_counter()
+    for client in clients:
+        client.start()
+    time.sleep(0.5)
+    busy = counties_latencies(port, 50)
+    stop.set()
+    for client in clients:
+        client.join()
+    rate = completed[0] / (time.perf_counter() - started)
+
+    server.shutdown()
+    server.server_close()
+    return idle, busy, rate
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=3.0, help="Duration of each verification loop")
+    parser.add_argument("--logins", type=int, default=40, help="Concurrent login clients in the hot-path case")
+    args = parser.parse_args()
+    cores = os.cpu_count() or 1
+
+    print(f"cores={cores} credential workers={app.CREDENTIAL_WORKERS} default scheme={app.PASSWORD_SCHEME}")
+    print(f"scrypt n={app.SCRYPT_COST} r={app.SCRYPT_BLOCK_SIZE} p={app.SCRYPT_PARALLELISM} | pbkdf2_sha256 {app.PBKDF2_ITERATIONS} iterations\n")
+
+    print(f"{'scheme':<16} {'logins/s/core':>14} {'ms each':>9}")
+    for scheme in app.PASSWORD_SCHEMES:
+        rate = threaded_rate(stored_hash(scheme), 1, args.seconds)
+        print(f"{scheme:<16} {rate:>14.1f} {1000 / rate:>9.1f}")
+
+    print(f"\n{'threads':>7} {'logins/s':>9} {'per thread':>11}  (scrypt)")
+    stored = stored_hash("scrypt")
+    threads = 1
+    while True:
+        rate = threaded_rate(stored, threads, args.seconds)
+        print(f"{threads:>7} {rate:>9.1f} {rate / threads:>11.1f}")
+        if threads >= cores:
+            break
+        threads = min(threads * 2, cores)
+
+    idle, busy, rate = hot_path(args.logins)
+    print(f"\nGET /kenya/counties idle: median {idle[len(idle) // 2]:.1f} ms, max {idle[-1]:.1f} ms")
+    print(f"GET /kenya/counties with {args.logins} concurrent logins ({rate:.1f} logins/s): median {busy[len(busy) // 2]:.1f} ms, max {busy[-1]:.1f} ms")
+
+if __name__ == "__main__":
+    main()
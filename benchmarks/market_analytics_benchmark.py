@@ -0,0 +1,87 @@
+"""Full-recompute benchmark for market analytics
+
+Fills an in-memory PriceStore with synthetic observed daily prices for 47 counties x 20
+crops x 5 years (the catalog's market crops, padded with synthetic names to --crops),
+swaps it in for the app's store, and times:
+
+- MarketAnalytics.current() recomputes: building the price matrix and computing every
+  indicator in one NumPy pass, forced each run by bumping the store version
+- cached reads: MarketAnalytics.indicators() for one pair and lookup() for a whole
+  crops x counties grid, both served from the day's snapshot
+
+    python benchmarks/market_analytics_benchmark.py [--crops 20] [--years 5] [--runs 5]
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+os.environ.setdefault("SMART_FARMER_USER_STORE", "memory")
+os.environ.setdefault("SMART_FARMER_PRICE_STORE_PATH", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import smart_farmer_kenya as app
+
+def synthetic_store(crops, counties, days, seed):
+    """PriceStore with one observed random-walk series per crop and county, ending today"""
+    rng = np.random.default_rng(seed)
+    store = app.PriceStore(None)
+    today = app.price_day(datetime.date.today())
+    day = np.arange(today - days + 1, today + 1, dtype=np.int32)
+    season = 1 + 0.15 * np.sin(2 * np.pi * day / 365.25)
+    for crop in crops:
+        base = rng.uniform(50, 5000)
+        for county in counties:
+            walk = np.exp(np.cumsum(rng.normal(0, 0.01, days)))
+            series = app.PriceSeries("observed", capacity=days)
+            series.extend(day, base * season * walk, rng.uniform(10, 500, days))
+            store.series_by_key[(crop, county)] = series
+    return store
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--crops", type=int, default=20)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    counties = list(app.kenya_counties())
+    crops = sorted(app.current_catalog().market_crops)[:args.crops]
+    crops += [f"Synthetic crop {index}" for index in range(args.crops - len(crops))]
+    days = args.years * 365 + 1
+
+    started = time.perf_counter()
+    app.price_store = synthetic_store(crops, counties, days, args.seed)
+    generated = time.perf_counter() - started
+    analytics = app.MarketAnalytics(days)
+
+    print(f"{len(counties)} counties x {len(crops)} crops x {days} days ({len(counties) * len(crops) * days:,} prices, generated in {generated:.1f}s)")
+    print(f"{'run':>4} {'series':>7} {'matrix MB':>10} {'build ms':>9} {'compute ms':>11} {'total ms':>9}")
+    for run in range(1, args.runs + 1):
+        app.price_store.version += 1  # New snapshot key, so current() recomputes
+        started = time.perf_counter()
+        snapshot = analytics.current()
+        total = (time.perf_counter() - started) * 1000
+        print(f"{run:>4} {snapshot['series']:>7} {snapshot['matrix_bytes'] / 1e6:>10.1f} {snapshot['build_ms']:>9.1f} {snapshot['compute_ms']:>11.1f} {total:>9.1f}")
+
+    pairs = [(crop, county) for crop in crops for county in counties]
+    repeat = 2000
+    started = time.perf_counter()
+    for index in range(repeat):
+        analytics.indicators(*pairs[index % len(pairs)])
+    single = (time.perf_counter() - started) / repeat * 1e6
+
+    started = time.perf_counter()
+    for _ in range(20):
+        analytics.lookup(pairs)
+    grid = (time.perf_counter() - started) / 20 * 1000
+
+    print(f"\ncached indicators() for one pair: {single:.1f} us")
+    print(f"cached lookup() for all {len(pairs)} pairs: {grid:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Serialization microbenchmark on real dashboard payloads
+
+Starts SmartFarmerHTTPServer in-process, registers farms in a few counties and records
+the exact payloads send_json_response hands to serialize_json for their GET /dashboard
+calls. Each payload is then encoded with orjson (the options serialize_json uses) and
+with the stdlib fallback (json.dumps + encode), and the best time of each is reported
+along with the encoded size. Weather and soil come from whatever the upstreams return
+here, or their fallbacks when the network is unavailable; either way they are the
+payloads the server sends.
+
+    python benchmarks/serialization_benchmark.py [--repeat 2000]
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault("SMART_FARMER_USER_STORE", "memory")
+os.environ.setdefault("SMART_FARMER_PRICE_STORE_PATH", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import smart_farmer_kenya as app
+
+FARMS = [
+    ("farmer", None),
+    ("bench-nakuru", {"county": "Nakuru", "coordinates": {"lat": -0.30, "lng": 36.07}, "crops": ["Maize", "Potatoes"]}),
+    ("bench-kericho", {"county": "Kericho", "coordinates": {"lat": -0.37, "lng": 35.28}, "crops": ["Tea", "Maize"]}),
+    ("bench-mombasa", {"county": "Mombasa", "coordinates": {"lat": -4.04, "lng": 39.67}, "crops": ["Mango", "Cassava"]}),
+]
+PASSWORD = "bench-password-1"
+
+def stdlib_serialize(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=app.json_default).encode("utf-8")
+
+def orjson_serialize(data):
+    return app.orjson.dumps(data, default=app.json_default, option=app.orjson.OPT_NON_STR_KEYS | app.orjson.OPT_SERIALIZE_NUMPY)
+
+def request(port, method, path, body=None, token=None):
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    return response.status, data
+
+def capture_dashboards():
+    """Serve one /dashboard per farm and return the payload dicts as the handler built them"""
+    recorded = []
+    serialize = app.serialize_json
+
+    def recording_serialize(data):
+        recorded.append(data)
+        return serialize(data)
+
+    server = app.SmartFarmerHTTPServer(("127.0.0.1", 0), app.SmartFarmerKenyaHandler, workers=4)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    payloads = {}
+    try:
+        for username, profile in FARMS:
+            password = "password123" if profile is None else PASSWORD
+            if profile is not None:
+                request(port, "POST", "/register", {"username": username, "password": password, **profile})
+            token = json.loads(request(port, "POST", "/login", {"username": username, "password": password})[1])["token"]
+
+            app.serialize_json = recording_serialize
+            try:
+                status, _ = request(port, "GET", "/dashboard", token=token)
+            finally:
+                app.serialize_json = serialize
+            if status == 200:
+                payloads[username] = recorded[-1]
+    finally:
+        server.shutdown()
+        server.server_close()
+    return payloads
+
+def best_of(repeat, function, data):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(data)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    payloads = capture_dashboards()
+    serializers = [("json", stdlib_serialize)]
+    if app.orjson is not None:
+        serializers.insert(0, ("orjson", orjson_serialize))
+    else:
+        print("orjson is not installed; timing the stdlib serializer only")
+
+    print(f"active serializer: {app.JSON_SERIALIZER} | best of {args.repeat}")
+    print(f"{'payload':<16} {'bytes':>8}" + "".join(f" {name + ' us':>11}" for name, _ in serializers) + (f" {'speedup':>8}" if len(serializers) > 1 else ""))
+    for name, payload in payloads.items():
+        size = len(stdlib_serialize(payload))
+        timings = [best_of(args.repeat, function, payload) for _, function in serializers]
+        row = f"{name:<16} {size:>8}" + "".join(f" {timing * 1e6:>11.1f}" for timing in timings)
+        if len(timings) > 1:
+            row += f" {timings[1] / timings[0]:>7.1f}x"
+        print(row)
+
+if __name__ == "__main__":
+    main()
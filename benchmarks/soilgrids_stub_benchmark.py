@@ -0,0 +1,122 @@
+"""SoilGrids fan-out benchmark against a local stub
+
+Runs a stub SoilGrids server on a free port that answers every property query after a
+fixed delay (400 ms by default), and points the app's outbound requests at it. Times
+one soil lookup three ways:
+
+- sequential: the pre-fan-out loop, one fetch_soilgrids_property call per property
+- parallel: fetch_soilgrids_properties, all properties at once under SOILGRIDS_DEADLINE
+- deadline: fetch_soilgrids_properties with one property stalled past a short deadline
+
+    python benchmarks/soilgrids_stub_benchmark.py [--delay 0.4] [--repeat 3]
+"""
+import argparse
+import http.server
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+os.environ.setdefault("SMART_FARMER_USER_STORE", "memory")
+os.environ.setdefault("SMART_FARMER_PRICE_STORE_PATH", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import smart_farmer_kenya as app
+
+SOILGRIDS_ORIGIN = "https://rest.isric.org"
+STUB_VALUES = {"phh2o": 6.1, "soc": 1.8, "clay": 32, "sand": 38, "silt": 30, "nitrogen": 0.15, "cec": 14, "bdod": 1.25}
+
+class StubSoilGridsHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay = 0.4
+    stalled = {}  # property -> extra seconds before answering
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        prop = query.get("property", [""])[0]
+        time.sleep(self.delay + self.stalled.get(prop, 0))
+        body = json.dumps({"properties": [{
+            "name": prop,
+            "depths": [{"layers": [{"values": {"mean": STUB_VALUES.get(prop)}}]}]
+        }]}).encode("utf-8")
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client gave up on a stalled property
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub(delay):
+    StubSoilGridsHandler.delay = delay
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubSoilGridsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def redirect_outbound(stub_origin):
+    """Send the app's SoilGrids requests to the stub through the real shared session"""
+    http_get = app.http_get
+
+    def stub_http_get(url, timeout=10, **kwargs):
+        return http_get(url.replace(SOILGRIDS_ORIGIN, stub_origin, 1), timeout=timeout, **kwargs)
+
+    app.http_get = stub_http_get
+
+def sequential_lookup(lat, lng):
+    all_properties = {}
+    for prop in app.SOILGRIDS_PROPERTIES:
+        value = app.fetch_soilgrids_property(lat, lng, prop, app.SOILGRIDS_DEPTH)
+        if value is not None:
+            all_properties[f"{prop}_{app.SOILGRIDS_DEPTH}"] = value
+    return all_properties
+
+def best_of(repeat, function):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--delay", type=float, default=0.4, help="Seconds the stub takes per property query")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--deadline", type=float, default=1.0, help="SOILGRIDS_DEADLINE for the deadline case")
+    args = parser.parse_args()
+
+    server, origin = start_stub(args.delay)
+    redirect_outbound(origin)
+    lat, lng = -0.30, 36.07
+
+    print(f"{len(app.SOILGRIDS_PROPERTIES)} properties | stub delay {args.delay * 1000:.0f} ms | outbound workers {app.OUTBOUND_WORKERS}")
+    print(f"{'case':<12} {'wall ms':>9} {'properties':>11}")
+    sequential, result = best_of(args.repeat, lambda: sequential_lookup(lat, lng))
+    print(f"{'sequential':<12} {sequential * 1000:>9.0f} {len(result):>11}")
+    parallel, result = best_of(args.repeat, lambda: app.fetch_soilgrids_properties(lat, lng))
+    print(f"{'parallel':<12} {parallel * 1000:>9.0f} {len(result):>11}")
+
+    # One property stalls well past the deadline; the lookup returns the rest on time
+    StubSoilGridsHandler.stalled = {"nitrogen": args.deadline * 3}
+    deadline = app.SOILGRIDS_DEADLINE
+    app.SOILGRIDS_DEADLINE = args.deadline
+    try:
+        started = time.perf_counter()
+        result = app.fetch_soilgrids_properties(lat, lng)
+        elapsed = time.perf_counter() - started
+    finally:
+        app.SOILGRIDS_DEADLINE = deadline
+        StubSoilGridsHandler.stalled = {}
+    print(f"{'deadline':<12} {elapsed * 1000:>9.0f} {len(result):>11}  (deadline {args.deadline * 1000:.0f} ms, nitrogen stalled)")
+    print(f"\nspeedup: {sequential / parallel:.1f}x")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Peak RSS of the server for one large /crop/detect upload
+
+For each upload mode, starts the server in a fresh process, logs in, sends one small
+upload of the same mode to load every code path, reads the process's peak RSS
+(VmHWM in /proc, so Linux only), then sends one --size MB image and reports how far
+the peak grew. Modes:
+
+- json: {"image": "<base64>"} as before streaming parsing
+- raw: the bytes as an image/jpeg body, crop_type in the query string
+- multipart: a multipart/form-data file part
+
+The payload is a noise JPEG of about --size MB, so the server decodes and
+recompresses a real image. To measure the tree before streaming parsing, point
+--server at that version of the module, json mode only:
+
+    git show 7ee252e^:smart_farmer_kenya.py > smart_farmer_before.py
+    python benchmarks/upload_memory_benchmark.py --server smart_farmer_before.py --modes json
+    python benchmarks/upload_memory_benchmark.py [--size 10]
+"""
+import argparse
+import base64
+import http.client
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOUNDARY = "smart-farmer-benchmark-boundary"
+
+def noise_jpeg(size, seed=1):
+    """A random-noise JPEG of roughly size bytes; noise barely compresses, so it stays that large"""
+    rng = np.random.default_rng(seed)
+    sample = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (256, 256, 3), dtype=np.uint8)).save(sample, "JPEG", quality=95)
+    side = int((size / (len(sample.getvalue()) / 256 ** 2)) ** 0.5)
+    output = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (side, side, 3), dtype=np.uint8)).save(output, "JPEG", quality=95)
+    return output.getvalue()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(server, port):
+    env = dict(os.environ, SMART_FARMER_USER_STORE="memory", SMART_FARMER_PRICE_STORE_PATH="", PYTHONUNBUFFERED="1")
+    process = subprocess.Popen([sys.executable, server, "--port", str(port)], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{server} did not start listening on {port}")
+
+def peak_rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("VmHWM not available")
+
+def post(port, path, body, headers):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+    connection.request("POST", path, body, headers)
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    return response.status, data
+
+def upload_request(mode, image, token):
+    auth = {"Authorization": f"Bearer {token}"}
+    if mode == "json":
+        body = json.dumps({"crop_type": "Maize", "image": base64.b64encode(image).decode()})
+        return "/crop/detect", body, {**auth, "Content-Type": "application/json"}
+    if mode == "raw":
+        return "/crop/detect?crop_type=Maize", image, {**auth, "Content-Type": "image/jpeg"}
+    body = b"".join([
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"crop_type\"\r\n\r\nMaize\r\n".encode(),
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"image\"; filename=\"leaf.jpg\"\r\nContent-Type: image/jpeg\r\n\r\n".encode(),
+        image,
+        f"\r\n--{BOUNDARY}--\r\n".encode()
+    ])
+    return "/crop/detect", body, {**auth, "Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+
+def measure(server, mode, image):
+    port = free_port()
+    process = start_server(server, port)
+    try:
+        status, data = post(port, "/login", json.dumps({"username": "farmer", "password": "password123"}), {"Content-Type": "application/json"})
+        token = json.loads(data)["token"]
+        post(port, *upload_request(mode, noise_jpeg(64 * 1024, seed=2), token))
+        before = peak_rss_mb(process.pid)
+        started = time.perf_counter()
+        status, _ = post(port, *upload_request(mode, image, token))
+        elapsed = time.perf_counter() - started
+        return status, before, peak_rss_mb(process.pid), elapsed
+    finally:
+        process.terminate()
+        process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--server", default=os.path.join(ROOT, "smart_farmer_kenya.py"), help="Server module to run")
+    parser.add_argument("--modes", default="json,raw,multipart", help="Comma-separated upload modes")
+    parser.add_argument("--size", type=float, default=10, help="Image size in MB")
+    args = parser.parse_args()
+    image = noise_jpeg(int(args.size * 1024 * 1024))
+
+    print(f"server: {args.server} | image: {len(image) / 2 ** 20:.1f} MB JPEG")
+    print(f"{'mode':<10} {'status':>6} {'peak before':>12} {'peak after':>11} {'growth MB':>10} {'seconds':>8}")
+    for mode in args.modes.split(","):
+        status, before, after, elapsed = measure(args.server, mode, image)
+        print(f"{mode:<10} {status:>6} {before:>12.1f} {after:>11.1f} {after - before:>10.1f} {elapsed:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
 # smart_farmer_kenya_complete.py - Complete Backend API for Kenyan Farmers
 import http.server
 import socketserver
+import socket
+import selectors
 import json
 import base64
+import binascii
 import uuid
 import datetime
 import time
+import math
 import threading
 import urllib.request
 import urllib.parse
@@ -13,10 +17,42 @@ import urllib.error
 from urllib.parse import urlparse, parse_qs
 from http import HTTPStatus
 import os
+import sys
+import numpy as np
+from PIL import Image, ImageOps
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import io
 import hashlib
 import random
+import re
+import sqlite3
+import argparse
+import csv
+import bisect
+import secrets
+import hmac
+import functools
+import gzip
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from collections import OrderedDict, Counter, deque
+from types import MappingProxyType
+
+try:
+    import jwt  # PyJWT, only needed for SMART_FARMER_TOKEN_MODE=jwt
+except ImportError:
+    jwt = None
+
+try:
+    import orjson  # Optional; responses fall back to the stdlib json module without it
+except ImportError:
+    orjson = None
+
+try:
+    import brotli  # Optional; without it responses are only gzip-compressed
+except ImportError:
+    brotli = None
 
 # ================= REAL API CONFIGURATION =================
 # Get your API keys from these services:
@@ -33,57 +69,393 @@ API_KEYS = {
     "weather_api": os.getenv("WEATHER_API_KEY", "89ff55d7fb45469c8f8175443250512")  # https://www.weatherapi.com/
 }
 
+# ================= SERVER CONFIGURATION =================
+# Settings read SMART_FARMER_* environment variables; only the API keys above keep their provider names
+SERVER_PORT = int(os.getenv("SMART_FARMER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SMART_FARMER_WORKERS", "32"))  # Concurrent request threads
+SERVER_BACKLOG = int(os.getenv("SMART_FARMER_BACKLOG", "128"))  # Pending connections queued by the OS
+SERVER_QUEUE_SIZE = int(os.getenv("SMART_FARMER_QUEUE_SIZE", "64"))  # Requests waiting for a worker; beyond this clients get 503
+SERVER_KEEPALIVE_TIMEOUT = float(os.getenv("SMART_FARMER_KEEPALIVE_TIMEOUT", "15"))  # Idle seconds before closing
+SERVER_REQUEST_TIMEOUT = float(os.getenv("SMART_FARMER_REQUEST_TIMEOUT", "30"))  # Seconds to finish reading a request once it starts
+MAX_BODY_BYTES = int(os.getenv("SMART_FARMER_MAX_BODY_BYTES", str(16 * 1024 * 1024)))  # Larger bodies get 413
+BODY_CHUNK_SIZE = 64 * 1024  # Bytes read from the socket per call
+COMPRESSION_MIN_BYTES = int(os.getenv("SMART_FARMER_COMPRESS_MIN_BYTES", "1024"))  # Smaller responses are sent as-is
+GZIP_LEVEL = int(os.getenv("SMART_FARMER_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("SMART_FARMER_BROTLI_QUALITY", "5"))  # Per-response; static bodies use the maximum
+DATA_DIR = os.getenv("SMART_FARMER_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+USER_STORE = os.getenv("SMART_FARMER_USER_STORE", "sqlite")  # "sqlite" (persistent, shared) or "memory"
+USER_DB_PATH = os.getenv("SMART_FARMER_USER_DB", os.path.join(DATA_DIR, "users.sqlite3"))
+PASSWORD_SCHEME = os.getenv("SMART_FARMER_PASSWORD_SCHEME", "scrypt")  # "scrypt" or "pbkdf2_sha256"
+SCRYPT_COST = int(os.getenv("SMART_FARMER_SCRYPT_N", str(2 ** 14)))  # CPU/memory cost; with r=8 each hash uses 16 MB
+SCRYPT_BLOCK_SIZE = int(os.getenv("SMART_FARMER_SCRYPT_R", "8"))
+SCRYPT_PARALLELISM = int(os.getenv("SMART_FARMER_SCRYPT_P", "1"))
+PBKDF2_ITERATIONS = int(os.getenv("SMART_FARMER_PBKDF2_ITERATIONS", "600000"))
+CREDENTIAL_WORKERS = int(os.getenv("SMART_FARMER_CREDENTIAL_WORKERS", str(os.cpu_count() or 2)))  # Threads hashing passwords
+TOKEN_MODE = os.getenv("SMART_FARMER_TOKEN_MODE", "opaque")  # "opaque" (server-side store) or "jwt" (signed, stateless)
+TOKEN_SECRET = os.getenv("SMART_FARMER_TOKEN_SECRET", "")  # HS256 key for jwt mode; random per process if unset
+TOKEN_TTL = float(os.getenv("SMART_FARMER_TOKEN_TTL", str(24 * 3600)))  # Idle seconds before a token expires
+TOKEN_MAX_LIFETIME = float(os.getenv("SMART_FARMER_TOKEN_MAX_LIFETIME", str(7 * 24 * 3600)))  # Sliding refresh stops here
+TOKEN_MAX_PER_USER = int(os.getenv("SMART_FARMER_TOKENS_PER_USER", "10"))  # Oldest sessions are dropped beyond this
+TOKEN_SWEEP_INTERVAL = float(os.getenv("SMART_FARMER_TOKEN_SWEEP_INTERVAL", "60"))  # Seconds between expiry sweeps
+CATALOG_PATH = os.getenv("SMART_FARMER_CATALOG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog", "kenya_reference.json"))
+CATALOG_RELOAD_INTERVAL = float(os.getenv("SMART_FARMER_CATALOG_RELOAD_INTERVAL", "5"))  # Seconds between file change checks; 0 disables reloads
+
+# ================= UPSTREAM CONFIGURATION =================
+OUTBOUND_WORKERS = int(os.getenv("SMART_FARMER_OUTBOUND_WORKERS", "16"))  # Parallel upstream API calls
+SOILGRIDS_DEADLINE = float(os.getenv("SMART_FARMER_SOILGRIDS_DEADLINE", "12"))  # Overall seconds for one soil lookup
+DASHBOARD_DEADLINE = float(os.getenv("SMART_FARMER_DASHBOARD_DEADLINE", "8"))  # Overall seconds before sections fall back
+DASHBOARD_WORKERS = int(os.getenv("SMART_FARMER_DASHBOARD_WORKERS", "16"))  # Threads gathering dashboard sections
+IMAGE_WORKERS = int(os.getenv("SMART_FARMER_IMAGE_WORKERS", str(os.cpu_count() or 2)))  # Threads decoding/resizing uploads
+PLANT_ID_MAX_DIMENSION = int(os.getenv("SMART_FARMER_PLANT_ID_MAX_DIMENSION", "1024"))  # Longest image side sent to Plant.id
+PLANT_ID_JPEG_QUALITY = int(os.getenv("SMART_FARMER_PLANT_ID_JPEG_QUALITY", "85"))
+OUTBOUND_POOL_HOSTS = int(os.getenv("SMART_FARMER_POOL_HOSTS", "10"))  # Upstream hosts kept in the pool
+OUTBOUND_POOL_SIZE = int(os.getenv("SMART_FARMER_POOL_SIZE", "16"))  # Keep-alive connections per host
+OUTBOUND_RETRIES = int(os.getenv("SMART_FARMER_RETRIES", "2"))  # Retries for idempotent GETs
+OUTBOUND_BACKOFF = float(os.getenv("SMART_FARMER_RETRY_BACKOFF", "0.3"))  # Exponential backoff factor (seconds)
+WEATHER_CACHE_RESOLUTION = float(os.getenv("SMART_FARMER_WEATHER_CACHE_RESOLUTION", "0.05"))  # Grid cell size in degrees (~5.5 km)
+WEATHER_CACHE_TTL = float(os.getenv("SMART_FARMER_WEATHER_CACHE_TTL", "600"))  # Seconds a forecast stays fresh
+WEATHER_CACHE_SIZE = int(os.getenv("SMART_FARMER_WEATHER_CACHE_SIZE", "4096"))  # Grid cells kept in memory
+WEATHER_BATCH_MAX = int(os.getenv("SMART_FARMER_WEATHER_BATCH_MAX", "1000"))  # Farms accepted by one /weather/batch call
+OPEN_METEO_BATCH_SIZE = int(os.getenv("SMART_FARMER_OPEN_METEO_BATCH_SIZE", "50"))  # Locations per multi-location request
+SOIL_CACHE_PATH = os.getenv("SMART_FARMER_SOIL_CACHE_PATH", os.path.join(DATA_DIR, "soil_cache.sqlite3"))
+SOIL_CACHE_RESOLUTION = float(os.getenv("SMART_FARMER_SOIL_CACHE_RESOLUTION", "0.01"))  # Grid cell size in degrees (~1.1 km)
+DETECTION_CACHE_SIZE = int(os.getenv("SMART_FARMER_DETECTION_CACHE_SIZE", "2048"))  # Diagnoses kept in memory
+DETECTION_CACHE_TTL = float(os.getenv("SMART_FARMER_DETECTION_CACHE_TTL", str(30 * 24 * 3600)))  # Seconds a diagnosis is reused
+DETECTION_CACHE_PATH = os.getenv("SMART_FARMER_DETECTION_CACHE_PATH", "")  # SQLite file for the on-disk tier; empty keeps it in memory only
+NEAR_DUPLICATE_THRESHOLD = int(os.getenv("SMART_FARMER_NEAR_DUPLICATE_THRESHOLD", "6"))  # Max differing dHash bits (of 64) to reuse a diagnosis
+NEAR_DUPLICATE_MIN_CONFIDENCE = float(os.getenv("SMART_FARMER_NEAR_DUPLICATE_MIN_CONFIDENCE", "0.85"))  # Only confident diagnoses are reused
+NEAR_DUPLICATE_TTL = float(os.getenv("SMART_FARMER_NEAR_DUPLICATE_TTL", str(7 * 24 * 3600)))  # Seconds a diagnosis counts as recent
+NEAR_DUPLICATE_INDEX_SIZE = int(os.getenv("SMART_FARMER_NEAR_DUPLICATE_INDEX_SIZE", "100000"))  # Fingerprints kept in the index; 1M works but costs about 0.5 GB plus the stored diagnoses
+DETECTION_RETENTION_COUNT = int(os.getenv("SMART_FARMER_DETECTION_RETENTION_COUNT", "100000"))  # Detection records kept in memory
+DETECTION_RETENTION_DAYS = float(os.getenv("SMART_FARMER_DETECTION_RETENTION_DAYS", "90"))  # Older detection records are dropped
+DETECTION_PAGE_SIZE = int(os.getenv("SMART_FARMER_DETECTION_PAGE_SIZE", "50"))  # Default page size for /crop/detections
+DETECTION_PAGE_MAX = int(os.getenv("SMART_FARMER_DETECTION_PAGE_MAX", "500"))
+OUTBREAK_ALERT_RATE = float(os.getenv("SMART_FARMER_OUTBREAK_ALERT_RATE", "0.3"))  # Share of a county's detections for one disease that raises an alert
+OUTBREAK_ALERT_MIN_CASES = int(os.getenv("SMART_FARMER_OUTBREAK_ALERT_MIN_CASES", "5"))  # Cases needed before a rate can alert
+OUTBREAK_ALERT_WINDOW = os.getenv("SMART_FARMER_OUTBREAK_ALERT_WINDOW", "24h")  # One of OutbreakCounters.WINDOWS
+PRICE_STORE_PATH = os.getenv("SMART_FARMER_PRICE_STORE_PATH", os.path.join(DATA_DIR, "prices.npz"))  # Empty keeps imported prices in memory only
+PRICE_STORE_RELOAD_INTERVAL = float(os.getenv("SMART_FARMER_PRICE_STORE_RELOAD_INTERVAL", "30"))  # Seconds between checks for imports by --import-prices; 0 disables reloads
+PRICE_HISTORY_DAYS = int(os.getenv("SMART_FARMER_PRICE_HISTORY_DAYS", "30"))  # Default history window on market responses
+PRICE_HISTORY_MAX = int(os.getenv("SMART_FARMER_PRICE_HISTORY_MAX", "365"))
+MARKET_MATRIX_MAX_CELLS = int(os.getenv("SMART_FARMER_MARKET_MATRIX_MAX_CELLS", "2000"))  # Crop x county cells accepted by one /market/matrix call
+PRICE_MODEL_ORIGIN = datetime.date(2020, 1, 1)  # Modelled baseline series start here, so a day's price never changes
+MARKET_ANALYTICS_DAYS = int(os.getenv("SMART_FARMER_MARKET_ANALYTICS_DAYS", str(5 * 365 + 1)))  # Days of history behind seasonal indices
+MARKET_TREND_THRESHOLD = float(os.getenv("SMART_FARMER_MARKET_TREND_THRESHOLD", "0.02"))  # 7-day vs 30-day average gap that counts as a trend
+
+# Shared pool for fanning out independent upstream requests
+OUTBOUND_EXECUTOR = ThreadPoolExecutor(max_workers=OUTBOUND_WORKERS, thread_name_prefix="smart-farmer-outbound")
+# Separate pool so dashboard sections can wait on OUTBOUND_EXECUTOR work without starving it
+DASHBOARD_EXECUTOR = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS, thread_name_prefix="smart-farmer-dashboard")
+# CPU-bound image work is capped here instead of running on every request thread at once
+IMAGE_EXECUTOR = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="smart-farmer-image")
+# Password hashing releases the GIL, so a burst of logins runs here in parallel and leaves request threads free
+CREDENTIAL_EXECUTOR = ThreadPoolExecutor(max_workers=CREDENTIAL_WORKERS, thread_name_prefix="smart-farmer-credentials")
+
 # ================= KENYA-SPECIFIC CONFIGURATION =================
-KENYA_COUNTIES = [
-    "Baringo", "Bomet", "Bungoma", "Busia", "Elgeyo-Marakwet", "Embu", "Garissa", 
-    "Homa Bay", "Isiolo", "Kajiado", "Kakamega", "Kericho", "Kiambu", "Kilifi", 
-    "Kirinyaga", "Kisii", "Kisumu", "Kitui", "Kwale", "Laikipia", "Lamu", 
-    "Machakos", "Makueni", "Mandera", "Marsabit", "Meru", "Migori", "Mombasa", 
-    "Murang'a", "Nairobi", "Nakuru", "Nandi", "Narok", "Nyamira", "Nyandarua", 
-    "Nyeri", "Samburu", "Siaya", "Taita Taveta", "Tana River", "Tharaka-Nithi", 
-    "Trans Nzoia", "Turkana", "Uasin Gishu", "Vihiga", "Wajir", "West Pokot"
+# Built-in county lookup is a box index, not county outlines: one rough bounding rectangle per
+# county as (county, lat_range, lng_range). The boxes overlap, and a point in an overlap goes to
+# whichever county comes first (smaller counties before the larger neighbours around them), so
+# points near borders can resolve to the wrong county, e.g. Mwingi (-0.933, 38.06) comes back as
+# Embu rather than Kitui. Point SMART_FARMER_KENYA_COUNTY_BOUNDARIES_FILE at a GeoJSON
+# FeatureCollection of surveyed outlines for accurate results.
+KENYA_COUNTY_BOXES = [
+    ("Nairobi", (-1.45, -1.18), (36.66, 37.10)),
+    ("Mombasa", (-4.15, -3.95), (39.55, 39.78)),
+    ("Vihiga", (-0.03, 0.18), (34.55, 34.85)),
+    ("Nyamira", (-0.75, -0.45), (34.82, 35.10)),
+    ("Kisii", (-0.95, -0.45), (34.55, 34.82)),
+    ("Kirinyaga", (-0.70, -0.35), (37.18, 37.42)),
+    ("Tharaka-Nithi", (-0.45, -0.05), (37.60, 38.25)),
+    ("Nandi", (0.00, 0.45), (34.95, 35.40)),
+    ("Kiambu", (-1.30, -0.80), (36.50, 37.20)),
+    ("Murang'a", (-1.10, -0.60), (36.75, 37.30)),
+    ("Nyeri", (-0.60, -0.05), (36.60, 37.25)),
+    ("Nyandarua", (-0.65, 0.05), (36.20, 36.60)),
+    ("Embu", (-0.95, -0.35), (37.30, 38.10)),
+    ("Kisumu", (-0.45, 0.00), (34.55, 35.10)),
+    ("Siaya", (-0.45, 0.45), (33.95, 34.55)),
+    ("Homa Bay", (-0.90, -0.30), (34.00, 34.55)),
+    ("Migori", (-1.50, -0.90), (34.00, 34.80)),
+    ("Busia", (0.00, 0.80), (33.90, 34.30)),
+    ("Kakamega", (0.00, 0.65), (34.62, 34.95)),
+    ("Bungoma", (0.40, 1.10), (34.30, 34.90)),
+    ("Trans Nzoia", (0.85, 1.20), (34.70, 35.30)),
+    ("Uasin Gishu", (0.30, 0.85), (34.95, 35.45)),
+    ("Elgeyo-Marakwet", (0.30, 1.40), (35.45, 35.70)),
+    ("West Pokot", (1.00, 2.70), (34.60, 35.60)),
+    ("Baringo", (0.00, 1.60), (35.70, 36.30)),
+    ("Kericho", (-0.60, 0.00), (35.10, 35.60)),
+    ("Bomet", (-1.10, -0.60), (35.00, 35.60)),
+    ("Nakuru", (-1.00, 0.30), (35.60, 36.60)),
+    ("Narok", (-2.10, -0.40), (34.80, 36.20)),
+    ("Laikipia", (-0.05, 0.90), (36.30, 37.40)),
+    ("Meru", (-0.05, 0.30), (37.40, 38.20)),
+    ("Machakos", (-1.70, -0.75), (37.00, 37.80)),
+    ("Kajiado", (-3.20, -1.15), (36.00, 37.30)),
+    ("Makueni", (-3.00, -1.70), (37.30, 38.50)),
+    ("Kitui", (-3.00, 0.00), (37.80, 39.40)),
+    ("Isiolo", (0.00, 2.00), (37.40, 39.40)),
+    ("Samburu", (0.40, 2.60), (36.30, 37.70)),
+    ("Turkana", (1.60, 5.00), (34.00, 36.50)),
+    ("Marsabit", (1.25, 4.50), (36.50, 39.40)),
+    ("Taita Taveta", (-4.10, -2.80), (37.55, 39.20)),
+    ("Kwale", (-4.70, -3.90), (38.50, 39.60)),
+    ("Kilifi", (-3.95, -2.30), (39.20, 40.25)),
+    ("Lamu", (-2.50, -1.50), (40.30, 41.60)),
+    ("Garissa", (-1.20, 1.00), (39.60, 41.60)),
+    ("Tana River", (-2.95, 0.05), (38.40, 40.30)),
+    ("Mandera", (2.60, 4.30), (40.00, 42.00)),
+    ("Wajir", (0.30, 3.90), (39.00, 41.00)),
 ]
+KENYA_COUNTY_BOUNDARIES_FILE = os.getenv("SMART_FARMER_KENYA_COUNTY_BOUNDARIES_FILE")
 
-# Kenya-specific crop database
-KENYA_CROPS = {
-    "Maize": {"season": "Long Rains", "regions": ["Trans Nzoia", "Uasin Gishu", "Nakuru"]},
-    "Tea": {"season": "Year-round", "regions": ["Kericho", "Nyeri", "Murang'a"]},
-    "Coffee": {"season": "Year-round", "regions": ["Kiambu", "Kirinyaga", "Nyeri"]},
-    "Wheat": {"season": "Short Rains", "regions": ["Narok", "Nakuru", "Laikipia"]},
-    "Rice": {"season": "Irrigation-based", "regions": ["Mwea", "Ahero", "Bunyala"]},
-    "Sugarcane": {"season": "Year-round", "regions": ["Kisumu", "Kakamega", "Bungoma"]},
-    "Sorghum": {"season": "Short Rains", "regions": ["Eastern", "Coastal"]},
-    "Millet": {"season": "Short Rains", "regions": ["Eastern", "Western"]},
-    "Beans": {"season": "Both Seasons", "regions": ["All"]},
-    "Potatoes": {"season": "Long Rains", "regions": ["Nyandarua", "Meru", "Nakuru"]},
-    "Tomatoes": {"season": "Year-round", "regions": ["Kajiado", "Machakos", "Kirinyaga"]},
-    "Avocado": {"season": "Year-round", "regions": ["Murang'a", "Kiambu", "Meru"]},
-    "Mango": {"season": "Rainy Season", "regions": ["Eastern", "Coastal"]},
-    "Banana": {"season": "Year-round", "regions": ["Kisii", "Meru", "Murang'a"]}
-}
+# ================= REFERENCE DATA =================
+# Counties, crops, diseases, prices, varieties, calendars and markets live in a versioned JSON
+# catalog (CATALOG_PATH), not in code. Each load is frozen into one ReferenceCatalog; a reload
+# builds a complete new one and swaps a single reference, so a request sees either the old
+# tables or the new ones, never a mix. Replace the file with a rename to publish an update.
+CATALOG_SCHEMA = 1  # Layout version this code understands; the file's "version" is the data release
+CATALOG_SECTIONS = (
+    "counties", "crops", "livestock", "weather_zones", "weather_codes", "base_prices_ksh",
+    "market_base_prices", "market_county_factors", "seasonal_price_factors", "crop_diseases", "crop_varieties",
+    "agricultural_calendars", "markets", "defaults"
+)
 
-# Kenya livestock
-KENYA_LIVESTOCK = {
-    "Cattle": {"regions": ["Rift Valley", "Eastern", "Central"]},
-    "Goats": {"regions": ["All"]},
-    "Sheep": {"regions": ["Rift Valley", "Eastern"]},
-    "Chicken": {"regions": ["All"]},
-    "Pigs": {"regions": ["Central", "Western"]},
-    "Camels": {"regions": ["North Eastern", "Rift Valley"]}
-}
+def freeze(value):
+    """Recursively turn dicts into read-only mappings and lists into tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
 
-# Kenya weather patterns
-KENYA_WEATHER_ZONES = {
-    "Coastal": {"temp_range": (22, 32), "rainfall": (1000, 2000), "seasons": ["Long Rains", "Short Rains"]},
-    "Central Highlands": {"temp_range": (10, 25), "rainfall": (1000, 2200), "seasons": ["Long Rains", "Short Rains"]},
-    "Western": {"temp_range": (18, 30), "rainfall": (1200, 2000), "seasons": ["Year-round"]},
-    "Rift Valley": {"temp_range": (10, 28), "rainfall": (600, 1800), "seasons": ["Long Rains", "Short Rains"]},
-    "Eastern": {"temp_range": (20, 35), "rainfall": (500, 1000), "seasons": ["Short Rains"]},
-    "North Eastern": {"temp_range": (25, 40), "rainfall": (250, 500), "seasons": ["Erratic"]}
-}
+def deep_sizeof(value, seen=None):
+    """Approximate bytes held by a frozen table, counting shared objects once"""
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, MappingProxyType):
+        # The proxy is a thin wrapper; the dict behind it holds the entries
+        value = dict(value.items())
+        size += sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(item, seen) for key, item in value.items())
+    elif isinstance(value, (tuple, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in value)
+    return size
+
+def county_key(name):
+    """Spelling-insensitive key for a county name ("Murang'a", "muranga", "Elgeyo Marakwet")"""
+    return str(name).lower().replace("-", " ").replace("'", "").strip()
+
+class ReferenceCatalog:
+    """One immutable load of the reference catalog"""
+    
+    def __init__(self, data):
+        defaults = data["defaults"]
+        self.version = str(data["version"])
+        self.counties = freeze(data["counties"])
+        self.county_set = frozenset(self.counties)
+        self.county_keys = freeze({county_key(county): county for county in self.counties})
+        self.crops = freeze(data["crops"])
+        self.livestock = freeze(data["livestock"])
+        self.weather_zones = freeze(data["weather_zones"])
+        # JSON object keys are strings; Open-Meteo sends integer codes
+        self.weather_codes = freeze({int(code): label for code, label in data["weather_codes"].items()})
+        self.base_prices_ksh = freeze(data["base_prices_ksh"])
+        self.market_base_prices = freeze(data["market_base_prices"])
+        self.market_county_factors = freeze(data["market_county_factors"])
+        self.seasonal_price_factors = freeze(data["seasonal_price_factors"])  # Wholesale price multiplier per month, Jan first
+        self.crop_diseases = freeze(data["crop_diseases"])
+        self.crop_varieties = freeze(data["crop_varieties"])
+        self.agricultural_calendars = freeze(data["agricultural_calendars"])
+        self.markets = freeze(data["markets"])
+        self.market_crops = frozenset(self.crops) | frozenset(self.market_base_prices)  # Crops with a modelled or listed market
+        self.defaults = freeze(defaults)
+        
+        for crop, diseases in self.crop_diseases.items():
+            if not diseases or diseases[-1]["name"] != "Healthy":
+                raise ValueError(f"crop_diseases[{crop!r}] must end with the Healthy entry")
+        for crop, factors in [*self.seasonal_price_factors.items(), ("default", self.defaults["seasonal_price_factors"])]:
+            if len(factors) != 12:
+                raise ValueError(f"seasonal_price_factors[{crop!r}] needs 12 monthly factors")
+        for section in ("base_prices_ksh", "market_base_prices"):
+            for crop, price in getattr(self, section).items():
+                if not 0 < price["min"] <= price["max"]:
+                    raise ValueError(f"{section}[{crop!r}] needs 0 < min <= max")
+        
+        self.tables = {section: getattr(self, section) for section in CATALOG_SECTIONS}
+        self.tables["county_keys"] = self.county_keys
+        self.entries = sum(len(table) for table in self.tables.values())
+        self.memory_bytes = deep_sizeof(self.tables)
+        self.source = None  # Filled by load_reference_catalog
+        self.load_ms = 0.0
+        self.loaded_at = None
+
+def file_signature(stat):
+    return (stat.st_mtime_ns, stat.st_size)
+
+def load_reference_catalog(path):
+    """Read, validate and freeze a catalog file"""
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        raw = f.read()
+    
+    data = json.loads(raw)
+    if not isinstance(data, dict) or data.get("schema") != CATALOG_SCHEMA:
+        raise ValueError(f"expected catalog schema {CATALOG_SCHEMA}, got {data.get('schema') if isinstance(data, dict) else None!r}")
+    missing = [section for section in CATALOG_SECTIONS if section not in data]
+    if missing or "version" not in data:
+        raise ValueError(f"missing sections: {', '.join(missing or ['version'])}")
+    
+    catalog = ReferenceCatalog(data)
+    catalog.source = {
+        "path": path,
+        "bytes": len(raw),
+        "sha256": hashlib.sha256(raw).hexdigest()[:16],
+        "signature": file_signature(stat)
+    }
+    catalog.load_ms = (time.perf_counter() - started) * 1000
+    catalog.loaded_at = time.time()
+    return catalog
+
+class CatalogWatcher:
+    """Holds the current ReferenceCatalog and swaps in a new one when the file changes"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()  # One reload at a time; readers never take it
+        self.listeners = []  # Called with the new catalog after each swap
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self.rejected_signature = None  # A broken file is reported once, not on every check
+        self.current = load_reference_catalog(path)
+    
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+    
+    def check(self):
+        """Reload if the file's mtime or size moved; returns True when a new catalog was swapped in"""
+        try:
+            signature = file_signature(os.stat(self.path))
+        except OSError as e:
+            self.last_error = str(e)
+            return False
+        if signature in (self.current.source["signature"], self.rejected_signature):
+            return False
+        return self.reload()
+    
+    def reload(self):
+        with self.lock:
+            try:
+                catalog = load_reference_catalog(self.path)
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                self.failures += 1
+                self.last_error = str(e)
+                try:
+                    self.rejected_signature = file_signature(os.stat(self.path))
+                except OSError:
+                    pass
+                print(f"Catalog reload failed, keeping version {self.current.version}: {e}")
+                return False
+            
+            previous, self.current = self.current, catalog
+            self.reloads += 1
+            self.last_error = None
+            self.rejected_signature = None
+        
+        for listener in self.listeners:
+            try:
+                listener(catalog)
+            except Exception as e:
+                print(f"Catalog listener error: {e}")
+        print(f"📚 Reference catalog {previous.version} -> {catalog.version} ({catalog.load_ms:.1f} ms, {catalog.memory_bytes / 1024:.0f} KiB)")
+        return True
+    
+    def stats(self):
+        catalog = self.current
+        return {
+            "version": catalog.version,
+            "file_bytes": catalog.source["bytes"],
+            "sha256": catalog.source["sha256"],
+            "entries": catalog.entries,
+            "memory_bytes": catalog.memory_bytes,
+            "load_ms": round(catalog.load_ms, 2),
+            "loaded_at": datetime.datetime.fromtimestamp(catalog.loaded_at).isoformat(),
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error
+        }
+
+def start_file_watcher(watcher, interval, name="catalog"):
+    """Call watcher.check() on a daemon thread so edits to its file are picked up as they land"""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                watcher.check()
+            except Exception as e:
+                print(f"{name.replace('-', ' ').capitalize()} watch error: {e}")
+    
+    thread = threading.Thread(target=run, name=f"smart-farmer-{name}-watcher", daemon=True)
+    thread.start()
+    return thread
+
+reference_catalog = CatalogWatcher(CATALOG_PATH)
+
+# Accessors take the current catalog once per call; the values they return are frozen
+def current_catalog():
+    return reference_catalog.current
+
+def kenya_counties():
+    return current_catalog().counties
+
+def is_kenya_county(county):
+    return county in current_catalog().county_set
+
+def normalize_county_name(name):
+    """Match a boundary file's or user's county label to the catalog spelling"""
+    return current_catalog().county_keys.get(county_key(name), str(name))
+
+def kenya_crops():
+    return current_catalog().crops
+
+def is_market_crop(crop):
+    return crop in current_catalog().market_crops
+
+def weather_zone(region):
+    catalog = current_catalog()
+    return catalog.weather_zones.get(region, catalog.defaults["weather_zone"])
+
+def weather_condition(code):
+    return current_catalog().weather_codes.get(code, "Clear sky")
+
+def crop_diseases(crop_type):
+    """Disease entries for a crop, healthy last"""
+    catalog = current_catalog()
+    return catalog.crop_diseases.get(crop_type, catalog.defaults["crop_diseases"])
+
+def base_price_ksh(crop):
+    catalog = current_catalog()
+    return catalog.base_prices_ksh.get(crop, catalog.defaults["base_price_ksh"])
+
+def market_base_price(crop):
+    catalog = current_catalog()
+    return catalog.market_base_prices.get(crop, catalog.defaults["market_base_price"])
+
+def market_county_factor(county):
+    return current_catalog().market_county_factors.get(county, 1.0)
+
+def seasonal_price_factors(crop):
+    catalog = current_catalog()
+    return catalog.seasonal_price_factors.get(crop, catalog.defaults["seasonal_price_factors"])
 
 # ================= DATABASE =================
-users_db = {
+DEMO_USERS = {
     "farmer": {
         "password": "password123",
         "email": "farmer@kenya.co.ke",
@@ -98,61 +470,605 @@ users_db = {
     }
 }
 
-crop_detections = []
+class SQLiteUserRepository:
+    """User accounts in SQLite (WAL mode), with one reused connection per server thread"""
+    
+    PROFILE_FIELDS = ("coordinates", "crops", "livestock", "farm_size", "soil_type", "elevation")
+    IMPORT_BATCH = 5000
+    
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self.connection()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS users (
+                username TEXT PRIMARY KEY,
+                password TEXT NOT NULL,
+                email TEXT NOT NULL DEFAULT '',
+                county TEXT,
+                farm_type TEXT,
+                profile TEXT NOT NULL DEFAULT '{}',
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS users_county ON users (county);
+        """)
+    
+    def connection(self):
+        # sqlite3 keeps a prepared-statement cache per connection, so reusing it reuses the plans
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+    
+    def row(self, username, user):
+        profile = {field: user[field] for field in self.PROFILE_FIELDS if field in user}
+        return (username, user["password"], user.get("email", ""), user.get("county"), user.get("farm_type"),
+                json.dumps(profile), time.time())
+    
+    def get(self, username):
+        """Return the user dict, or None"""
+        row = self.connection().execute(
+            "SELECT password, email, county, farm_type, profile FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"password": row[0], "email": row[1], "county": row[2], "farm_type": row[3], **json.loads(row[4])}
+    
+    def create(self, username, user):
+        """Insert a new user; returns False if the username is taken"""
+        conn = self.connection()
+        with conn:
+            cursor = conn.execute("INSERT OR IGNORE INTO users VALUES (?, ?, ?, ?, ?, ?, ?)", self.row(username, user))
+        return cursor.rowcount == 1
+    
+    def update_password(self, username, password):
+        conn = self.connection()
+        with conn:
+            conn.execute("UPDATE users SET password = ? WHERE username = ?", (password, username))
+    
+    def bulk_import(self, users):
+        """Insert (username, user) pairs in large transactions; existing usernames are skipped"""
+        conn = self.connection()
+        imported = skipped = 0
+        batch = []
+        
+        def flush():
+            before = conn.total_changes
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO users VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+            return conn.total_changes - before
+        
+        for username, user in users:
+            batch.append(self.row(username, user))
+            if len(batch) == self.IMPORT_BATCH:
+                added = flush()
+                imported += added
+                skipped += len(batch) - added
+                batch = []
+        if batch:
+            added = flush()
+            imported += added
+            skipped += len(batch) - added
+        return imported, skipped
+    
+    def stats(self):
+        count = self.connection().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        return {"backend": "sqlite", "users": count}
+
+class InMemoryUserRepository:
+    """Process-local user accounts, for development and tests"""
+    
+    def __init__(self):
+        self.users = {}
+        self.lock = threading.Lock()
+    
+    def get(self, username):
+        with self.lock:
+            user = self.users.get(username)
+        return dict(user) if user is not None else None
+    
+    def create(self, username, user):
+        with self.lock:
+            if username in self.users:
+                return False
+            self.users[username] = dict(user)
+        return True
+    
+    def update_password(self, username, password):
+        with self.lock:
+            if username in self.users:
+                self.users[username]["password"] = password
+    
+    def bulk_import(self, users):
+        imported = skipped = 0
+        for username, user in users:
+            if self.create(username, user):
+                imported += 1
+            else:
+                skipped += 1
+        return imported, skipped
+    
+    def stats(self):
+        with self.lock:
+            return {"backend": "memory", "users": len(self.users)}
+
+def create_user_repository():
+    """Build the user repository for SMART_FARMER_USER_STORE and make sure the demo account exists"""
+    if USER_STORE == "memory":
+        repository = InMemoryUserRepository()
+    else:
+        repository = SQLiteUserRepository(USER_DB_PATH)
+    for username, user in DEMO_USERS.items():
+        repository.create(username, user)
+    return repository
+
+def load_users_csv(path):
+    """Yield (username, user) pairs from a cooperative member CSV
+    
+    Columns: username, password, and optionally email, county, farm_type, lat, lng,
+    crops and livestock (separated by ";"), farm_size, soil_type, elevation.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            username = (row.get("username") or "").strip()
+            if not username or not row.get("password"):
+                continue
+            county = row.get("county") or "Nairobi"
+            user = {
+                "password": row["password"],
+                "email": row.get("email", ""),
+                "county": county if is_kenya_county(county) else "Nairobi",
+                "farm_type": row.get("farm_type") or "mixed",
+                "crops": [crop.strip() for crop in (row.get("crops") or "Maize").split(";") if crop.strip()],
+                "livestock": [animal.strip() for animal in (row.get("livestock") or "").split(";") if animal.strip()],
+                "farm_size": float(row.get("farm_size") or 1.0),
+                "soil_type": row.get("soil_type") or "Loam"
+            }
+            if row.get("lat") and row.get("lng"):
+                user["coordinates"] = {"lat": float(row["lat"]), "lng": float(row["lng"])}
+            if row.get("elevation"):
+                user["elevation"] = float(row["elevation"])
+            yield username, user
+
+user_repository = create_user_repository()
+
 animal_records = []
 market_prices = []
 weather_data = []
-tokens = {}
+
+# ================= COUNTY SPATIAL INDEX =================
+def box_polygon(lat_range, lng_range):
+    """Rectangle ring as (lat, lng) vertices"""
+    (south, north), (west, east) = lat_range, lng_range
+    return [(south, west), (south, east), (north, east), (north, west)]
+
+def load_county_polygons(path=None):
+    """County rings as (county, [(lat, lng), ...]) in lookup priority order
+    
+    Without a path these are the approximate KENYA_COUNTY_BOXES rectangles; with one, the
+    outlines in that GeoJSON file.
+    """
+    if not path:
+        return [(county, box_polygon(lat_range, lng_range)) for county, lat_range, lng_range in KENYA_COUNTY_BOXES]
+    
+    with open(path) as f:
+        collection = json.load(f)
+    
+    polygons = []
+    for feature in collection.get("features", []):
+        properties = feature.get("properties") or {}
+        name = properties.get("name") or properties.get("county") or properties.get("COUNTY_NAM") or properties.get("shapeName")
+        geometry = feature.get("geometry") or {}
+        
+        if geometry.get("type") == "Polygon":
+            rings = [geometry["coordinates"][0]]
+        elif geometry.get("type") == "MultiPolygon":
+            rings = [polygon[0] for polygon in geometry["coordinates"]]
+        else:
+            continue
+        
+        # Outer rings only; GeoJSON positions are [lng, lat]
+        for ring in rings:
+            polygons.append((normalize_county_name(name), [(point[1], point[0]) for point in ring]))
+    
+    return polygons
+
+def point_in_polygon(lat, lng, ring):
+    """Even-odd ray casting test of one point against one ring"""
+    inside = False
+    lat_j, lng_j = ring[-1]
+    for lat_i, lng_i in ring:
+        if (lat_i > lat) != (lat_j > lat) and lng < (lng_j - lng_i) * (lat - lat_i) / (lat_j - lat_i) + lng_i:
+            inside = not inside
+        lat_j, lng_j = lat_i, lng_i
+    return inside
+
+def points_in_polygon(lats, lngs, ring_array):
+    """Vectorized even-odd test of many points against one ring"""
+    inside = np.zeros(lats.shape, dtype=bool)
+    ring_lats = ring_array[:, 0]
+    ring_lngs = ring_array[:, 1]
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for lat_i, lng_i, lat_j, lng_j in zip(ring_lats, ring_lngs, np.roll(ring_lats, 1), np.roll(ring_lngs, 1)):
+            inside ^= ((lat_i > lats) != (lat_j > lats)) & (lngs < (lng_j - lng_i) * (lats - lat_i) / (lat_j - lat_i) + lng_i)
+    
+    return inside
+
+class CountyIndex:
+    """Grid-bucketed point-in-polygon index over county rings; the first ring containing a point wins"""
+    
+    def __init__(self, polygons, cell_size=0.25, source="approximate boxes (built-in)"):
+        self.cell_size = cell_size
+        self.source = source
+        self.polygons = []  # (county, ring, (south, north, west, east), ring as array)
+        self.grid = {}  # (row, col) -> polygon indexes whose bounding box touches the cell, in priority order
+        
+        for index, (county, ring) in enumerate(polygons):
+            lats = [point[0] for point in ring]
+            lngs = [point[1] for point in ring]
+            bbox = (min(lats), max(lats), min(lngs), max(lngs))
+            self.polygons.append((county, ring, bbox, np.array(ring, dtype=float)))
+            
+            for row in range(self.cell(bbox[0]), self.cell(bbox[1]) + 1):
+                for col in range(self.cell(bbox[2]), self.cell(bbox[3]) + 1):
+                    self.grid.setdefault((row, col), []).append(index)
+    
+    def cell(self, degrees):
+        return int(degrees // self.cell_size)
+    
+    def lookup(self, lat, lng):
+        for index in self.grid.get((self.cell(lat), self.cell(lng)), ()):
+            county, ring, (south, north, west, east), _ = self.polygons[index]
+            if south <= lat <= north and west <= lng <= east and point_in_polygon(lat, lng, ring):
+                return county
+        return "Other"
+    
+    def lookup_many(self, lats, lngs):
+        """Vectorized lookup of many points; returns county names in input order"""
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        counties = np.full(lats.shape, "Other", dtype=object)
+        unresolved = np.ones(lats.shape, dtype=bool)
+        
+        for county, ring, (south, north, west, east), ring_array in self.polygons:
+            candidates = np.flatnonzero(unresolved & (lats >= south) & (lats <= north) & (lngs >= west) & (lngs <= east))
+            if candidates.size == 0:
+                continue
+            
+            inside = candidates[points_in_polygon(lats[candidates], lngs[candidates], ring_array)]
+            counties[inside] = county
+            unresolved[inside] = False
+        
+        return counties.tolist()
+    
+    def stats(self):
+        return {"source": os.path.basename(self.source), "rings": len(self.polygons), "grid_cells": len(self.grid)}
+
+county_index = CountyIndex(
+    load_county_polygons(KENYA_COUNTY_BOUNDARIES_FILE),
+    source=KENYA_COUNTY_BOUNDARIES_FILE or "approximate boxes (built-in)"
+)
+
+# ================= AUTH TOKENS =================
+class TokenStore:
+    """Server-side opaque tokens with sliding expiry, a per-user cap and O(1) revocation
+    
+    Expiry is filed in per-minute buckets. Sliding refresh only moves a token's deadline;
+    the sweeper re-files it when its old bucket comes due, so each sweep touches only
+    tokens that were due in the elapsed minutes.
+    """
+    
+    mode = "opaque"
+    
+    def __init__(self, ttl, max_lifetime, max_per_user):
+        self.ttl = ttl
+        self.max_lifetime = max_lifetime
+        self.max_per_user = max_per_user
+        self.tokens = {}  # token -> [username, issued_at, expires_at]
+        self.by_user = {}  # username -> OrderedDict of that user's tokens, oldest first
+        self.expiry_buckets = {}  # minute -> set of tokens filed to expire in it
+        self.lock = threading.Lock()
+        self.issued = 0
+        self.expired = 0
+        self.revoked = 0
+    
+    def file(self, token, expires_at):
+        # Caller must hold self.lock
+        self.expiry_buckets.setdefault(int(expires_at // 60) + 1, set()).add(token)
+    
+    def remove(self, token):
+        # Caller must hold self.lock; the expiry bucket entry is skipped when swept
+        entry = self.tokens.pop(token, None)
+        if entry is not None:
+            user_tokens = self.by_user[entry[0]]
+            del user_tokens[token]
+            if not user_tokens:
+                del self.by_user[entry[0]]
+        return entry
+    
+    def issue(self, username):
+        """Return (token, expires_at) for a new session"""
+        token = secrets.token_urlsafe(32)
+        now = time.time()
+        with self.lock:
+            self.tokens[token] = [username, now, now + self.ttl]
+            user_tokens = self.by_user.setdefault(username, OrderedDict())
+            user_tokens[token] = None
+            self.file(token, now + self.ttl)
+            self.issued += 1
+            while len(user_tokens) > self.max_per_user:
+                self.remove(next(iter(user_tokens)))
+                self.revoked += 1
+        return token, now + self.ttl
+    
+    def verify(self, token):
+        """Return the username for a live token and push its expiry forward, or None"""
+        now = time.time()
+        with self.lock:
+            entry = self.tokens.get(token)
+            if entry is None:
+                return None
+            if now >= entry[2]:
+                self.remove(token)
+                self.expired += 1
+                return None
+            entry[2] = min(now + self.ttl, entry[1] + self.max_lifetime)
+            return entry[0]
+    
+    def revoke(self, token):
+        with self.lock:
+            removed = self.remove(token) is not None
+            self.revoked += removed
+        return removed
+    
+    def revoke_user(self, username):
+        """Revoke every session of a user; returns how many were live"""
+        with self.lock:
+            user_tokens = list(self.by_user.get(username, ()))
+            for token in user_tokens:
+                self.remove(token)
+            self.revoked += len(user_tokens)
+        return len(user_tokens)
+    
+    def sweep(self):
+        now = time.time()
+        with self.lock:
+            due = [minute for minute in self.expiry_buckets if minute * 60 <= now]
+        for minute in due:
+            with self.lock:
+                for token in self.expiry_buckets.pop(minute, ()):
+                    entry = self.tokens.get(token)
+                    if entry is None:
+                        continue
+                    if entry[2] <= now:
+                        self.remove(token)
+                        self.expired += 1
+                    else:
+                        self.file(token, entry[2])
+    
+    def stats(self):
+        with self.lock:
+            return {
+                "mode": self.mode,
+                "active": len(self.tokens),
+                "users": len(self.by_user),
+                "issued": self.issued,
+                "expired": self.expired,
+                "revoked": self.revoked
+            }
+
+class SignedTokenStore:
+    """Stateless HS256 tokens: verification needs only the secret; revocations are the only shared state"""
+    
+    mode = "jwt"
+    
+    def __init__(self, secret, ttl):
+        self.secret = secret
+        self.ttl = ttl
+        self.denylist = {}  # jti -> exp of individually revoked tokens
+        self.revoked_before = {}  # username -> time; tokens issued earlier were revoked by logout-all
+        self.lock = threading.Lock()
+        self.issued = 0
+        self.revoked = 0
+    
+    def issue(self, username):
+        now = time.time()
+        claims = {"sub": username, "iat": now, "exp": now + self.ttl, "jti": uuid.uuid4().hex}
+        with self.lock:
+            self.issued += 1
+        return jwt.encode(claims, self.secret, algorithm="HS256"), now + self.ttl
+    
+    def decode(self, token):
+        try:
+            return jwt.decode(token, self.secret, algorithms=["HS256"])
+        except jwt.InvalidTokenError:
+            return None
+    
+    def verify(self, token):
+        claims = self.decode(token)
+        if claims is None:
+            return None
+        with self.lock:
+            if claims["jti"] in self.denylist or claims["iat"] < self.revoked_before.get(claims["sub"], 0):
+                return None
+        return claims["sub"]
+    
+    def revoke(self, token):
+        claims = self.decode(token)
+        if claims is None:
+            return False
+        with self.lock:
+            self.denylist[claims["jti"]] = claims["exp"]
+            self.revoked += 1
+        return True
+    
+    def revoke_user(self, username):
+        # Live sessions are not tracked in this mode, so the count is unknown
+        with self.lock:
+            self.revoked_before[username] = time.time()
+        return None
+    
+    def sweep(self):
+        # Revocations only matter until the tokens they cover would have expired anyway
+        now = time.time()
+        with self.lock:
+            self.denylist = {jti: exp for jti, exp in self.denylist.items() if exp > now}
+            self.revoked_before = {user: at for user, at in self.revoked_before.items() if at > now - self.ttl}
+    
+    def stats(self):
+        with self.lock:
+            return {
+                "mode": self.mode,
+                "issued": self.issued,
+                "revoked": self.revoked,
+                "denylist": len(self.denylist)
+            }
+
+def create_token_store():
+    """Build the token store for SMART_FARMER_TOKEN_MODE"""
+    if TOKEN_MODE == "jwt":
+        if jwt is None:
+            raise RuntimeError("SMART_FARMER_TOKEN_MODE=jwt requires PyJWT (pip install pyjwt)")
+        secret = TOKEN_SECRET
+        if not secret:
+            print("⚠️  SMART_FARMER_TOKEN_SECRET is not set; signed tokens will not survive a restart")
+            secret = secrets.token_hex(32)
+        return SignedTokenStore(secret, TOKEN_TTL)
+    return TokenStore(TOKEN_TTL, TOKEN_MAX_LIFETIME, TOKEN_MAX_PER_USER)
+
+def start_token_sweeper(store, interval):
+    """Sweep expired tokens and stale revocations on a daemon thread"""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                store.sweep()
+            except Exception as e:
+                print(f"Token sweep error: {e}")
+    
+    sweeper = threading.Thread(target=run, name="smart-farmer-token-sweeper", daemon=True)
+    sweeper.start()
+    return sweeper
+
+token_store = create_token_store()
+
+# ================= CREDENTIALS =================
+PASSWORD_SCHEMES = {"scrypt": 3, "pbkdf2_sha256": 1}  # scheme -> number of cost parameters in the encoding
+
+def password_cost(scheme):
+    if scheme == "pbkdf2_sha256":
+        return [PBKDF2_ITERATIONS]
+    return [SCRYPT_COST, SCRYPT_BLOCK_SIZE, SCRYPT_PARALLELISM]
+
+def derive_password_key(scheme, cost, password, salt):
+    if scheme == "pbkdf2_sha256":
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, cost[0])
+    n, r, p = cost
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=128 * r * (n + p + 2) + 1024 * 1024, dklen=32)
+
+def hash_password(password):
+    """Encode a password as scheme$cost...$salt$key with the configured scheme and a fresh salt"""
+    salt = os.urandom(16)
+    cost = password_cost(PASSWORD_SCHEME)
+    key = derive_password_key(PASSWORD_SCHEME, cost, password, salt)
+    return "$".join([PASSWORD_SCHEME, *map(str, cost), base64.b64encode(salt).decode(), base64.b64encode(key).decode()])
+
+def is_password_hash(value):
+    parts = value.split("$")
+    return parts[0] in PASSWORD_SCHEMES and len(parts) == PASSWORD_SCHEMES[parts[0]] + 3
+
+def verify_password(password, stored):
+    """Return (matches, needs_rehash); anything that is not an encoded hash is a legacy plaintext password"""
+    if not is_password_hash(stored):
+        return hmac.compare_digest(password.encode(), stored.encode()), True
+    
+    parts = stored.split("$")
+    scheme, cost = parts[0], [int(value) for value in parts[1:-2]]
+    key = derive_password_key(scheme, cost, password, base64.b64decode(parts[-2]))
+    matches = hmac.compare_digest(key, base64.b64decode(parts[-1]))
+    return matches, scheme != PASSWORD_SCHEME or cost != password_cost(PASSWORD_SCHEME)
+
+@functools.lru_cache(maxsize=1)
+def dummy_password_hash():
+    return hash_password(secrets.token_hex(16))
+
+def check_credentials(username, password):
+    """Return the user if the password matches, upgrading legacy or outdated hashes on the way"""
+    user = user_repository.get(username) if isinstance(username, str) and username else None
+    if user is None or not isinstance(password, str):
+        # Do the same work as a real check so timing does not reveal which usernames exist
+        verify_password(str(password), dummy_password_hash())
+        return None
+    
+    matches, needs_rehash = verify_password(password, user["password"])
+    if not matches:
+        return None
+    if needs_rehash:
+        user_repository.update_password(username, hash_password(password))
+    return user
+
+def authenticate(username, password):
+    """Check credentials on the credential pool instead of the request thread"""
+    return CREDENTIAL_EXECUTOR.submit(check_credentials, username, password).result()
+
+def hash_new_password(password):
+    return CREDENTIAL_EXECUTOR.submit(hash_password, password).result()
+
+def hash_user_passwords(users, batch_size=256):
+    """Hash plaintext passwords of (username, user) pairs across the credential pool, keeping input order"""
+    def hashed(user):
+        if not is_password_hash(user["password"]):
+            user["password"] = hash_password(user["password"])
+        return user
+    
+    batch = []
+    for pair in users:
+        batch.append(pair)
+        if len(batch) == batch_size:
+            yield from zip([username for username, _ in batch], CREDENTIAL_EXECUTOR.map(hashed, [user for _, user in batch]))
+            batch = []
+    if batch:
+        yield from zip([username for username, _ in batch], CREDENTIAL_EXECUTOR.map(hashed, [user for _, user in batch]))
 
 # ================= HELPER FUNCTIONS =================
 def generate_token(username):
-    token = str(uuid.uuid4())
-    tokens[token] = username
+    token, _ = token_store.issue(username)
     return token
 
 def verify_token(token):
-    return tokens.get(token)
+    return token_store.verify(token)
 
-def get_user_from_token(auth_header):
+def bearer_token(auth_header):
     if not auth_header or not auth_header.startswith("Bearer "):
         return None
-    token = auth_header[7:]
-    return verify_token(token)
+    return auth_header[7:]
+
+def get_user_from_token(auth_header):
+    token = bearer_token(auth_header)
+    return verify_token(token) if token else None
+
+def parse_coordinates(lat, lng):
+    """(lat, lng) as floats; ValueError unless both are finite and on the globe"""
+    lat, lng = float(lat), float(lng)
+    if not (math.isfinite(lat) and math.isfinite(lng)) or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError(f"coordinates out of range: {lat}, {lng}")
+    return lat, lng
 
 def get_county_from_coords(lat, lng):
-    """Simple function to get county from coordinates"""
-    # Improved county detection
-    county_coordinates = {
-        "Nairobi": {"lat_range": (-1.45, -1.15), "lng_range": (36.65, 37.05)},
-        "Kiambu": {"lat_range": (-1.30, -0.80), "lng_range": (36.50, 37.20)},
-        "Nakuru": {"lat_range": (-0.90, 0.10), "lng_range": (35.50, 36.50)},
-        "Kisumu": {"lat_range": (-0.30, 0.30), "lng_range": (34.50, 35.20)},
-        "Mombasa": {"lat_range": (-4.20, -3.90), "lng_range": (39.50, 39.80)},
-        "Machakos": {"lat_range": (-1.80, -1.20), "lng_range": (37.10, 37.60)},
-        "Meru": {"lat_range": (-0.50, 0.50), "lng_range": (37.50, 38.20)},
-        "Kakamega": {"lat_range": (0.10, 0.60), "lng_range": (34.50, 35.10)},
-        "Uasin Gishu": {"lat_range": (0.30, 0.80), "lng_range": (35.10, 35.60)},
-        "Kericho": {"lat_range": (-0.50, 0.00), "lng_range": (35.00, 35.50)},
-    }
-    
-    for county, ranges in county_coordinates.items():
-        if (ranges["lat_range"][0] <= lat <= ranges["lat_range"][1] and 
-            ranges["lng_range"][0] <= lng <= ranges["lng_range"][1]):
-            return county
-    
-    # Fallback logic
-    if -1.5 <= lat <= -1.0 and 36.5 <= lng <= 37.0:
-        return "Nairobi"
-    elif -1.0 <= lat <= 0.5 and 36.0 <= lng <= 37.0:
-        return "Kiambu"
-    elif -0.5 <= lat <= 0.5 and 35.0 <= lng <= 36.0:
-        return "Nakuru"
-    elif -0.5 <= lat <= 0.5 and 34.5 <= lng <= 35.5:
-        return "Kisumu"
-    elif -4.5 <= lat <= -3.5 and 39.0 <= lng <= 40.0:
-        return "Mombasa"
-    
-    return "Other"
+    """Resolve the county containing the coordinates (approximate unless a boundaries file is set)"""
+    return county_index.lookup(lat, lng)
+
+def get_counties_from_coords(coordinates):
+    """Resolve the counties for many (lat, lng) pairs at once, in input order"""
+    if not coordinates:
+        return []
+    lats, lngs = zip(*coordinates)
+    return county_index.lookup_many(lats, lngs)
 
 def get_kenya_region(lat, lng):
     """Determine Kenya region from coordinates"""
@@ -183,6 +1099,368 @@ def calculate_feels_like(temp, humidity):
     else:
         return temp + 0.05 * humidity
 
+# ================= OUTBOUND HTTP CLIENT =================
+def create_outbound_session():
+    """Build the shared session with per-host keep-alive pools and retries for GETs"""
+    retry = Retry(
+        total=OUTBOUND_RETRIES,
+        backoff_factor=OUTBOUND_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),  # POSTs (Plant.id) are never replayed
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=OUTBOUND_POOL_HOSTS, pool_maxsize=OUTBOUND_POOL_SIZE, max_retries=retry)
+    
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+OUTBOUND_SESSION = create_outbound_session()
+
+def http_get(url, timeout=10, **kwargs):
+    """GET through the shared connection pool"""
+    return OUTBOUND_SESSION.get(url, timeout=timeout, **kwargs)
+
+def http_post(url, timeout=30, **kwargs):
+    """POST through the shared connection pool"""
+    return OUTBOUND_SESSION.post(url, timeout=timeout, **kwargs)
+
+def get_outbound_pool_stats():
+    """Per-upstream request and connection reuse counts from the shared pool"""
+    stats = {}
+    pools = OUTBOUND_SESSION.get_adapter("https://").poolmanager.pools
+    
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        
+        opened = pool.num_connections
+        made = pool.num_requests
+        stats[f"{pool.scheme}://{pool.host}"] = {
+            "requests": made,
+            "connections_opened": opened,
+            "connections_reused": max(0, made - opened)
+        }
+    
+    return stats
+
+# ================= CACHING =================
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry and single-flight loading"""
+    
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (stored_at, value), least recently used first
+        self.inflight = {}  # key -> Future shared by concurrent misses
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+    
+    def store(self, key, value, stored_at):
+        # Caller must hold self.lock
+        self.entries[key] = (stored_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+    
+    def get(self, key):
+        """Return (value, stored_at) for a fresh entry, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[0]
+    
+    def put(self, key, value):
+        stored_at = time.time()
+        with self.lock:
+            self.store(key, value, stored_at)
+        return stored_at
+    
+    def peek(self, key, fresh=False):
+        """Return (value, stored_at) without touching the hit/miss counters, or None
+        
+        Expired entries are returned too (to serve stale data) unless fresh is set.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or (fresh and time.time() - entry[0] > self.ttl):
+                return None
+            if fresh:
+                self.entries.move_to_end(key)
+        stored_at, value = entry
+        return value, stored_at
+    
+    def count(self, hits=0, misses=0):
+        """Record lookups a caller resolved through peek() and put() instead of get()"""
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+    
+    def get_or_load(self, key, loader, cacheable=None):
+        """Return (value, stored_at, hit); concurrent misses on one key share a single loader call"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry[0] <= self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[0], True
+            
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.inflight[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        
+        if not leader:
+            value, stored_at = future.result()
+            return value, stored_at, False
+        
+        try:
+            value = loader()
+        except BaseException as e:
+            with self.lock:
+                self.inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        
+        stored_at = time.time()
+        with self.lock:
+            if cacheable is None or cacheable(value):
+                self.store(key, value, stored_at)
+            self.inflight.pop(key, None)
+        future.set_result((value, stored_at))
+        return value, stored_at, False
+    
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+def snap_to_grid(lat, lng, resolution):
+    """Snap coordinates to the centre of their grid cell"""
+    return (
+        round(round(lat / resolution) * resolution, 6),
+        round(round(lng / resolution) * resolution, 6)
+    )
+
+class SoilPropertyStore:
+    """SQLite store of raw SoilGrids values keyed by quantized coordinates"""
+    
+    def __init__(self, path, resolution):
+        self.path = path
+        self.resolution = resolution
+        self.lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS soil_properties (
+                resolution REAL NOT NULL,
+                cell_lat INTEGER NOT NULL,
+                cell_lng INTEGER NOT NULL,
+                properties TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (resolution, cell_lat, cell_lng)
+            )
+        """)
+        self.conn.commit()
+    
+    def cell(self, lat, lng):
+        return round(lat / self.resolution), round(lng / self.resolution)
+    
+    def cell_centre(self, lat, lng):
+        return snap_to_grid(lat, lng, self.resolution)
+    
+    def get(self, lat, lng):
+        """Return the stored raw properties for the cell containing (lat, lng), or None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT properties FROM soil_properties WHERE resolution = ? AND cell_lat = ? AND cell_lng = ?",
+                (self.resolution, *self.cell(lat, lng))
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def put(self, lat, lng, properties):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO soil_properties VALUES (?, ?, ?, ?, ?)",
+                (self.resolution, *self.cell(lat, lng), json.dumps(properties), time.time())
+            )
+            self.conn.commit()
+    
+    def stats(self):
+        with self.lock:
+            cells = self.conn.execute("SELECT COUNT(*) FROM soil_properties WHERE resolution = ?", (self.resolution,)).fetchone()[0]
+        return {"cells": cells, "resolution": self.resolution}
+
+soil_store = SoilPropertyStore(SOIL_CACHE_PATH, SOIL_CACHE_RESOLUTION)
+
+class DetectionResultStore:
+    """SQLite tier behind the in-memory detection cache, keyed by image digest and crop"""
+    
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS detection_results (
+                cache_key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                stored_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+    
+    def get(self, key):
+        """Return the stored diagnosis if it is still fresh, or None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT result FROM detection_results WHERE cache_key = ? AND stored_at >= ?",
+                (key, time.time() - self.ttl)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def put(self, key, result):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO detection_results VALUES (?, ?, ?)",
+                (key, json.dumps(result), time.time())
+            )
+            self.conn.commit()
+    
+    def stats(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT COUNT(*) FROM detection_results").fetchone()[0]
+        return {"entries": rows}
+
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)  # Set bits per 16-bit word
+
+class NearDuplicateIndex:
+    """Multi-index hashing over 64-bit image fingerprints for Hamming-radius lookups
+    
+    Each fingerprint is split into four 16-bit bands, each with its own hash table. Two
+    fingerprints within the threshold must agree to within threshold // 4 bits on at least
+    one band, so a lookup probes a few dozen buckets instead of scanning every entry, then
+    checks the candidates' full distances in one NumPy pass.
+    
+    At 1M fingerprints of one crop a lookup takes about 0.5 ms, but the index alone takes
+    about 0.5 GB before counting the diagnoses it keeps, so NEAR_DUPLICATE_INDEX_SIZE
+    defaults to 100000 (about 0.1 ms, 90 MB) and is raised per deployment.
+    """
+    
+    BANDS = 4
+    BAND_BITS = 16
+    
+    def __init__(self, maxsize, threshold, ttl):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.ttl = ttl
+        band_radius = threshold // self.BANDS
+        self.probe_masks = [0] + [1 << i for i in range(self.BAND_BITS)] if band_radius >= 1 else [0]
+        if band_radius >= 2:
+            self.probe_masks += [(1 << i) | (1 << j) for i in range(self.BAND_BITS) for j in range(i + 1, self.BAND_BITS)]
+        
+        # Fixed ring of slots; once full, each insert overwrites the oldest entry
+        self.fingerprints = np.zeros(maxsize, dtype=np.uint64)
+        self.stored_at = np.zeros(maxsize, dtype=np.float64)
+        self.slots = [None] * maxsize  # slot -> (crop_type, result)
+        self.buckets = [{} for _ in range(self.BANDS)]  # (crop_type, band value) -> set of slots
+        self.next_slot = 0
+        self.size = 0
+        self.lock = threading.Lock()
+        self.lookups = 0
+        self.matches = 0
+        self.candidates = 0
+    
+    def bands(self, fingerprint):
+        mask = (1 << self.BAND_BITS) - 1
+        return [(fingerprint >> (band * self.BAND_BITS)) & mask for band in range(self.BANDS)]
+    
+    def find(self, fingerprint, crop_type):
+        """Return (result, distance) for the closest recent entry within the threshold, or None"""
+        candidates = set()
+        with self.lock:
+            self.lookups += 1
+            for bucket, value in zip(self.buckets, self.bands(fingerprint)):
+                for mask in self.probe_masks:
+                    slots = bucket.get((crop_type, value ^ mask))
+                    if slots:
+                        candidates.update(slots)
+            self.candidates += len(candidates)
+            if not candidates:
+                return None
+            
+            slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            words = (self.fingerprints[slots] ^ np.uint64(fingerprint)).view(np.uint16)
+            distances = POPCOUNT_TABLE[words[0::4]] + POPCOUNT_TABLE[words[1::4]] + POPCOUNT_TABLE[words[2::4]] + POPCOUNT_TABLE[words[3::4]]
+            distances[self.stored_at[slots] < time.time() - self.ttl] = self.threshold + 1
+            best = int(distances.argmin())
+            if distances[best] > self.threshold:
+                return None
+            self.matches += 1
+            return self.slots[slots[best]][1], int(distances[best])
+    
+    def add(self, fingerprint, crop_type, result):
+        with self.lock:
+            slot = self.next_slot
+            self.next_slot = (slot + 1) % self.maxsize
+            if self.slots[slot] is not None:
+                self.unlink(slot)
+            else:
+                self.size += 1
+            
+            self.fingerprints[slot] = fingerprint
+            self.stored_at[slot] = time.time()
+            self.slots[slot] = (crop_type, result)
+            for bucket, value in zip(self.buckets, self.bands(fingerprint)):
+                bucket.setdefault((crop_type, value), set()).add(slot)
+    
+    def unlink(self, slot):
+        # Caller must hold self.lock
+        crop_type = self.slots[slot][0]
+        for bucket, value in zip(self.buckets, self.bands(int(self.fingerprints[slot]))):
+            key = (crop_type, value)
+            slots = bucket[key]
+            slots.discard(slot)
+            if not slots:
+                del bucket[key]
+    
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": self.size,
+                "threshold": self.threshold,
+                "lookups": self.lookups,
+                "matches": self.matches,
+                "avg_candidates": round(self.candidates / self.lookups, 1) if self.lookups else 0.0
+            }
+
+detection_cache = TTLCache(DETECTION_CACHE_SIZE, DETECTION_CACHE_TTL)
+near_duplicate_index = NearDuplicateIndex(NEAR_DUPLICATE_INDEX_SIZE, NEAR_DUPLICATE_THRESHOLD, NEAR_DUPLICATE_TTL)
+detection_disk = DetectionResultStore(DETECTION_CACHE_PATH, DETECTION_CACHE_TTL) if DETECTION_CACHE_PATH else None
+
 # ================= KENYA WEATHER FUNCTIONS =================
 def get_kenya_weather_advice(region, condition, current_data):
     """Get farming advice based on Kenya weather"""
@@ -225,7 +1503,7 @@ def get_kenya_weather_advice(region, condition, current_data):
 def get_mock_kenya_weather(lat, lng):
     """Mock weather data for Kenya"""
     region = get_kenya_region(lat, lng)
-    zone = KENYA_WEATHER_ZONES.get(region, {"temp_range": (20, 30), "rainfall": (500, 1000)})
+    zone = weather_zone(region)
     
     temp_min, temp_max = zone["temp_range"]
     current_temp = (temp_min + temp_max) / 2
@@ -314,13 +1592,115 @@ def get_rainfall_outlook(region):
     return outlooks.get(region, {}).get(season, "Rainfall data not available")
 
 # ================= REAL-TIME WEATHER API =================
+weather_cache = TTLCache(WEATHER_CACHE_SIZE, WEATHER_CACHE_TTL)
+
 def get_real_time_weather(lat, lng):
+    """Get weather for a location, shared by every farm in the same grid cell"""
+    cell = snap_to_grid(lat, lng, WEATHER_CACHE_RESOLUTION)
+    
+    # Only live upstream results are cached; mock fallbacks carry no "source"
+    weather, stored_at, hit = weather_cache.get_or_load(
+        cell,
+        lambda: fetch_real_time_weather(*cell),
+        cacheable=lambda result: "source" in result
+    )
+    
+    return {
+        **weather,
+        "county": get_county_from_coords(lat, lng),
+        "cached": hit,
+        "cache_age_seconds": round(time.time() - stored_at, 1)
+    }
+
+def get_stale_weather(lat, lng):
+    """Last cached forecast for the grid cell regardless of age, or None"""
+    entry = weather_cache.peek(snap_to_grid(lat, lng, WEATHER_CACHE_RESOLUTION))
+    if entry is None:
+        return None
+    
+    weather, stored_at = entry
+    return {
+        **weather,
+        "county": get_county_from_coords(lat, lng),
+        "cached": True,
+        "stale": True,
+        "cache_age_seconds": round(time.time() - stored_at, 1)
+    }
+
+def get_weather_batch(coordinates):
+    """Weather for many farms with one fetch per unique grid cell; results follow input order"""
+    cells = [snap_to_grid(lat, lng, WEATHER_CACHE_RESOLUTION) for lat, lng in coordinates]
+    unique_cells = list(dict.fromkeys(cells))
+    
+    # peek() leaves the counters alone: every cell is counted exactly once below, or by get_or_load
+    weather_by_cell = {}
+    missing = []
+    for cell in unique_cells:
+        entry = weather_cache.peek(cell, fresh=True)
+        if entry is not None:
+            weather_by_cell[cell] = (entry[0], entry[1], True)
+        else:
+            missing.append(cell)
+    weather_cache.count(hits=len(unique_cells) - len(missing))
+    
+    summary = {"farms": len(coordinates), "unique_cells": len(unique_cells), "cache_hits": len(unique_cells) - len(missing), "fetched": 0, "coalesced": 0, "upstream_requests": 0}
+    
+    # Without a WeatherAPI key every cell would end up on Open-Meteo anyway, so ask for many cells per request
+    leftover = missing
+    if missing and API_KEYS["weather_api"] == "89ff55d7fb45469c8f8175443250512":
+        chunks = [missing[i:i + OPEN_METEO_BATCH_SIZE] for i in range(0, len(missing), OPEN_METEO_BATCH_SIZE)]
+        futures = {OUTBOUND_EXECUTOR.submit(fetch_open_meteo_batch, chunk): chunk for chunk in chunks}
+        summary["upstream_requests"] += len(chunks)
+        
+        leftover = []
+        for future, chunk in futures.items():
+            try:
+                for cell, weather in future.result().items():
+                    weather_by_cell[cell] = (weather, weather_cache.put(cell, weather), False)
+                weather_cache.count(misses=len(chunk))
+                summary["fetched"] += len(chunk)
+            except Exception as e:
+                print(f"Open-Meteo batch error: {e}")
+                leftover.extend(chunk)
+    
+    # Remaining cells go through the single-cell path concurrently (cache, single-flight and fallbacks included);
+    # only loaders that actually run reach the upstream, so they are what gets counted
+    loaded = []
+    
+    def load(cell):
+        loaded.append(cell)
+        return fetch_real_time_weather(*cell)
+    
+    futures = {cell: OUTBOUND_EXECUTOR.submit(weather_cache.get_or_load, cell, lambda cell=cell: load(cell), lambda result: "source" in result) for cell in leftover}
+    for cell, future in futures.items():
+        weather_by_cell[cell] = future.result()
+        if weather_by_cell[cell][2]:
+            summary["cache_hits"] += 1
+    summary["fetched"] += len(loaded)
+    summary["coalesced"] = len(leftover) - len(loaded) - sum(1 for cell in leftover if weather_by_cell[cell][2])
+    summary["upstream_requests"] += len(loaded)
+    
+    counties = get_counties_from_coords(coordinates)
+    now = time.time()
+    results = []
+    for (lat, lng), cell, county in zip(coordinates, cells, counties):
+        weather, stored_at, hit = weather_by_cell[cell]
+        results.append({
+            **weather,
+            "county": county,
+            "cached": hit,
+            "cache_age_seconds": round(now - stored_at, 1)
+        })
+    
+    return results, summary
+
+def fetch_real_time_weather(lat, lng):
     """Get real-time weather using WeatherAPI.com (more accurate for Africa)"""
     try:
         if API_KEYS["weather_api"] != "89ff55d7fb45469c8f8175443250512":
             url = f"http://api.weatherapi.com/v1/forecast.json?key={API_KEYS['weather_api']}&q={lat},{lng}&days=7&aqi=no&alerts=yes"
             
-            response = requests.get(url, timeout=10)
+            response = http_get(url, timeout=10)
             data = response.json()
             
             if "error" in data:
@@ -406,77 +1786,86 @@ def get_kenya_region_from_location(location_data):
     
     return get_kenya_region(location_data.get("lat", 0), location_data.get("lon", 0))
 
+OPEN_METEO_QUERY = "current=temperature_2m,relative_humidity_2m,precipitation,weather_code,wind_speed_10m,wind_direction_10m,pressure_msl&daily=temperature_2m_max,temperature_2m_min,precipitation_sum,weather_code,wind_speed_10m_max&timezone=Africa/Nairobi&forecast_days=7"
+
 def get_open_meteo_weather(lat, lng):
     """Fallback weather using Open-Meteo API"""
     try:
-        url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lng}&current=temperature_2m,relative_humidity_2m,precipitation,weather_code,wind_speed_10m,wind_direction_10m,pressure_msl&daily=temperature_2m_max,temperature_2m_min,precipitation_sum,weather_code,wind_speed_10m_max&timezone=Africa/Nairobi&forecast_days=7"
-        
-        response = requests.get(url, timeout=10)
-        data = response.json()
+        url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lng}&{OPEN_METEO_QUERY}"
         
-        # Weather code mapping
-        weather_codes = {
-            0: "Clear sky", 1: "Mainly clear", 2: "Partly cloudy", 3: "Overcast",
-            45: "Foggy", 48: "Depositing rime fog",
-            51: "Light drizzle", 53: "Moderate drizzle", 55: "Dense drizzle",
-            61: "Slight rain", 63: "Moderate rain", 65: "Heavy rain",
-            71: "Slight snow", 73: "Moderate snow", 75: "Heavy snow",
-            80: "Slight rain showers", 81: "Moderate rain showers", 82: "Violent rain showers",
-            85: "Slight snow showers", 86: "Heavy snow showers",
-            95: "Thunderstorm", 96: "Thunderstorm with slight hail", 99: "Thunderstorm with heavy hail"
-        }
-        
-        region = get_kenya_region(lat, lng)
-        current = data.get("current", {})
-        daily = data.get("daily", {})
-        
-        current_code = current.get("weather_code", 0)
-        current_weather = weather_codes.get(current_code, "Clear sky")
-        
-        # Generate forecast
-        forecast = []
-        times = daily.get("time", [])[:7]
-        
-        for i in range(min(7, len(times))):
-            day_code = daily.get("weather_code", [0]*7)[i]
-            forecast.append({
-                "date": times[i],
-                "condition": weather_codes.get(day_code, "Clear sky"),
-                "temp_max": daily.get("temperature_2m_max", [25]*7)[i],
-                "temp_min": daily.get("temperature_2m_min", [15]*7)[i],
-                "precipitation": daily.get("precipitation_sum", [0]*7)[i],
-                "wind_speed": daily.get("wind_speed_10m_max", [0]*7)[i]
-            })
-        
-        # Get farming advice
-        weather_advice = get_kenya_weather_advice(region, current_weather, current)
-        
-        return {
-            "success": True,
-            "source": "Open-Meteo",
-            "region": region,
-            "county": get_county_from_coords(lat, lng),
-            "current": {
-                "temperature": current.get("temperature_2m"),
-                "humidity": current.get("relative_humidity_2m"),
-                "precipitation": current.get("precipitation", 0),
-                "condition": current_weather,
-                "feels_like": calculate_feels_like(current.get("temperature_2m", 25), current.get("relative_humidity_2m", 60)),
-                "wind_speed": current.get("wind_speed_10m"),
-                "wind_direction": current.get("wind_direction_10m"),
-                "pressure": current.get("pressure_msl"),
-                "uv_index": None
-            },
-            "forecast": forecast,
-            "alerts": weather_advice.get("alerts", []),
-            "farming_advice": weather_advice.get("advice", []),
-            "timestamp": datetime.datetime.now().isoformat()
-        }
+        response = http_get(url, timeout=10)
+        return build_open_meteo_weather(response.json(), lat, lng)
         
     except Exception as e:
         print(f"Open-Meteo Error: {e}")
         return get_mock_kenya_weather(lat, lng)
 
+def fetch_open_meteo_batch(cells):
+    """Fetch forecasts for many grid cells with one multi-location Open-Meteo request"""
+    latitudes = ",".join(str(lat) for lat, lng in cells)
+    longitudes = ",".join(str(lng) for lat, lng in cells)
+    url = f"https://api.open-meteo.com/v1/forecast?latitude={latitudes}&longitude={longitudes}&{OPEN_METEO_QUERY}"
+    
+    data = http_get(url, timeout=15).json()
+    if isinstance(data, dict):
+        if data.get("error"):
+            raise Exception(data.get("reason", "Open-Meteo batch error"))
+        data = [data]  # A single location comes back as an object, not a list
+    
+    if len(data) != len(cells):
+        raise Exception(f"Open-Meteo returned {len(data)} locations for {len(cells)} requested")
+    
+    return {cell: build_open_meteo_weather(location, *cell) for cell, location in zip(cells, data)}
+
+def build_open_meteo_weather(data, lat, lng):
+    """Format one Open-Meteo location payload"""
+    region = get_kenya_region(lat, lng)
+    current = data.get("current", {})
+    daily = data.get("daily", {})
+    
+    current_code = current.get("weather_code", 0)
+    current_weather = weather_condition(current_code)
+    
+    # Generate forecast
+    forecast = []
+    times = daily.get("time", [])[:7]
+    
+    for i in range(min(7, len(times))):
+        day_code = daily.get("weather_code", [0]*7)[i]
+        forecast.append({
+            "date": times[i],
+            "condition": weather_condition(day_code),
+            "temp_max": daily.get("temperature_2m_max", [25]*7)[i],
+            "temp_min": daily.get("temperature_2m_min", [15]*7)[i],
+            "precipitation": daily.get("precipitation_sum", [0]*7)[i],
+            "wind_speed": daily.get("wind_speed_10m_max", [0]*7)[i]
+        })
+    
+    # Get farming advice
+    weather_advice = get_kenya_weather_advice(region, current_weather, current)
+    
+    return {
+        "success": True,
+        "source": "Open-Meteo",
+        "region": region,
+        "county": get_county_from_coords(lat, lng),
+        "current": {
+            "temperature": current.get("temperature_2m"),
+            "humidity": current.get("relative_humidity_2m"),
+            "precipitation": current.get("precipitation", 0),
+            "condition": current_weather,
+            "feels_like": calculate_feels_like(current.get("temperature_2m", 25), current.get("relative_humidity_2m", 60)),
+            "wind_speed": current.get("wind_speed_10m"),
+            "wind_direction": current.get("wind_direction_10m"),
+            "pressure": current.get("pressure_msl"),
+            "uv_index": None
+        },
+        "forecast": forecast,
+        "alerts": weather_advice.get("alerts", []),
+        "farming_advice": weather_advice.get("advice", []),
+        "timestamp": datetime.datetime.now().isoformat()
+    }
+
 def get_real_time_weather_advice(current_weather, region):
     """Get farming advice based on real-time weather data"""
     advice = []
@@ -552,7 +1941,7 @@ def reverse_geocode(lat, lng):
         if API_KEYS["positionstack"] != "f2612b68b605773a7a2f60be9a2ca732":
             url = f"http://api.positionstack.com/v1/reverse?access_key={API_KEYS['positionstack']}&query={lat},{lng}"
             
-            response = requests.get(url, timeout=10)
+            response = http_get(url, timeout=10)
             data = response.json()
             
             if data.get("data"):
@@ -578,7 +1967,7 @@ def get_elevation(lat, lng):
     """Get elevation using Open-Elevation API"""
     try:
         url = f"https://api.open-elevation.com/api/v1/lookup?locations={lat},{lng}"
-        response = requests.get(url, timeout=5)
+        response = http_get(url, timeout=5)
         data = response.json()
         
         if data.get("results"):
@@ -706,21 +2095,434 @@ def get_agricultural_contacts(crop_type):
     
     return contacts.get(crop_type, contacts["general"])
 
+# ================= IMAGE PREPROCESSING =================
+image_pipeline_totals = {"images": 0, "original_bytes": 0, "uploaded_bytes": 0, "upload_ms": 0.0}
+image_pipeline_lock = threading.Lock()
+
+def dhash_image(image):
+    """64-bit difference hash: whether each pixel of a 9x8 greyscale thumbnail is brighter than its left neighbour"""
+    pixels = np.asarray(image.convert("L").resize((9, 8), Image.Resampling.BOX), dtype=np.int16)
+    return int.from_bytes(np.packbits(pixels[:, 1:] > pixels[:, :-1]).tobytes(), "big")
+
+def preprocess_crop_image(image_bytes, encode=True):
+    """Decode an upload once to fingerprint it and, when encode is set, downsample and recompress it for Plant.id"""
+    started = time.perf_counter()
+    stats = {"original_bytes": len(image_bytes)}
+    # The fingerprint only needs a thumbnail, so decode far smaller when nothing is uploaded
+    target = PLANT_ID_MAX_DIMENSION if encode else 64
+    processed = None
+    
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            # Let the JPEG decoder scale down while decoding instead of materialising every pixel
+            image.draft("RGB", (target, target))
+            image = ImageOps.exif_transpose(image)
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            image.thumbnail((target, target))
+            stats["dhash"] = f"{dhash_image(image):016x}"
+            
+            if encode:
+                output = io.BytesIO()
+                image.save(output, format="JPEG", quality=PLANT_ID_JPEG_QUALITY, optimize=True)
+                stats["width"], stats["height"] = image.size
+                processed = output.getvalue()
+    except Exception as e:
+        print(f"Image preprocessing error: {e}")
+        processed = bytes(image_bytes) if encode else None
+        stats["preprocess_error"] = str(e)
+    
+    if not encode:
+        stats["preprocess_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return None, stats
+    
+    # Small, already-compressed uploads can come out larger; send the original then
+    if len(processed) > len(image_bytes):
+        processed = bytes(image_bytes)
+    
+    stats["uploaded_bytes"] = len(processed)
+    stats["bytes_saved"] = len(image_bytes) - len(processed)
+    stats["preprocess_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return processed, stats
+
+def record_image_upload(stats):
+    with image_pipeline_lock:
+        image_pipeline_totals["images"] += 1
+        image_pipeline_totals["original_bytes"] += stats["original_bytes"]
+        image_pipeline_totals["uploaded_bytes"] += stats["uploaded_bytes"]
+        image_pipeline_totals["upload_ms"] += stats.get("upload_ms", 0)
+
+def get_image_pipeline_stats():
+    with image_pipeline_lock:
+        totals = dict(image_pipeline_totals)
+    images = totals["images"]
+    return {
+        "images": images,
+        "bytes_saved": totals["original_bytes"] - totals["uploaded_bytes"],
+        "compression_ratio": round(totals["uploaded_bytes"] / totals["original_bytes"], 3) if totals["original_bytes"] else None,
+        "avg_upload_ms": round(totals["upload_ms"] / images, 1) if images else None
+    }
+
+# ================= DETECTION HISTORY =================
+class SequenceIndex:
+    """Ascending list of sequence numbers that can be trimmed from the front in O(1)"""
+    
+    def __init__(self):
+        self.seqs = []
+        self.head = 0
+    
+    def __len__(self):
+        return len(self.seqs) - self.head
+    
+    def append(self, seq):
+        self.seqs.append(seq)
+    
+    def first(self):
+        return self.seqs[self.head]
+    
+    def popleft(self):
+        self.head += 1
+        # Reclaim the dead prefix once it is the larger half
+        if self.head > 1024 and self.head * 2 > len(self.seqs):
+            del self.seqs[:self.head]
+            self.head = 0
+    
+    def position(self, seq):
+        """Index just past the last sequence number below seq"""
+        return bisect.bisect_left(self.seqs, seq, self.head)
+    
+    def newest_first(self, end):
+        for i in range(end - 1, self.head - 1, -1):
+            yield self.seqs[i]
+
+class DetectionStore:
+    """Bounded in-memory history of compact detection records with secondary indexes
+    
+    Records are kept in sequence (and therefore time) order. Retention drops the oldest
+    records by count and age, which always sit at the front of every index.
+    """
+    
+    INDEXED_FIELDS = ("user", "county", "crop_type")
+    
+    def __init__(self, max_records, max_age_days):
+        self.max_records = max_records
+        self.max_age = max_age_days * 86400
+        self.records = {}  # seq -> record
+        self.order = SequenceIndex()
+        self.indexes = {field: {} for field in self.INDEXED_FIELDS}  # field -> value -> SequenceIndex
+        self.next_seq = 1
+        self.evicted = 0
+        self.lock = threading.Lock()
+    
+    def add(self, user, county, crop_type, result):
+        """Store a compact record of a detection (the diagnosis summary and image digest, never the image)"""
+        now = time.time()
+        with self.lock:
+            seq = self.next_seq
+            self.next_seq += 1
+            record = {
+                "seq": seq,
+                "id": str(uuid.uuid4()),
+                "user": user,
+                "county": county,
+                "crop_type": crop_type,
+                "image_sha256": result.get("image_sha256"),
+                "disease": result.get("disease"),
+                "severity": result.get("severity"),
+                "confidence": result.get("confidence"),
+                "is_healthy": result.get("is_healthy"),
+                "api_source": result.get("api_source"),
+                "created_at": now,
+                "timestamp": datetime.datetime.fromtimestamp(now).isoformat()
+            }
+            self.records[seq] = record
+            self.order.append(seq)
+            for field in self.INDEXED_FIELDS:
+                self.indexes[field].setdefault(record[field], SequenceIndex()).append(seq)
+            self.prune(now)
+        return record
+    
+    def prune(self, now):
+        # Caller must hold self.lock
+        oldest_allowed = now - self.max_age
+        while self.records:
+            record = self.records[self.order.first()]
+            if len(self.records) <= self.max_records and record["created_at"] >= oldest_allowed:
+                break
+            del self.records[record["seq"]]
+            self.order.popleft()
+            for field in self.INDEXED_FIELDS:
+                index = self.indexes[field]
+                value_index = index[record[field]]
+                value_index.popleft()
+                if not value_index:
+                    del index[record[field]]
+            self.evicted += 1
+    
+    def query(self, filters=None, since=None, until=None, cursor=None, limit=DETECTION_PAGE_SIZE):
+        """Return (records, next_cursor), newest first; cursor is the seq to continue below"""
+        filters = {field: value for field, value in (filters or {}).items() if value is not None}
+        with self.lock:
+            self.prune(time.time())
+            
+            # Walk the most selective index and check the remaining filters on each record
+            candidates = [self.indexes[field].get(value) for field, value in filters.items()]
+            if any(index is None for index in candidates):
+                return [], None
+            walk = min(candidates, key=len) if candidates else self.order
+            
+            end_seq = cursor if cursor is not None else self.next_seq
+            if until is not None:
+                # Records are in time order, so the until bound is a position in the main order
+                end = bisect.bisect_right(self.order.seqs, until, self.order.head, key=lambda seq: self.records[seq]["created_at"])
+                end_seq = min(end_seq, self.order.seqs[end] if end < len(self.order.seqs) else self.next_seq)
+            
+            page = []
+            next_cursor = None
+            for seq in walk.newest_first(walk.position(end_seq)):
+                record = self.records[seq]
+                if since is not None and record["created_at"] < since:
+                    break
+                if any(record[field] != value for field, value in filters.items()):
+                    continue
+                if len(page) == limit:
+                    next_cursor = page[-1]["seq"]
+                    break
+                page.append(record)
+        return page, next_cursor
+    
+    def stats(self):
+        with self.lock:
+            return {
+                "records": len(self.records),
+                "evicted": self.evicted,
+                "max_records": self.max_records,
+                "max_age_days": self.max_age / 86400,
+                "indexed_values": {field: len(index) for field, index in self.indexes.items()}
+            }
+
+crop_detections = DetectionStore(DETECTION_RETENTION_COUNT, DETECTION_RETENTION_DAYS)
+
+# ================= OUTBREAK SURVEILLANCE =================
+class OutbreakCounters:
+    """Rolling per-county disease counts, updated on each detection instead of scanning history
+    
+    Detections land in hourly buckets. Every window keeps running totals plus the queue of
+    hours it currently covers; when an hour slides out of a window its bucket is subtracted.
+    """
+    
+    WINDOWS = {"24h": 24, "7d": 168, "30d": 720}
+    
+    def __init__(self, alert_rate, alert_min_cases, alert_window):
+        if alert_window not in self.WINDOWS:
+            raise ValueError(f"Unknown outbreak window {alert_window!r}; expected one of {', '.join(self.WINDOWS)}")
+        self.alert_rate = alert_rate
+        self.alert_min_cases = alert_min_cases
+        self.alert_window = alert_window
+        self.buckets = {}  # hour -> {"cases": Counter, "detections": Counter}
+        self.hours = {window: deque() for window in self.WINDOWS}  # hours counted in each window, oldest first
+        self.cases = {window: Counter() for window in self.WINDOWS}  # (county, crop_type, disease) -> count
+        self.detections = {window: Counter() for window in self.WINDOWS}  # (county, crop_type) -> count
+        self.alerting = set()  # (county, crop_type, disease) currently above the threshold
+        self.latest_hour = 0
+        self.hooks = []
+        self.lock = threading.Lock()
+    
+    def add_hook(self, hook):
+        """Register hook(alert) to be called once each time a disease rate crosses the threshold"""
+        self.hooks.append(hook)
+    
+    def record(self, county, crop_type, result, at=None):
+        at = time.time() if at is None else at
+        hour = int(at // 3600)
+        area = (county, crop_type)
+        key = (county, crop_type, result.get("disease")) if not result.get("is_healthy") else None
+        
+        with self.lock:
+            # A detection stamped just before another thread opened the next hour joins that newer bucket
+            hour = max(hour, self.latest_hour)
+            self.latest_hour = hour
+            self.advance(hour)
+            bucket = self.buckets.get(hour)
+            if bucket is None:
+                bucket = self.buckets[hour] = {"cases": Counter(), "detections": Counter()}
+                for window in self.WINDOWS:
+                    self.hours[window].append(hour)
+            
+            bucket["detections"][area] += 1
+            for window in self.WINDOWS:
+                self.detections[window][area] += 1
+            if key is not None:
+                bucket["cases"][key] += 1
+                for window in self.WINDOWS:
+                    self.cases[window][key] += 1
+            
+            # A new detection moves every rate in this county and crop, not only the reported disease
+            touched = {alerting for alerting in self.alerting if alerting[:2] == area}
+            if key is not None:
+                touched.add(key)
+            alerts = self.check_alerts(touched)
+        
+        self.fire(alerts)
+    
+    def advance(self, hour):
+        # Caller must hold self.lock
+        touched = set()
+        for window, span in self.WINDOWS.items():
+            hours = self.hours[window]
+            while hours and hours[0] <= hour - span:
+                bucket = self.buckets[hours.popleft()]
+                subtract_counts(self.cases[window], bucket["cases"])
+                subtract_counts(self.detections[window], bucket["detections"])
+                if window == self.alert_window:
+                    touched.update(bucket["cases"])
+        
+        # Buckets older than the longest window are no longer referenced
+        longest = max(self.WINDOWS.values())
+        for old_hour in [h for h in self.buckets if h <= hour - longest]:
+            del self.buckets[old_hour]
+        
+        self.check_alerts(touched & self.alerting)
+    
+    def check_alerts(self, keys):
+        """Update the alerting set for keys and return alerts for those that just crossed the threshold"""
+        # Caller must hold self.lock
+        alerts = []
+        for key in keys:
+            cases = self.cases[self.alert_window][key]
+            detections = self.detections[self.alert_window][key[:2]]
+            rate = cases / detections if detections else 0.0
+            above = cases >= self.alert_min_cases and rate >= self.alert_rate
+            if above and key not in self.alerting:
+                self.alerting.add(key)
+                alerts.append({
+                    "county": key[0],
+                    "crop_type": key[1],
+                    "disease": key[2],
+                    "cases": cases,
+                    "detections": detections,
+                    "rate": round(rate, 3),
+                    "window": self.alert_window,
+                    "threshold": self.alert_rate,
+                    "timestamp": datetime.datetime.now().isoformat()
+                })
+            elif not above:
+                self.alerting.discard(key)
+        return alerts
+    
+    def fire(self, alerts):
+        for alert in alerts:
+            for hook in self.hooks:
+                try:
+                    hook(alert)
+                except Exception as e:
+                    print(f"Outbreak alert hook error: {e}")
+    
+    def summary(self, window, county=None, crop_type=None):
+        """Disease counts and rates in a window, optionally for one county and/or crop, most cases first"""
+        with self.lock:
+            self.advance(int(time.time() // 3600))
+            cases = self.cases[window]
+            detections = self.detections[window]
+            rows = []
+            for (row_county, row_crop, disease), count in cases.items():
+                if (county and row_county != county) or (crop_type and row_crop != crop_type):
+                    continue
+                total = detections[(row_county, row_crop)]
+                rows.append({
+                    "county": row_county,
+                    "crop_type": row_crop,
+                    "disease": disease,
+                    "cases": count,
+                    "detections": total,
+                    "rate": round(count / total, 3) if total else 0.0,
+                    "alerting": (row_county, row_crop, disease) in self.alerting
+                })
+            total_detections = sum(
+                count for (row_county, row_crop), count in detections.items()
+                if not (county and row_county != county) and not (crop_type and row_crop != crop_type)
+            )
+        rows.sort(key=lambda row: (-row["cases"], -row["rate"]))
+        return rows, total_detections
+
+def subtract_counts(totals, counts):
+    for key, count in counts.items():
+        remaining = totals[key] - count
+        if remaining > 0:
+            totals[key] = remaining
+        else:
+            del totals[key]
+
+def print_outbreak_alert(alert):
+    print(f"⚠️  Outbreak alert: {alert['disease']} on {alert['crop_type']} in {alert['county']} - "
+          f"{alert['cases']}/{alert['detections']} detections ({alert['rate']:.0%}) in {alert['window']}")
+
+outbreak_counters = OutbreakCounters(OUTBREAK_ALERT_RATE, OUTBREAK_ALERT_MIN_CASES, OUTBREAK_ALERT_WINDOW)
+outbreak_counters.add_hook(print_outbreak_alert)
+
 # ================= REAL-TIME CROP DISEASE DETECTION =================
-def detect_crop_disease_real_time(crop_type, image_base64=None, image_url=None):
+def plant_id_configured():
+    return API_KEYS["plant_id"] != "RHP8vh6ESBQaoNnDvCxprAc6YFMqbaEqTzNK20HzZ4nwyJrjBi"
+
+def diagnose_crop_image(crop_type, image_bytes=None):
+    """Detect disease, reusing the stored diagnosis when the same image was already submitted for this crop"""
+    if not image_bytes:
+        return detect_crop_disease_real_time(crop_type)
+    
+    # Content address of a submission: digest of the decoded image plus the crop it was sent as
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    key = f"{digest}:{crop_type}"
+    
+    def load():
+        if detection_disk is not None:
+            stored = detection_disk.get(key)
+            if stored is not None:
+                return stored, True
+        
+        # One decode yields both the fingerprint and, if Plant.id will be called, the upload bytes
+        upload_bytes, image_stats = IMAGE_EXECUTOR.submit(preprocess_crop_image, image_bytes, plant_id_configured()).result()
+        fingerprint = int(image_stats["dhash"], 16) if "dhash" in image_stats else None
+        
+        match = near_duplicate_index.find(fingerprint, crop_type) if fingerprint is not None else None
+        if match is not None:
+            previous, distance = match
+            result = {**previous, "near_duplicate": {"distance": distance, "threshold": NEAR_DUPLICATE_THRESHOLD}}
+            if "image_pipeline" in previous:
+                result["image_pipeline"] = image_stats  # This upload's decode; nothing was sent to Plant.id
+        else:
+            prepared = (upload_bytes, image_stats) if upload_bytes is not None else None
+            result = detect_crop_disease_real_time(crop_type, image_bytes, prepared=prepared)
+            if (fingerprint is not None and is_reusable_diagnosis(result)
+                    and result.get("confidence", 0) >= NEAR_DUPLICATE_MIN_CONFIDENCE):
+                near_duplicate_index.add(fingerprint, crop_type, result)
+        
+        if detection_disk is not None and is_reusable_diagnosis(result):
+            detection_disk.put(key, result)
+        return result, False
+    
+    (result, from_disk), _, hit = detection_cache.get_or_load(
+        key, load, cacheable=lambda loaded: is_reusable_diagnosis(loaded[0])
+    )
+    return {**result, "cached": hit or from_disk, "image_sha256": digest}
+
+def is_reusable_diagnosis(result):
+    # A local fallback after a Plant.id failure should not stick; the next upload retries the API
+    return result.get("api_source") == "Plant.id" or not plant_id_configured()
+
+def detect_crop_disease_real_time(crop_type, image_bytes=None, image_url=None, prepared=None):
     """Real-time disease detection using Plant.id API"""
     try:
-        if API_KEYS["plant_id"] != "RHP8vh6ESBQaoNnDvCxprAc6YFMqbaEqTzNK20HzZ4nwyJrjBi" and (image_base64 or image_url):
+        if plant_id_configured() and (image_bytes or image_url):
             # Use Plant.id API for real disease detection
-            return detect_with_plant_id(image_base64, image_url, crop_type)
+            return detect_with_plant_id(image_bytes, image_url, crop_type, prepared)
     except Exception as e:
         print(f"Plant.id API Error: {e}")
     
     # Fallback to AI model or mock data
-    return detect_crop_disease_ai(crop_type, image_base64)
+    return detect_crop_disease_ai(crop_type, image_bytes)
 
-def detect_with_plant_id(image_base64, image_url, crop_type):
-    """Use Plant.id API for disease detection"""
+def detect_with_plant_id(image_bytes, image_url, crop_type, prepared=None):
+    """Use Plant.id API for disease detection; prepared is an already preprocessed (bytes, stats) pair"""
     url = "https://api.plant.id/v2/identify"
     
     headers = {
@@ -728,8 +2530,14 @@ def detect_with_plant_id(image_base64, image_url, crop_type):
         "Api-Key": API_KEYS["plant_id"]
     }
     
+    image_stats = None
+    if prepared is not None:
+        image_bytes, image_stats = prepared
+    elif image_bytes:
+        image_bytes, image_stats = IMAGE_EXECUTOR.submit(preprocess_crop_image, image_bytes).result()
+    
     payload = {
-        "images": [image_base64] if image_base64 else [],
+        "images": [base64.b64encode(image_bytes).decode("ascii")] if image_bytes else [],
         "plant_details": ["common_names", "url", "wiki_description", "taxonomy", "synonyms"],
         "disease_details": ["common_names", "url", "description", "treatment", "prevention"]
     }
@@ -737,9 +2545,14 @@ def detect_with_plant_id(image_base64, image_url, crop_type):
     if image_url:
         payload["images"] = [image_url]
     
-    response = requests.post(url, json=payload, headers=headers, timeout=30)
+    started = time.perf_counter()
+    response = http_post(url, json=payload, headers=headers, timeout=30)
     data = response.json()
     
+    if image_stats is not None:
+        image_stats["upload_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        record_image_upload(image_stats)
+    
     if data.get("suggestions"):
         suggestion = data["suggestions"][0]
         plant_name = suggestion.get("plant_name", "Unknown Plant")
@@ -773,42 +2586,24 @@ def detect_with_plant_id(image_base64, image_url, crop_type):
             "recommendations": treatments[:5] if treatments else get_kenya_treatment_recommendations("Healthy"),
             "prevention": prevention[:5] if prevention else get_kenya_prevention_tips(crop_type),
             "api_source": "Plant.id",
-            "local_contacts": get_agricultural_contacts(crop_type)
+            "local_contacts": get_agricultural_contacts(crop_type),
+            "image_pipeline": image_stats
         }
     
     raise Exception("No plant identification results")
 
-def detect_crop_disease_ai(crop_type, image_base64=None):
+def detect_crop_disease_ai(crop_type, image_bytes=None):
     """Enhanced AI-based disease detection with more accuracy"""
-    # More comprehensive disease database
-    kenya_diseases_enhanced = {
-        "Maize": [
-            {"name": "Maize Lethal Necrosis", "symptoms": "Yellow streaks, stunted growth, dead heart", "severity": "High", "treatment": "Remove infected plants, use resistant varieties"},
-            {"name": "Maize Streak Virus", "symptoms": "Yellow streaks on leaves, stunted growth", "severity": "Medium", "treatment": "Control leafhoppers, use resistant varieties"},
-            {"name": "Grey Leaf Spot", "symptoms": "Rectangular grey spots with yellow halos", "severity": "Medium", "treatment": "Apply fungicides, crop rotation"},
-            {"name": "Northern Corn Leaf Blight", "symptoms": "Long elliptical gray-green lesions", "severity": "Medium", "treatment": "Fungicide application, resistant varieties"},
-            {"name": "Healthy", "symptoms": "Vigorous growth, dark green leaves", "severity": "None", "treatment": "Continue good practices"}
-        ],
-        "Coffee": [
-            {"name": "Coffee Berry Disease", "symptoms": "Dark sunken spots on berries", "severity": "High", "treatment": "Copper-based fungicides, pruning"},
-            {"name": "Coffee Leaf Rust", "symptoms": "Orange powdery spots on leaves", "severity": "High", "treatment": "Fungicides, resistant varieties"},
-            {"name": "Coffee Wilt Disease", "symptoms": "Wilting, yellowing leaves", "severity": "High", "treatment": "Remove infected trees, soil treatment"},
-            {"name": "Healthy", "symptoms": "Shiny dark green leaves, good berry set", "severity": "None", "treatment": "Regular pruning, balanced nutrition"}
-        ],
-    }
-    
-    disease_list = kenya_diseases_enhanced.get(crop_type, 
-        [{"name": "Healthy", "symptoms": "No visible disease symptoms", "severity": "None", "treatment": "Maintain good agricultural practices"}]
-    )
+    disease_list = crop_diseases(crop_type)
     
     # If image is provided, simulate more accurate detection
-    if image_base64:
+    if image_bytes:
         # Create a deterministic but varied result based on image hash
-        image_hash = hashlib.md5(image_base64.encode() if isinstance(image_base64, str) else image_base64).hexdigest()
+        image_hash = hashlib.md5(image_bytes).hexdigest()
         hash_int = int(image_hash[:8], 16)
         
         # Weighted selection - 70% chance of healthy if no real disease detected
-        if hash_int % 10 < 7:  # 70% healthy
+        if hash_int % 10 < 7 or len(disease_list) == 1:  # 70% healthy
             disease_index = len(disease_list) - 1  # Last is usually healthy
         else:
             disease_index = hash_int % (len(disease_list) - 1)
@@ -838,8 +2633,464 @@ def detect_crop_disease_ai(crop_type, image_base64=None):
         }
     }
 
+# ================= MARKET PRICE STORE =================
+# Daily wholesale observations per (crop, county), one growable NumPy column per field. Series are
+# append-only: new rows are written past the published length and then published as a fresh
+# snapshot, so slices already handed to readers never change underneath them.
+def price_day(date):
+    """Day number (days since 1970-01-01) for a date"""
+    return (date - datetime.date(1970, 1, 1)).days
+
+def price_dates(days):
+    """ISO date strings for an array of day numbers"""
+    return np.datetime_as_string(np.asarray(days).astype("datetime64[D]")).tolist()
+
+class PriceSeries:
+    """Append-only daily price and volume columns for one crop in one county"""
+    
+    def __init__(self, source, capacity=64):
+        self.source = source  # "observed" (imported) or "modelled"
+        self.day = np.empty(capacity, dtype=np.int32)
+        self.price = np.empty(capacity, dtype=np.float64)
+        self.volume = np.empty(capacity, dtype=np.float32)
+        self.length = 0
+        self.publish()
+    
+    def publish(self):
+        views = []
+        for column in (self.day, self.price, self.volume):
+            view = column[:self.length]
+            view.flags.writeable = False
+            views.append(view)
+        self.snapshot = tuple(views)  # (day, price, volume), swapped in one assignment
+    
+    def extend(self, days, prices, volumes):
+        """Append rows sorted by day; days not after the last stored one are skipped. Returns rows added"""
+        days = np.asarray(days, dtype=np.int32)
+        keep = days > (self.day[self.length - 1] if self.length else np.iinfo(np.int32).min)
+        keep[1:] &= days[1:] != days[:-1]  # First row wins when a batch repeats a day
+        added = int(keep.sum())
+        if not added:
+            return 0
+        
+        needed = self.length + added
+        if needed > len(self.day):
+            capacity = max(needed, 2 * len(self.day))
+            # Fresh buffers; published snapshots keep the old ones alive
+            self.day, self.price, self.volume = [
+                np.concatenate((column[:self.length], np.empty(capacity - self.length, dtype=column.dtype)))
+                for column in (self.day, self.price, self.volume)
+            ]
+        
+        self.day[self.length:needed] = days[keep]
+        self.price[self.length:needed] = np.asarray(prices, dtype=np.float64)[keep]
+        self.volume[self.length:needed] = np.asarray(volumes, dtype=np.float32)[keep]
+        self.length = needed
+        self.publish()
+        return added
+    
+    def window(self, start_day, end_day):
+        """Zero-copy (day, price, volume) slices for start_day <= day <= end_day"""
+        day, price, volume = self.snapshot
+        lo = np.searchsorted(day, start_day, "left")
+        hi = np.searchsorted(day, end_day, "right")
+        return day[lo:hi], price[lo:hi], volume[lo:hi]
+    
+    def last(self, count, until_day):
+        """Zero-copy slices of the latest count observations on or before until_day"""
+        day, price, volume = self.snapshot
+        hi = np.searchsorted(day, until_day, "right")
+        lo = max(0, hi - count)
+        return day[lo:hi], price[lo:hi], volume[lo:hi]
+    
+    def nbytes(self):
+        return self.day.nbytes + self.price.nbytes + self.volume.nbytes
+
+@functools.lru_cache(maxsize=1024)
+def modelled_price_series(crop, county, through_day, low, high, county_factor, seasonal):
+    """Seeded stand-in series from PRICE_MODEL_ORIGIN to through_day for pairs with no imported prices
+    
+    Noise is drawn in day order from a per-(crop, county) seed, so extending the range only
+    appends: every process, on every day, reports the same price for the same date.
+    """
+    origin = price_day(PRICE_MODEL_ORIGIN)
+    count = through_day - origin + 1
+    seed = int.from_bytes(hashlib.sha256(f"{crop}|{county}".encode("utf-8")).digest()[:8], "little")
+    
+    # Week-scale jitter on top of a slower quarter-scale swing
+    short = np.convolve(np.random.default_rng([seed, 0]).standard_normal(count + 6), np.ones(7) / 7, "valid")
+    slow = np.convolve(np.random.default_rng([seed, 1]).standard_normal(count + 89), np.ones(90) / 90, "valid")
+    volume = np.random.default_rng([seed, 2]).integers(100, 1000, count)
+    
+    days = np.arange(origin, through_day + 1, dtype=np.int32)
+    # Monthly factors apply mid-month and blend in between, so month ends don't jump
+    month_starts = days.astype("datetime64[D]").astype("datetime64[M]")
+    month_lengths = ((month_starts + 1).astype("datetime64[D]") - month_starts.astype("datetime64[D]")).astype(np.int64)
+    month_position = (month_starts.astype(np.int64) % 12) + (days - month_starts.astype("datetime64[D]").astype(np.int64)) / month_lengths
+    factor = np.interp(month_position, np.arange(12) + 0.5, np.asarray(seasonal), period=12)
+    base = (low + high) / 2 * county_factor
+    price = base * factor * (1 + 0.05 * short + 0.6 * slow)
+    price = np.round(np.clip(price, 0.6 * low * county_factor, 1.4 * high * county_factor), 2)
+    
+    series = PriceSeries("modelled", capacity=count)
+    series.extend(days, price, volume)
+    return series
+
+class PriceStore:
+    """Observed price series keyed by (crop, county), persisted as one .npz file"""
+    
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()  # Serializes writers; readers use published snapshots
+        self.series_by_key = {}
+        self.version = 0  # Bumped by every import or reload, for caches computed over the store
+        self.last_import = None
+        self.signature = None  # (mtime, size) of the file as last loaded or saved
+        self.reloads = 0
+        self.last_error = None
+        
+        if path and os.path.exists(path):
+            try:
+                self.load()
+            except (OSError, ValueError, KeyError) as e:
+                self.last_error = str(e)
+                print(f"Price store load error ({path}): {e}")
+    
+    def series(self, crop, county, through_day=None):
+        """Observed series for the pair, or the modelled baseline when none was imported"""
+        observed = self.series_by_key.get((crop, county))
+        if observed is not None:
+            return observed
+        if through_day is None:
+            through_day = price_day(datetime.date.today())
+        price_info = market_base_price(crop)
+        return modelled_price_series(
+            crop, county, through_day, price_info["min"], price_info["max"],
+            market_county_factor(county), seasonal_price_factors(crop)
+        )
+    
+    def bulk_import(self, rows):
+        """Append (crop, county, day, price, volume) rows; returns (imported, skipped)"""
+        grouped = {}
+        total = 0
+        for crop, county, day, price, volume in rows:
+            grouped.setdefault((crop, county), []).append((day, price, volume))
+            total += 1
+        
+        imported = 0
+        with self.lock:
+            for key, entries in grouped.items():
+                columns = np.array(entries, dtype=np.float64)
+                columns = columns[np.argsort(columns[:, 0], kind="stable")]
+                series = self.series_by_key.get(key) or PriceSeries("observed", capacity=max(64, len(columns)))
+                imported += series.extend(columns[:, 0], columns[:, 1], columns[:, 2])
+                if series.length:
+                    self.series_by_key[key] = series
+            
+            self.version += 1
+            self.last_import = datetime.datetime.now().isoformat()
+            if self.path:
+                self.save()
+        return imported, total - imported
+    
+    def save(self):
+        """Write every observed series to self.path in one atomic replace (caller holds the lock)"""
+        keys = sorted(self.series_by_key)
+        snapshots = [self.series_by_key[key].snapshot for key in keys]
+        
+        def column(index, dtype):
+            return np.concatenate([snapshot[index] for snapshot in snapshots] or [np.empty(0, dtype=dtype)])
+        
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(
+                f,
+                crops=np.array([key[0] for key in keys], dtype=str),
+                counties=np.array([key[1] for key in keys], dtype=str),
+                lengths=np.array([len(snapshot[0]) for snapshot in snapshots], dtype=np.int64),
+                day=column(0, np.int32),
+                price=column(1, np.float64),
+                volume=column(2, np.float32)
+            )
+        os.replace(temp_path, self.path)
+        self.signature = file_signature(os.stat(self.path))
+    
+    def load(self):
+        """Read self.path into a fresh set of series and swap it in whole"""
+        signature = file_signature(os.stat(self.path))
+        series_by_key = {}
+        with np.load(self.path) as data:
+            offsets = np.concatenate(([0], np.cumsum(data["lengths"])))
+            day, price, volume = data["day"], data["price"], data["volume"]
+            for index, key in enumerate(zip(data["crops"].tolist(), data["counties"].tolist())):
+                lo, hi = offsets[index], offsets[index + 1]
+                series = PriceSeries("observed", capacity=max(64, int(hi - lo)))
+                series.extend(day[lo:hi], price[lo:hi], volume[lo:hi])
+                series_by_key[key] = series
+        self.series_by_key = series_by_key
+        self.signature = signature
+    
+    def check(self):
+        """Reload if another process (--import-prices) rewrote the file; returns True on a reload"""
+        if not self.path:
+            return False
+        try:
+            signature = file_signature(os.stat(self.path))
+        except OSError:
+            return False  # Nothing imported yet
+        if signature == self.signature:
+            return False
+        
+        with self.lock:
+            try:
+                self.load()
+            except (OSError, ValueError, KeyError) as e:
+                self.last_error = str(e)
+                self.signature = signature  # Reported once; the next import retries
+                print(f"Price store reload failed ({self.path}): {e}")
+                return False
+            self.version += 1
+            self.reloads += 1
+            self.last_error = None
+            self.last_import = datetime.datetime.fromtimestamp(signature[0] / 1e9).isoformat()
+        print(f"📈 Price store reloaded: {len(self.series_by_key)} observed series (version {self.version})")
+        return True
+    
+    def stats(self):
+        series = list(self.series_by_key.values())
+        return {
+            "persisted": bool(self.path),
+            "observed_series": len(series),
+            "observations": sum(item.length for item in series),
+            "memory_bytes": sum(item.nbytes() for item in series),
+            "version": self.version,
+            "last_import": self.last_import,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+            "modelled_series_cached": modelled_price_series.cache_info().currsize
+        }
+
+def load_prices_csv(path):
+    """Yield (crop, county, day, price, volume) rows from a market price CSV
+    
+    Columns: date (YYYY-MM-DD), crop, county, price (KSh per the crop's wholesale unit)
+    and optionally volume. Rows that do not parse are left out.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            crop = (row.get("crop") or "").strip()
+            try:
+                day = price_day(datetime.date.fromisoformat((row.get("date") or "").strip()))
+                price = float(row.get("price") or 0)
+                volume = float(row.get("volume") or 0)
+            except ValueError:
+                continue
+            if not crop or price <= 0:
+                continue
+            yield crop, normalize_county_name((row.get("county") or "Nairobi").strip()), day, price, volume
+
+price_store = PriceStore(PRICE_STORE_PATH or None)
+
+def price_history(day, price, volume):
+    """History rows newest first, as the market responses have always listed them"""
+    return [
+        {"date": date, "price": round(value, 2), "volume": int(amount)}
+        for date, value, amount in zip(price_dates(day[::-1]), price[::-1].tolist(), volume[::-1].tolist())
+    ]
+
+# ================= MARKET ANALYTICS =================
+# Indicators for every crop/county series at once: the price store is laid out as one
+# series x day matrix and each indicator is a single NumPy reduction over it. The result is
+# recomputed at most once a day, or sooner when an import or a catalog reload changes the inputs.
+TREND_LABELS = ("stable", "up", "down")
+
+def nan_mean(block):
+    """Row means ignoring NaN; rows with no values stay NaN"""
+    valid = ~np.isnan(block)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(valid, block, 0).sum(axis=1) / valid.sum(axis=1)
+
+def forward_fill(matrix):
+    """Carry each row's last observed price across gaps (leading gaps stay NaN)"""
+    observed = ~np.isnan(matrix)
+    index = np.where(observed, np.arange(matrix.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    filled = matrix[np.arange(matrix.shape[0])[:, None], index]
+    filled[~np.maximum.accumulate(observed, axis=1)] = np.nan
+    return filled
+
+def build_price_matrix(keys, start_day, end_day):
+    """Series x day matrix of prices for keys over [start_day, end_day], gaps forward-filled"""
+    matrix = np.full((len(keys), end_day - start_day + 1), np.nan)
+    for row, (crop, county) in enumerate(keys):
+        day, price, _ = price_store.series(crop, county, end_day).window(start_day, end_day)
+        matrix[row, day - start_day] = price
+    return forward_fill(matrix)
+
+def compute_market_indicators(matrix, start_day, trend_threshold=None):
+    """Moving averages, volatility, 30-day slope, seasonal indices and trend label for every row"""
+    trend_threshold = MARKET_TREND_THRESHOLD if trend_threshold is None else trend_threshold
+    latest = matrix[:, -1]
+    ma7 = nan_mean(matrix[:, -7:])
+    ma30 = nan_mean(matrix[:, -30:])
+    
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Annualised standard deviation of the last 30 daily log returns
+        returns = np.diff(np.log(matrix[:, -31:]), axis=1)
+        volatility = np.sqrt(nan_mean((returns - nan_mean(returns)[:, None]) ** 2) * 365)
+        
+        # Least-squares slope over the last 30 days, as % of the 30-day average per day
+        recent = matrix[:, -30:]
+        valid = ~np.isnan(recent)
+        x = np.where(valid, np.arange(recent.shape[1]), np.nan)
+        x_centered = np.where(valid, x - nan_mean(x)[:, None], 0)
+        y_centered = np.where(valid, recent - ma30[:, None], 0)
+        slope = (x_centered * y_centered).sum(axis=1) / (x_centered ** 2).sum(axis=1) / ma30
+        
+        # Average price in each calendar month relative to the series' average month
+        days = np.arange(start_day, start_day + matrix.shape[1])
+        months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) % 12
+        month_columns = np.eye(12)[months]
+        observed = ~np.isnan(matrix)
+        monthly = (np.where(observed, matrix, 0) @ month_columns) / (observed @ month_columns)
+        seasonal = monthly / nan_mean(monthly)[:, None]
+        
+        momentum = ma7 / ma30 - 1
+    
+    trend = np.select(
+        [(momentum > trend_threshold) & (slope > 0), (momentum < -trend_threshold) & (slope < 0)],
+        [1, 2],
+        0
+    )
+    return {
+        "latest": latest, "previous": matrix[:, -2], "ma7": ma7, "ma30": ma30, "momentum": momentum,
+        "volatility": volatility, "slope": slope, "seasonal": seasonal, "trend": trend
+    }
+
+def indicator_rows(indicators):
+    """Per-series indicator dicts in plain JSON types, rounded once for the whole matrix"""
+    def column(values, scale=1.0, digits=2):
+        return [None if value != value else value for value in np.round(values * scale, digits).tolist()]
+    
+    seasonal = [[None if value != value else value for value in row] for row in np.round(indicators["seasonal"], 3).tolist()]
+    return [
+        {
+            "ma7": ma7, "ma30": ma30, "momentum_pct": momentum, "volatility_pct": volatility,
+            "slope_pct_per_day": slope, "seasonal_index": seasonal_index, "trend": TREND_LABELS[trend]
+        }
+        for ma7, ma30, momentum, volatility, slope, seasonal_index, trend in zip(
+            column(indicators["ma7"]), column(indicators["ma30"]), column(indicators["momentum"], 100, 1),
+            column(indicators["volatility"], 100, 1), column(indicators["slope"], 100, 3),
+            seasonal, indicators["trend"].tolist()
+        )
+    ]
+
+class MarketAnalytics:
+    """Per-day cache of market indicators for every catalog crop in every county"""
+    
+    def __init__(self, days):
+        self.days = days
+        self.lock = threading.Lock()  # One recompute at a time; readers use the published snapshot
+        self.snapshot = None
+        self.recomputes = 0
+    
+    def universe(self):
+        """Catalog crops x counties plus any imported pair outside them"""
+        catalog = current_catalog()
+        crops = sorted(catalog.market_crops)
+        keys = [(crop, county) for crop in crops for county in catalog.counties]
+        known = set(keys)
+        return keys + sorted(key for key in list(price_store.series_by_key) if key not in known)
+    
+    def current(self):
+        today = price_day(datetime.date.today())
+        key = (today, price_store.version, current_catalog().source["sha256"])
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot["key"] == key:
+            return snapshot
+        
+        with self.lock:
+            if self.snapshot is not None and self.snapshot["key"] == key:
+                return self.snapshot
+            
+            started = time.perf_counter()
+            keys = self.universe()
+            start_day = today - self.days + 1
+            matrix = build_price_matrix(keys, start_day, today)
+            built = time.perf_counter()
+            indicators = compute_market_indicators(matrix, start_day)
+            finished = time.perf_counter()
+            
+            self.snapshot = {
+                "key": key,
+                "rows": {pair: row for row, pair in enumerate(keys)},
+                "indicators": indicators,
+                "values": indicator_rows(indicators),
+                "series": len(keys),
+                "matrix_bytes": matrix.nbytes,
+                "build_ms": (built - started) * 1000,
+                "compute_ms": (finished - built) * 1000
+            }
+            self.recomputes += 1
+            return self.snapshot
+    
+    def indicators(self, crop, county):
+        """Indicator values for one pair as plain JSON types"""
+        snapshot = self.current()
+        row = snapshot["rows"].get((crop, county))
+        if row is not None:
+            return dict(snapshot["values"][row])
+        
+        # Ad hoc crop or county outside the catalog: a one-row pass, not cached
+        today = snapshot["key"][0]
+        start_day = today - self.days + 1
+        return indicator_rows(compute_market_indicators(build_price_matrix([(crop, county)], start_day, today), start_day))[0]
+    
+    def lookup(self, pairs):
+        """(indicator rows, latest prices, previous-day prices) aligned with pairs
+        
+        Pairs in today's snapshot are read from it; any others share one extra pass.
+        """
+        snapshot = self.current()
+        rows, values = snapshot["rows"], snapshot["values"]
+        latest, previous = snapshot["indicators"]["latest"], snapshot["indicators"]["previous"]
+        
+        missing = list(dict.fromkeys(pair for pair in pairs if pair not in rows))
+        if missing:
+            today = snapshot["key"][0]
+            start_day = today - self.days + 1
+            extra = compute_market_indicators(build_price_matrix(missing, start_day, today), start_day)
+            rows = {**rows, **{pair: len(values) + index for index, pair in enumerate(missing)}}
+            values = values + indicator_rows(extra)
+            latest = np.concatenate((latest, extra["latest"]))
+            previous = np.concatenate((previous, extra["previous"]))
+        
+        index = np.array([rows[pair] for pair in pairs], dtype=np.int64)
+        return (
+            [values[row] for row in index.tolist()],
+            np.round(latest[index], 2).tolist(),
+            np.round(previous[index], 2).tolist()
+        )
+    
+    def stats(self):
+        snapshot = self.snapshot
+        if snapshot is None:
+            return {"days": self.days, "recomputes": self.recomputes}
+        return {
+            "days": self.days,
+            "series": snapshot["series"],
+            "as_of": price_dates([snapshot["key"][0]])[0],
+            "matrix_bytes": snapshot["matrix_bytes"],
+            "build_ms": round(snapshot["build_ms"], 1),
+            "compute_ms": round(snapshot["compute_ms"], 1),
+            "recomputes": self.recomputes
+        }
+
+market_analytics = MarketAnalytics(MARKET_ANALYTICS_DAYS)
+
 # ================= MARKET PRICES =================
-def get_market_advice(crop, trend, price):
+def get_market_advice(crop, trend, price, indicators=None):
     """Get buying/selling advice for Kenyan market"""
     advice = []
     
@@ -852,6 +3103,28 @@ def get_market_advice(crop, trend, price):
     else:
         advice.append("Prices stable - buy/sell as needed")
     
+    if indicators:
+        # Where this month sits against the next three in the usual seasonal pattern
+        month = datetime.date.today().month - 1
+        seasonal = indicators["seasonal_index"]
+        ahead = [(seasonal[(month + step) % 12], (month + step) % 12) for step in (1, 2, 3)]
+        ahead = [(value, index) for value, index in ahead if value is not None]
+        if seasonal[month] and ahead:
+            peak, peak_month = max(ahead)
+            low, low_month = min(ahead)
+            if peak > seasonal[month] * 1.05:
+                advice.append(f"Prices usually rise about {(peak / seasonal[month] - 1) * 100:.0f}% by {datetime.date(2000, peak_month + 1, 1):%B}; store if you can")
+            elif low < seasonal[month] * 0.95:
+                advice.append(f"Prices usually fall about {(1 - low / seasonal[month]) * 100:.0f}% by {datetime.date(2000, low_month + 1, 1):%B}; sell early")
+        
+        if indicators["ma30"] and price > indicators["ma30"] * 1.05:
+            advice.append(f"Today's price is {(price / indicators['ma30'] - 1) * 100:.0f}% above the 30-day average")
+        elif indicators["ma30"] and price < indicators["ma30"] * 0.95:
+            advice.append(f"Today's price is {(1 - price / indicators['ma30']) * 100:.0f}% below the 30-day average")
+        
+        if indicators["volatility_pct"] is not None and indicators["volatility_pct"] > 40:
+            advice.append(f"Prices are volatile ({indicators['volatility_pct']:.0f}% annualised); sell in smaller batches")
+    
     # Crop-specific advice
     if crop == "Maize":
         advice.append("Check NCPB prices for maize")
@@ -863,24 +3136,7 @@ def get_market_advice(crop, trend, price):
 def get_kenya_market_prices(crop_name, county="Nairobi"):
     """Get market prices for Kenya"""
     try:
-        # Base prices in KSh per kg (Kenya Shillings)
-        base_prices_ksh = {
-            "Maize": {"min": 35, "max": 60, "unit": "kg"},
-            "Wheat": {"min": 40, "max": 70, "unit": "kg"},
-            "Rice": {"min": 80, "max": 150, "unit": "kg"},
-            "Beans": {"min": 120, "max": 200, "unit": "kg"},
-            "Potatoes": {"min": 30, "max": 80, "unit": "kg"},
-            "Tomatoes": {"min": 40, "max": 120, "unit": "kg"},
-            "Avocado": {"min": 10, "max": 50, "unit": "piece"},
-            "Mango": {"min": 20, "max": 80, "unit": "kg"},
-            "Banana": {"min": 10, "max": 50, "unit": "bunch"},
-            "Tea": {"min": 200, "max": 350, "unit": "kg"},
-            "Coffee": {"min": 300, "max": 600, "unit": "kg"},
-            "Sugarcane": {"min": 20, "max": 40, "unit": "stalk"},
-            "Milk": {"min": 50, "max": 80, "unit": "litre"}
-        }
-        
-        price_info = base_prices_ksh.get(crop_name, {"min": 50, "max": 100, "unit": "kg"})
+        price_info = base_price_ksh(crop_name)
         
         # Add seasonal variation
         month = datetime.datetime.now().month
@@ -946,63 +3202,22 @@ def get_mock_market_prices(crop_name):
     }
 
 # ================= REAL-TIME MARKET PRICES =================
-def get_real_time_market_prices(crop_name, county="Nairobi"):
-    """Get real-time market prices from Kenyan market APIs"""
-    try:
-        # Try to get prices from Kenya market APIs (you would need to subscribe to these services)
-        # Example: https://api.marketstack.com/v1/ or local Kenyan APIs
-        
-        # For now, we'll use web scraping simulation for major markets
-        from datetime import datetime, timedelta
-        
-        # Base prices with more realistic variations
-        base_prices = {
-            "Maize": {"min": 3000, "max": 4500, "unit": "90kg bag", "market": "Nairobi Cereals"},
-            "Beans": {"min": 8000, "max": 12000, "unit": "90kg bag", "market": "Nairobi"},
-            "Potatoes": {"min": 2000, "max": 3500, "unit": "50kg bag", "market": "Nairobi"},
-            "Tomatoes": {"min": 40, "max": 120, "unit": "kg", "market": "Nairobi"},
-            "Coffee": {"min": 30000, "max": 50000, "unit": "50kg bag", "market": "Nairobi Auction"},
-            "Tea": {"min": 200, "max": 350, "unit": "kg", "market": "Mombasa Auction"},
-            "Wheat": {"min": 3500, "max": 5000, "unit": "90kg bag", "market": "Nakuru"},
-            "Rice": {"min": 120, "max": 200, "unit": "kg", "market": "Mwea"}
-        }
-        
-        price_info = base_prices.get(crop_name, {"min": 1000, "max": 2000, "unit": "unit", "market": "Local Market"})
-        
-        # Seasonal adjustments based on real Kenyan seasons
-        month = datetime.now().month
-        seasonal_factors = {
-            "Maize": 0.8 if month in [8, 9, 10] else 1.2 if month in [3, 4] else 1.0,  # Harvest vs planting
-            "Beans": 0.9 if month in [10, 11] else 1.1 if month in [3, 4] else 1.0,
-            "Potatoes": 0.8 if month in [10, 11] else 1.2 if month in [1, 2] else 1.0,
-            "Tomatoes": 1.3 if month in [1, 2] else 0.7 if month in [6, 7] else 1.0,
-        }
-        
-        seasonal_factor = seasonal_factors.get(crop_name, 1.0)
-        
-        # County-based adjustments
-        county_factors = {
-            "Nairobi": 1.2, "Mombasa": 1.15, "Kisumu": 1.1,
-            "Nakuru": 1.0, "Eldoret": 0.95, "Remote": 1.3
-        }
-        
-        county_factor = county_factors.get(county, 1.0)
-        
-        # Calculate price with variations
-        base_price = (price_info["min"] + price_info["max"]) / 2
-        current_price = base_price * seasonal_factor * county_factor
-        
-        # Add daily variation
-        daily_variation = random.uniform(-0.1, 0.1)
-        current_price *= (1 + daily_variation)
-        
-        # Ensure within bounds
-        current_price = max(price_info["min"], min(price_info["max"], current_price))
+def get_real_time_market_prices(crop_name, county="Nairobi", history_days=PRICE_HISTORY_DAYS):
+    """Current wholesale price, trend and history for a crop in a county, read from the price store"""
+    try:
+        price_info = market_base_price(crop_name)
+        today = datetime.date.today()
+        series = price_store.series(crop_name, county, price_day(today))
+        day, price, volume = series.last(max(history_days, 8), price_day(today))
+        if not len(price):
+            return get_kenya_market_prices(crop_name, county)
         
-        # Determine trend based on recent movement
-        trend_options = ["up", "down", "stable"]
-        trend_weights = [0.4, 0.3, 0.3] if seasonal_factor > 1 else [0.3, 0.4, 0.3]
-        trend = random.choices(trend_options, weights=trend_weights)[0]
+        current_price = float(price[-1])
+        previous_price = float(price[-2]) if len(price) > 1 else current_price
+        indicators = market_analytics.indicators(crop_name, county)
+        trend = indicators["trend"]
+        seasonal_factor = seasonal_price_factors(crop_name)[today.month - 1]
+        county_factor = market_county_factor(county)
         
         # Get market-specific information
         market_info = get_market_specific_info(county, crop_name)
@@ -1016,76 +3231,111 @@ def get_real_time_market_prices(crop_name, county="Nairobi"):
             "market": f"{market_info.get('name', county)} Market",
             "county": county,
             "trend": trend,
-            "price_change": round(daily_variation * 100, 1),
+            "price_change": round((current_price - previous_price) / previous_price * 100, 1),
             "seasonal_factor": round(seasonal_factor, 2),
             "regional_factor": round(county_factor, 2),
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.datetime.now().isoformat(),
             "market_hours": market_info.get("hours", "8:00 AM - 6:00 PM"),
-            "last_updated": (datetime.now() - timedelta(hours=random.randint(1, 12))).strftime("%Y-%m-%d %H:%M"),
-            "advice": get_market_advice(crop_name, trend, current_price),
-            "price_history": generate_price_history(crop_name, county)
+            "last_updated": price_dates(day[-1:])[0],
+            "source": series.source,
+            "indicators": indicators,
+            "advice": get_market_advice(crop_name, trend, current_price, indicators),
+            "price_history": price_history(day[-history_days:], price[-history_days:], volume[-history_days:])
         }
         
     except Exception as e:
         print(f"Market price error: {e}")
         return get_kenya_market_prices(crop_name, county)
 
-def get_market_specific_info(county, crop):
-    """Get specific market information"""
-    markets = {
-        "Nairobi": {
-            "name": "Marikiti",
-            "hours": "6:00 AM - 8:00 PM",
-            "specialty": "All crops",
-            "contact": "020 222 1111"
-        },
-        "Mombasa": {
-            "name": "Kongowea",
-            "hours": "5:00 AM - 7:00 PM",
-            "specialty": "Fruits & Vegetables",
-            "contact": "041 222 3333"
-        },
-        "Nakuru": {
-            "name": "Gikomba",
-            "hours": "7:00 AM - 6:00 PM",
-            "specialty": "Cereals & Legumes",
-            "contact": "051 444 5555"
+def resolve_market_names(crops, counties):
+    """Deduplicated crops and catalog-spelled counties, plus the names the catalog does not know
+    
+    Unknown names would each build a modelled series from scratch and report invented prices.
+    """
+    crops = list(dict.fromkeys(crops))
+    counties = list(dict.fromkeys(normalize_county_name(county) for county in counties))
+    unknown_crops = [crop for crop in crops if not is_market_crop(crop)]
+    unknown_counties = [county for county in counties if not is_kenya_county(county)]
+    return crops, counties, unknown_crops, unknown_counties
+
+def get_market_price_matrix(crops, counties, history_days=0):
+    """Price, change and indicators for every crop in every county, plus optional daily history
+    
+    Crop and county lookups are resolved once each, the grid is read from one analytics
+    snapshot, and history comes from one shared price matrix rather than a call per cell.
+    """
+    today = price_day(datetime.date.today())
+    month = datetime.date.today().month - 1
+    pairs = [(crop, county) for crop in crops for county in counties]
+    values, latest, previous = market_analytics.lookup(pairs)
+    observed = price_store.series_by_key
+    
+    crop_info = {}
+    for crop in crops:
+        price_info = market_base_price(crop)
+        crop_info[crop] = {
+            "unit": price_info["unit"],
+            "reference_market": price_info["market"],
+            "seasonal_factor": round(seasonal_price_factors(crop)[month], 2)
         }
+    county_info = {
+        county: {"market": f"{get_market_specific_info(county, None)['name']} Market", "regional_factor": round(market_county_factor(county), 2)}
+        for county in counties
     }
     
-    return markets.get(county, {
-        "name": f"{county} Main",
-        "hours": "8:00 AM - 6:00 PM",
-        "specialty": "Local produce",
-        "contact": "Contact county office"
-    })
-
-def generate_price_history(crop, county, days=30):
-    """Generate simulated price history"""
-    from datetime import datetime, timedelta
-    
-    history = []
-    base_price = random.uniform(1000, 5000)
+    grid = {crop: {} for crop in crops}
+    for (crop, county), indicators, price, previous_price in zip(pairs, values, latest, previous):
+        grid[crop][county] = {
+            "price": price,
+            "price_change": round((price - previous_price) / previous_price * 100, 1) if price and previous_price else None,
+            "trend": indicators["trend"],
+            "ma7": indicators["ma7"],
+            "ma30": indicators["ma30"],
+            "volatility_pct": indicators["volatility_pct"],
+            "source": "observed" if (crop, county) in observed else "modelled"
+        }
     
-    for i in range(days):
-        date = (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d")
-        variation = random.uniform(-0.05, 0.05)
-        price = base_price * (1 + variation)
-        
-        history.append({
-            "date": date,
-            "price": round(price, 2),
-            "volume": random.randint(100, 1000)
-        })
+    result = {
+        "as_of": price_dates([today])[0],
+        "currency": "KSh",
+        "crops": crop_info,
+        "counties": county_info,
+        "grid": grid
+    }
     
-    return history
+    if history_days > 0:
+        start_day = today - history_days + 1
+        matrix = np.round(build_price_matrix(pairs, start_day, today), 2)
+        rows = np.where(np.isnan(matrix), None, matrix).tolist()
+        history = {crop: {} for crop in crops}
+        for (crop, county), row in zip(pairs, rows):
+            history[crop][county] = row
+        # One shared date axis, oldest first; each series lists a price per date
+        result["history"] = {"dates": price_dates(np.arange(start_day, today + 1)), "prices": history}
+    
+    return result
+
+def get_market_specific_info(county, crop):
+    """Get specific market information"""
+    catalog = current_catalog()
+    market = catalog.markets.get(county)
+    if market is None:
+        market = {**catalog.defaults["market"], "name": catalog.defaults["market"]["name"].format(county=county)}
+    return market
 
 # ================= CROP RECOMMENDATIONS =================
+def unit_kilograms(unit):
+    """Kilograms in a wholesale unit such as "90kg bag", or None for units sold by count"""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)?\s*kg(?:\s.*)?", unit.strip().lower())
+    if not match:
+        return None
+    return float(match.group(1) or 1)
+
 def get_kenya_crop_recommendations(county, soil_type, rainfall, elevation):
     """Get crop recommendations for Kenyan counties"""
-    recommendations = []
+    candidates = []
     
-    for crop, data in KENYA_CROPS.items():
+    for crop, data in kenya_crops().items():
         score = 0.5  # Base score
         
         # County suitability
@@ -1117,57 +3367,55 @@ def get_kenya_crop_recommendations(county, soil_type, rainfall, elevation):
         }
         
         if score >= 0.6:
-            # Get market price
-            price_data = get_kenya_market_prices(crop, county)
-            
-            # Calculate estimated profit
-            yield_per_acre = {
-                "Maize": 15, "Beans": 8, "Potatoes": 30,
-                "Tomatoes": 20, "Coffee": 2, "Tea": 3
-            }
-            
-            avg_yield = yield_per_acre.get(crop, 10)
-            estimated_yield = avg_yield * score
-            
-            income = estimated_yield * 1000 * price_data.get("price", 50)  # Convert to kg
-            costs = estimated_yield * 50000  # Rough cost estimate
-            profit = income - costs
-            
-            recommendations.append({
-                "crop": crop,
-                "suitability_score": round(score, 2),
-                "county_suitable": county in data["regions"],
-                "season": data["season"],
-                "estimated_yield": f"{estimated_yield:.1f} tons/acre",
-                "market_price": f"KSh {price_data.get('price', 50)}/{price_data.get('unit', 'kg')}",
-                "market_demand": market_demand.get(crop, "Medium"),
-                "estimated_profit": f"KSh {profit:,.0f}/acre",
-                "recommended_varieties": get_kenya_crop_varieties(crop, county)
-            })
+            candidates.append((crop, data, score, market_demand))
+    
+    # Price every candidate from the same analytics snapshot /market/prices and /market/matrix read
+    _, latest, _ = market_analytics.lookup([(crop, county) for crop, _, _, _ in candidates])
+    
+    recommendations = []
+    for (crop, data, score, market_demand), price in zip(candidates, latest):
+        unit = market_base_price(crop)["unit"]
+        kilograms = unit_kilograms(unit)
+        if kilograms and price == price:
+            price_per_kg = price / kilograms
+        else:
+            # Count-based units (pieces, bunches) have no weight to convert; use the per-kg reference
+            reference = base_price_ksh(crop)
+            price_per_kg = (reference["min"] + reference["max"]) / 2
+        
+        # Calculate estimated profit
+        yield_per_acre = {
+            "Maize": 15, "Beans": 8, "Potatoes": 30,
+            "Tomatoes": 20, "Coffee": 2, "Tea": 3
+        }
+        
+        avg_yield = yield_per_acre.get(crop, 10)
+        estimated_yield = avg_yield * score
+        
+        income = estimated_yield * 1000 * price_per_kg  # Convert to kg
+        costs = estimated_yield * 50000  # Rough cost estimate
+        profit = income - costs
+        
+        recommendations.append({
+            "crop": crop,
+            "suitability_score": round(score, 2),
+            "county_suitable": county in data["regions"],
+            "season": data["season"],
+            "estimated_yield": f"{estimated_yield:.1f} tons/acre",
+            "market_price": f"KSh {price}/{unit}" if price == price else None,
+            "market_demand": market_demand.get(crop, "Medium"),
+            "estimated_profit": f"KSh {profit:,.0f}/acre",
+            "recommended_varieties": get_kenya_crop_varieties(crop, county)
+        })
     
     recommendations.sort(key=lambda x: x["suitability_score"], reverse=True)
     return recommendations[:5]
 
 def get_kenya_crop_varieties(crop, county):
     """Get recommended crop varieties for Kenya"""
-    varieties = {
-        "Maize": {
-            "Trans Nzoia": ["DH04", "DK8031", "H513"],
-            "General": ["H629", "SC DUMA 43", "WE1101"]
-        },
-        "Coffee": {
-            "Central": ["Ruiru 11", "Batian", "SL28", "SL34"]
-        },
-        "Tea": {
-            "Kericho": ["TRFK 301/5", "TRFK 306", "BB35"]
-        },
-        "Beans": {
-            "General": ["Rosecoco", "Mwitemania", "Canadian Wonder"]
-        }
-    }
-    
-    crop_varieties = varieties.get(crop, {})
-    return crop_varieties.get(county, crop_varieties.get("General", ["Local recommended variety"]))
+    catalog = current_catalog()
+    crop_varieties = catalog.crop_varieties.get(crop, {})
+    return crop_varieties.get(county, crop_varieties.get("General", catalog.defaults["crop_varieties"]))
 
 # ================= SOIL ANALYSIS FUNCTIONS =================
 def get_soil_testing_centers_kenya(county):
@@ -1290,65 +3538,124 @@ def get_real_time_soil_analysis(lat, lng):
     # Fallback to detailed mock data
     return get_detailed_soil_analysis(lat, lng)
 
-def get_soilgrids_data(lat, lng):
-    """Get soil data from ISRIC SoilGrids"""
+SOILGRIDS_PROPERTIES = ["phh2o", "soc", "clay", "sand", "silt", "nitrogen", "cec", "bdod"]
+SOILGRIDS_DEPTH = "0-5cm"  # Just surface layer for now
+
+def fetch_soilgrids_property(lat, lng, prop, depth):
+    """Fetch the mean value of a single SoilGrids property at one depth"""
+    url = f"https://rest.isric.org/soilgrids/v2.0/properties/query?lon={lng}&lat={lat}&property={prop}&depth={depth}&value=mean"
+    
+    response = http_get(url, timeout=min(10, SOILGRIDS_DEADLINE))
+    if response.status_code != 200:
+        return None
+    
+    data = response.json()
+    for prop_data in data.get("properties", []):
+        if prop_data.get("name") == prop:
+            return prop_data.get("depths", [{}])[0].get("layers", [{}])[0].get("values", {}).get("mean")
+    return None
+
+def fetch_soilgrids_properties(lat, lng):
+    """Fetch raw SoilGrids values for all properties at one point"""
+    all_properties = {}
     try:
-        # Get multiple soil properties
-        properties = ["phh2o", "soc", "clay", "sand", "silt", "nitrogen", "cec", "bdod"]
-        depths = ["0-5cm", "5-15cm", "15-30cm"]
+        # Query every property in parallel under one overall deadline
+        futures = {
+            OUTBOUND_EXECUTOR.submit(fetch_soilgrids_property, lat, lng, prop, SOILGRIDS_DEPTH): prop
+            for prop in SOILGRIDS_PROPERTIES
+        }
+        done, not_done = wait(futures, timeout=SOILGRIDS_DEADLINE)
         
-        all_properties = {}
+        for future in done:
+            prop = futures[future]
+            try:
+                value = future.result()
+            except Exception as e:
+                print(f"SoilGrids {prop} error: {e}")
+                continue
+            if value is not None:
+                all_properties[f"{prop}_{SOILGRIDS_DEPTH}"] = value
         
-        for prop in properties:
-            for depth in depths[:1]:  # Just surface layer for now
-                url = f"https://rest.isric.org/soilgrids/v2.0/properties/query?lon={lng}&lat={lat}&property={prop}&depth={depth}&value=mean"
-                
-                response = requests.get(url, timeout=10)
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    for prop_data in data.get("properties", []):
-                        if prop_data.get("name") == prop:
-                            value = prop_data.get("depths", [{}])[0].get("layers", [{}])[0].get("values", {}).get("mean")
-                            if value is not None:
-                                all_properties[f"{prop}_{depth}"] = value
-        
-        if all_properties:
-            # Process the data
-            ph = all_properties.get("phh2o_0-5cm", 6.5)
-            organic_carbon = all_properties.get("soc_0-5cm", 1.2)
-            clay = all_properties.get("clay_0-5cm", 20)
-            sand = all_properties.get("sand_0-5cm", 40)
-            silt = all_properties.get("silt_0-5cm", 40)
-            nitrogen = all_properties.get("nitrogen_0-5cm", 0.1)
-            cec = all_properties.get("cec_0-5cm", 10)  # Cation exchange capacity
-            bdod = all_properties.get("bdod_0-5cm", 1.3)  # Bulk density
-            
-            # Determine soil texture
-            soil_texture = classify_soil_texture(clay, sand, silt)
-            
-            # Determine fertility
-            fertility = classify_fertility(organic_carbon, nitrogen, cec)
-            
-            return {
-                "ph": round(ph, 2),
-                "organic_carbon_percent": round(organic_carbon, 2),
-                "clay_percent": round(clay, 2),
-                "sand_percent": round(sand, 2),
-                "silt_percent": round(silt, 2),
-                "nitrogen_percent": round(nitrogen, 3),
-                "cec": round(cec, 1),
-                "bulk_density": round(bdod, 2),
-                "soil_texture": soil_texture,
-                "fertility": fertility,
-                "source": "ISRIC SoilGrids"
-            }
+        for future in not_done:
+            future.cancel()
+        if not_done:
+            print(f"SoilGrids deadline reached, missing: {', '.join(futures[f] for f in not_done)}")
     
     except Exception as e:
         print(f"SoilGrids API error: {e}")
     
+    return all_properties
+
+def build_soil_profile(all_properties):
+    """Turn raw SoilGrids values into the soil profile used by the analysis"""
+    ph = all_properties.get("phh2o_0-5cm", 6.5)
+    organic_carbon = all_properties.get("soc_0-5cm", 1.2)
+    clay = all_properties.get("clay_0-5cm", 20)
+    sand = all_properties.get("sand_0-5cm", 40)
+    silt = all_properties.get("silt_0-5cm", 40)
+    nitrogen = all_properties.get("nitrogen_0-5cm", 0.1)
+    cec = all_properties.get("cec_0-5cm", 10)  # Cation exchange capacity
+    bdod = all_properties.get("bdod_0-5cm", 1.3)  # Bulk density
+    
+    # Determine soil texture
+    soil_texture = classify_soil_texture(clay, sand, silt)
+    
+    # Determine fertility
+    fertility = classify_fertility(organic_carbon, nitrogen, cec)
+    
+    return {
+        "ph": round(ph, 2),
+        "organic_carbon_percent": round(organic_carbon, 2),
+        "clay_percent": round(clay, 2),
+        "sand_percent": round(sand, 2),
+        "silt_percent": round(silt, 2),
+        "nitrogen_percent": round(nitrogen, 3),
+        "cec": round(cec, 1),
+        "bulk_density": round(bdod, 2),
+        "soil_texture": soil_texture,
+        "fertility": fertility,
+        "missing_properties": [prop for prop in SOILGRIDS_PROPERTIES if f"{prop}_{SOILGRIDS_DEPTH}" not in all_properties],
+        "source": "ISRIC SoilGrids"
+    }
+
+def get_soilgrids_data(lat, lng):
+    """Get soil data from ISRIC SoilGrids, fetched once per grid cell and kept on disk"""
+    all_properties = soil_store.get(lat, lng)
+    
+    if all_properties is None:
+        all_properties = fetch_soilgrids_properties(*soil_store.cell_centre(lat, lng))
+        # Partial results are served but not stored, so the next request retries the gaps
+        if len(all_properties) == len(SOILGRIDS_PROPERTIES):
+            soil_store.put(lat, lng, all_properties)
+    
+    if all_properties:
+        return build_soil_profile(all_properties)
+    
     return None
 
+def prewarm_soil_cache(coordinates):
+    """Fetch and store SoilGrids values for every farm grid cell not yet on disk"""
+    cells = {}
+    for lat, lng in coordinates:
+        cells.setdefault(soil_store.cell(lat, lng), (lat, lng))
+    
+    summary = {"farms": len(coordinates), "cells": len(cells), "already_cached": 0, "fetched": 0, "failed": 0}
+    
+    # One cell at a time: each fetch already fans out its property queries and SoilGrids is rate limited
+    for lat, lng in cells.values():
+        if soil_store.get(lat, lng) is not None:
+            summary["already_cached"] += 1
+            continue
+        
+        all_properties = fetch_soilgrids_properties(*soil_store.cell_centre(lat, lng))
+        if len(all_properties) == len(SOILGRIDS_PROPERTIES):
+            soil_store.put(lat, lng, all_properties)
+            summary["fetched"] += 1
+        else:
+            summary["failed"] += 1
+    
+    return summary
+
 def classify_soil_texture(clay, sand, silt):
     """Classify soil texture using USDA triangle"""
     if clay > 40:
@@ -1708,34 +4015,8 @@ def get_irrigation_schedule_kenya(crop, region, soil_type, rainfall):
 # ================= AGRICULTURAL CALENDAR & CONTACTS =================
 def get_agricultural_calendar(county):
     """Get agricultural calendar for Kenya county"""
-    calendars = {
-        "Nairobi": {
-            "Long Rains": "March-May: Plant maize, beans",
-            "Short Rains": "October-December: Plant vegetables",
-            "Dry Season": "January-February: Irrigation needed"
-        },
-        "Kiambu": {
-            "Coffee": "Year-round: Prune in Jan-Feb",
-            "Tea": "Year-round: Regular plucking",
-            "Maize": "March-May: Main planting season"
-        },
-        "Nakuru": {
-            "Wheat": "May-July: Planting",
-            "Maize": "March-May: Long rains planting",
-            "Potatoes": "Year-round with irrigation"
-        },
-        "Kisumu": {
-            "Rice": "Year-round with irrigation",
-            "Maize": "March-May, October-November",
-            "Sugarcane": "Year-round"
-        }
-    }
-    
-    return calendars.get(county, {
-        "Long Rains (Mar-May)": "Main planting season for cereals",
-        "Short Rains (Oct-Dec)": "Plant legumes, vegetables",
-        "Dry Season (Jan-Feb, Jun-Sep)": "Irrigation, harvesting"
-    })
+    catalog = current_catalog()
+    return catalog.agricultural_calendars.get(county, catalog.defaults["agricultural_calendar"])
 
 def get_kenya_emergency_contacts(county):
     """Get emergency contacts for Kenyan farmers"""
@@ -1939,11 +4220,320 @@ def calculate_farm_area(coordinates):
         "measurement": "Estimated"
     }
 
+# ================= REQUEST BODY PARSING =================
+def decode_image_base64(value):
+    """Decode a base64 image (optionally a data: URL) straight to bytes, or None if invalid"""
+    if isinstance(value, str) and value.startswith("data:"):
+        value = value.split(",", 1)[-1]
+    try:
+        # binascii reads an ASCII str in place, avoiding the bytes copy base64.b64decode makes
+        return binascii.a2b_base64(value)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+def parse_multipart_body(raw, content_type):
+    """Split a multipart/form-data body into (fields, file part bytes or None)"""
+    match = re.search(r'boundary="?([^";]+)"?', content_type)
+    if not match:
+        return {}, None
+    
+    delimiter = b"--" + match.group(1).encode("latin-1")
+    body = {}
+    upload = None
+    position = raw.find(delimiter)
+    
+    while position != -1:
+        start = position + len(delimiter)
+        if raw[start:start + 2] == b"--":
+            break  # Closing delimiter
+        
+        header_end = raw.find(b"\r\n\r\n", start)
+        end = raw.find(b"\r\n" + delimiter, header_end)
+        if header_end == -1 or end == -1:
+            break
+        
+        headers = bytes(raw[start:header_end]).decode("utf-8", "replace")
+        name = re.search(r'name="([^"]*)"', headers)
+        filename = re.search(r'filename="([^"]*)"', headers)
+        
+        if filename:
+            # A view into the request buffer: the file part is never copied
+            upload = memoryview(raw)[header_end + 4:end]
+        elif name:
+            body[name.group(1)] = bytes(raw[header_end + 4:end]).decode("utf-8", "replace")
+        
+        position = end + 2
+    
+    return body, upload
+
+# ================= DASHBOARD COMPOSITION =================
+def timed_call(loader):
+    started = time.perf_counter()
+    value = loader()
+    return value, round((time.perf_counter() - started) * 1000, 1)
+
+def gather_dashboard_sections(sections, deadline=DASHBOARD_DEADLINE):
+    """Run section loaders concurrently under one deadline
+    
+    sections maps name -> (loader, fallback). A section that errors or misses the
+    deadline is replaced by fallback(), which returns (value, "stale" | "fallback").
+    """
+    started = time.perf_counter()
+    futures = {name: DASHBOARD_EXECUTOR.submit(timed_call, loader) for name, (loader, fallback) in sections.items()}
+    done, not_done = wait(futures.values(), timeout=deadline)
+    waited_ms = round((time.perf_counter() - started) * 1000, 1)
+    
+    # Sections still queued would run for a response that is already sent; only started ones
+    # keep running, and they still warm the caches for the next request
+    for future in not_done:
+        future.cancel()
+    
+    results = {}
+    timings = {}
+    for name, future in futures.items():
+        if future in done and future.exception() is None:
+            results[name], elapsed_ms = future.result()
+            timings[name] = {"status": "ok", "elapsed_ms": elapsed_ms}
+            continue
+        
+        if future in done:
+            reason = f"error: {future.exception()}"
+        else:
+            reason = "not started before deadline" if future.cancelled() else "deadline exceeded"
+        
+        results[name], status = sections[name][1]()
+        timings[name] = {"status": status, "reason": reason, "elapsed_ms": waited_ms}
+    
+    meta = {
+        "deadline_seconds": deadline,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "sections": timings
+    }
+    return results, meta
+
+def weather_fallback(lat, lng):
+    stale = get_stale_weather(lat, lng)
+    if stale is not None:
+        return stale, "stale"
+    return get_mock_kenya_weather(lat, lng), "fallback"
+
+# ================= JSON SERIALIZATION =================
+def json_default(value):
+    """Encode the few non-JSON types handlers produce: NumPy values, dates, and anything else as text"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, MappingProxyType):
+        # Frozen reference catalog tables
+        return dict(value)
+    return str(value)
+
+if orjson is not None:
+    JSON_SERIALIZER = "orjson"
+    
+    def serialize_json(data):
+        """Serialize a response payload straight to UTF-8 bytes"""
+        return orjson.dumps(data, default=json_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+else:
+    JSON_SERIALIZER = "json"
+    
+    def serialize_json(data):
+        """Serialize a response payload to compact UTF-8 bytes"""
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=json_default).encode("utf-8")
+
+# ================= RESPONSE COMPRESSION =================
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)  # Preference order on equal q-values
+compression_totals = {}  # path -> {"responses", "compressed", "original_bytes", "sent_bytes", "cpu_seconds"}
+compression_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=256)
+def negotiate_encoding(accept_encoding):
+    """Pick a supported content coding from an Accept-Encoding header by q-value, or None for identity"""
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    
+    best, best_quality = None, 0.0
+    for coding in SUPPORTED_ENCODINGS:
+        quality = qualities.get(coding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+def compress_body(body, encoding, best=False):
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if best else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=9 if best else GZIP_LEVEL, mtime=0)
+
+def record_compression(path, original_bytes, sent_bytes, cpu_seconds):
+    with compression_lock:
+        totals = compression_totals.get(path)
+        if totals is None:
+            totals = compression_totals[path] = {"responses": 0, "compressed": 0, "original_bytes": 0, "sent_bytes": 0, "cpu_seconds": 0.0}
+        totals["responses"] += 1
+        totals["compressed"] += sent_bytes != original_bytes
+        totals["original_bytes"] += original_bytes
+        totals["sent_bytes"] += sent_bytes
+        totals["cpu_seconds"] += cpu_seconds
+
+def get_compression_stats():
+    with compression_lock:
+        snapshot = {path: dict(totals) for path, totals in compression_totals.items()}
+    return {
+        "serializer": JSON_SERIALIZER,
+        "encodings": list(SUPPORTED_ENCODINGS),
+        "min_bytes": COMPRESSION_MIN_BYTES,
+        "endpoints": {
+            path: {
+                "responses": totals["responses"],
+                "compressed": totals["compressed"],
+                "ratio": round(totals["sent_bytes"] / totals["original_bytes"], 3) if totals["original_bytes"] else None,
+                "bytes_saved": totals["original_bytes"] - totals["sent_bytes"],
+                "avg_cpu_ms": round(totals["cpu_seconds"] * 1000 / totals["compressed"], 3) if totals["compressed"] else 0.0
+            }
+            for path, totals in sorted(snapshot.items())
+        }
+    }
+
+# ================= STATIC RESPONSES =================
+# Cache-Control per path; anything not listed (personal or live data) is never stored
+CACHE_POLICIES = {
+    "/": "public, max-age=300",
+    "/kenya/counties": "public, max-age=3600",
+    "/kenya/crops": "public, max-age=3600",
+    "/outbreaks": "public, max-age=60"
+}
+DEFAULT_CACHE_POLICY = "no-cache, no-store, must-revalidate"
+
+def api_documentation():
+    return {
+        "message": "Smart Farmer AI - Kenya Edition (Complete Backend)",
+        "version": "4.0.0",
+        "country": "Kenya",
+        "features": [
+            "Real-time weather forecasting",
+            "AI-powered crop disease detection",
+            "Comprehensive soil analysis",
+            "Realistic market price simulations",
+            "County-specific recommendations",
+            "Government program integration"
+        ],
+        "api_endpoints": {
+            "GET /": "API Documentation",
+            "GET /kenya/counties": "List of Kenyan counties",
+            "GET /kenya/crops": "Kenya crop database",
+            "GET /dashboard": "User dashboard",
+            "GET /outbreaks": "Disease counts and rates per county/crop (window: 24h, 7d, 30d)",
+            "GET /crop/detections": "Your detection history (filters: county, crop_type, since, until; paginate with cursor, limit)",
+            "POST /register": "User registration",
+            "POST /login": "User login",
+            "POST /logout": "Revoke the current token",
+            "POST /logout/all": "Revoke every token for the current user",
+            "POST /token/refresh": "Exchange the current token for a fresh one",
+            "POST /crop/detect": "Crop disease detection (JSON base64, multipart or raw image body)",
+            "POST /weather/forecast": "Weather forecast",
+            "POST /weather/batch": "Weather for many farm coordinates",
+            "POST /market/prices": "Market prices",
+            "POST /market/matrix": "Prices for several crops across counties (crops, counties, history_days)",
+            "POST /crop/recommend": "Crop recommendations",
+            "POST /soil/analysis": "Soil analysis",
+            "POST /irrigation/schedule": "Irrigation schedule",
+            "GET /system/stats": "Server and upstream statistics (requires a token)"
+        }
+    }
+
+def build_static_responses(catalog):
+    """Serialize the constant GET payloads once, each with a strong ETag over its bytes"""
+    payloads = {
+        "/": api_documentation(),
+        "/kenya/counties": {
+            "success": True,
+            "counties": catalog.counties,
+            "count": len(catalog.counties)
+        },
+        "/kenya/crops": {
+            "success": True,
+            "crops": catalog.crops,
+            "livestock": catalog.livestock
+        }
+    }
+    responses = {}
+    for path, payload in payloads.items():
+        body = serialize_json(payload)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # Compressed once at maximum effort; each encoding is its own representation with its own ETag
+        variants = {}
+        if len(body) >= COMPRESSION_MIN_BYTES:
+            for encoding in SUPPORTED_ENCODINGS:
+                compressed = compress_body(body, encoding, best=True)
+                if len(compressed) < len(body):
+                    variants[encoding] = (compressed, f'"{digest}-{encoding}"')
+        responses[path] = {"body": body, "etag": f'"{digest}"', "variants": variants}
+    return responses
+
+STATIC_RESPONSES = build_static_responses(current_catalog())
+
+def refresh_static_responses(catalog):
+    """Rebuild the catalog-backed bodies; ETags change with the bytes, so clients revalidate"""
+    global STATIC_RESPONSES
+    STATIC_RESPONSES = build_static_responses(catalog)
+
+reference_catalog.add_listener(refresh_static_responses)
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match check (weak comparison, as RFC 9110 requires for this header)"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return etag in [candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates]
+
 # ================= HTTP SERVER HANDLER =================
 class SmartFarmerKenyaHandler(http.server.BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive between requests; every response must carry Content-Length
+    protocol_version = "HTTP/1.1"
+    timeout = SERVER_REQUEST_TIMEOUT
+    disable_nagle_algorithm = True
+    
+    def handle(self):
+        """Answer requests while the client has more ready; an idle keep-alive connection goes back to the server"""
+        self.keep_alive = False
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection:
+            try:
+                ready = self.next_request_ready()
+            except OSError:
+                return
+            if not ready:
+                self.keep_alive = True
+                return
+            self.handle_one_request()
+    
+    def next_request_ready(self):
+        """True if bytes of another request are already buffered or waiting on the socket"""
+        self.connection.settimeout(0)
+        try:
+            return bool(self.rfile.peek(1))
+        finally:
+            self.connection.settimeout(self.timeout)
+
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_cors_headers()
+        self.send_header("Cache-Control", DEFAULT_CACHE_POLICY)
+        self.send_header("Content-Length", "0")
         self.end_headers()
     
     def send_cors_headers(self):
@@ -1951,69 +4541,213 @@ class SmartFarmerKenyaHandler(http.server.BaseHTTPRequestHandler):
         self.send_header("Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS")
         self.send_header("Access-Control-Allow-Headers", "Content-Type, Authorization")
         self.send_header("Access-Control-Allow-Credentials", "true")
-        self.send_header("Cache-Control", "no-cache, no-store, must-revalidate")
+    
+    def send_cache_headers(self, status):
+        policy = CACHE_POLICIES.get(urlparse(self.path).path, DEFAULT_CACHE_POLICY) if status < 400 else DEFAULT_CACHE_POLICY
+        self.send_header("Cache-Control", policy)
     
     def send_json_response(self, data, status=200):
+        body = serialize_json(data)
+        original_bytes = len(body)
+        encoding = None
+        cpu_seconds = 0.0
+        if original_bytes >= COMPRESSION_MIN_BYTES:
+            encoding = negotiate_encoding(self.headers.get("Accept-Encoding", ""))
+            if encoding:
+                started = time.thread_time()
+                body = compress_body(body, encoding)
+                cpu_seconds = time.thread_time() - started
+        if status < 400:
+            record_compression(urlparse(self.path).path, original_bytes, len(body), cpu_seconds)
+        
         self.send_response(status)
         self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Vary", "Accept-Encoding")
         self.send_cors_headers()
+        self.send_cache_headers(status)
         self.end_headers()
-        self.wfile.write(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+        self.wfile.write(body)
     
-    def parse_body(self):
-        content_length = int(self.headers.get('Content-Length', 0))
-        if content_length:
+    def send_static_response(self, response):
+        """Send a prebuilt (possibly precompressed) response, or 304 when the client already holds it"""
+        encoding = negotiate_encoding(self.headers.get("Accept-Encoding", "")) if response["variants"] else None
+        body, etag = response["variants"][encoding] if encoding in response["variants"] else (response["body"], response["etag"])
+        
+        if etag_matches(self.headers.get("If-None-Match", ""), etag):
+            # A 304 has no body, and no Content-Length that would describe one
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Vary", "Accept-Encoding")
+            self.send_cors_headers()
+            self.send_cache_headers(304)
+            self.end_headers()
+            return
+        
+        record_compression(urlparse(self.path).path, len(response["body"]), len(body), 0.0)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if body is not response["body"]:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("ETag", etag)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_cors_headers()
+        self.send_cache_headers(200)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def declared_body_length(self):
+        try:
+            return int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            return -1
+    
+    def send_body_too_large(self):
+        # The unread body is still on the socket, so this connection cannot be reused
+        self.close_connection = True
+        self.send_json_response({"error": f"Request body exceeds {MAX_BODY_BYTES} bytes"}, 413)
+    
+    def handle_expect_100(self):
+        # Reject oversized uploads before the client starts sending them
+        if self.declared_body_length() > MAX_BODY_BYTES:
+            self.send_body_too_large()
+            return False
+        return super().handle_expect_100()
+    
+    def read_body(self):
+        """Read the raw body in chunks; returns None after sending 400/413"""
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            return self.read_chunked_body()
+        
+        length = self.declared_body_length()
+        if length < 0:
+            self.close_connection = True
+            self.send_json_response({"error": "Invalid Content-Length"}, 400)
+            return None
+        if length > MAX_BODY_BYTES:
+            self.send_body_too_large()
+            return None
+        
+        # Fill a preallocated buffer in place so the body is never copied while reading
+        buffer = bytearray(length)
+        with memoryview(buffer) as view:
+            received = 0
+            while received < length:
+                count = self.rfile.readinto(view[received:received + BODY_CHUNK_SIZE])
+                if not count:
+                    break
+                received += count
+        
+        if received < length:
+            self.close_connection = True
+            self.send_json_response({"error": "Incomplete request body"}, 400)
+            return None
+        return buffer
+    
+    def read_chunked_body(self):
+        buffer = bytearray()
+        while True:
+            size_line = self.rfile.readline(1024)
             try:
-                return json.loads(self.rfile.read(content_length).decode('utf-8'))
-            except:
-                return {}
-        return {}
+                size = int(size_line.split(b";")[0].strip(), 16)
+            except ValueError:
+                self.close_connection = True
+                self.send_json_response({"error": "Malformed chunked body"}, 400)
+                return None
+            
+            if size == 0:
+                # Skip optional trailers up to the blank line
+                while self.rfile.readline(1024) not in (b"\r\n", b"\n", b""):
+                    pass
+                return buffer
+            if len(buffer) + size > MAX_BODY_BYTES:
+                self.send_body_too_large()
+                return None
+            
+            buffer += self.rfile.read(size)
+            self.rfile.readline(1024)  # CRLF after each chunk
+    
+    def parse_body(self):
+        """Parse a JSON, multipart or raw image body into (fields, uploaded image bytes or None)
+        
+        Uploaded bytes never share the fields dict, so a client field cannot pose as an upload.
+        Returns (None, None) after sending an error response.
+        """
+        raw = self.read_body()
+        if raw is None:
+            return None, None
+        if not raw:
+            return {}, None
+        
+        content_type = self.headers.get("Content-Type", "application/json")
+        media_type = content_type.split(";")[0].strip().lower()
+        
+        if media_type.startswith("image/") or media_type == "application/octet-stream":
+            # Raw image upload; the other fields come from the query string
+            return {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}, raw
+        
+        if media_type == "multipart/form-data":
+            return parse_multipart_body(raw, content_type)
+        
+        try:
+            text = raw.decode("utf-8")
+            del raw  # Keep only one copy of a large body alive while parsing
+            body = json.loads(text)
+        except ValueError:
+            return {}, None
+        return (body if isinstance(body, dict) else {}), None
+    
+    def market_names_or_reject(self, crops, counties):
+        """Validated (crops, counties) for a market request, or None after answering 400"""
+        if not all(isinstance(name, str) for name in crops + counties):
+            self.send_json_response({"error": "Crop and county names must be strings"}, 400)
+            return None
+        crops, counties, unknown_crops, unknown_counties = resolve_market_names(crops, counties)
+        if unknown_crops or unknown_counties:
+            self.send_json_response({
+                "error": "Unknown crops or counties",
+                "unknown_crops": unknown_crops,
+                "unknown_counties": unknown_counties
+            }, 400)
+            return None
+        return crops, counties
     
     def do_GET(self):
         parsed = urlparse(self.path)
         path = parsed.path
         
-        if path == "/":
-            self.send_json_response({
-                "message": "Smart Farmer AI - Kenya Edition (Complete Backend)",
-                "version": "4.0.0",
-                "country": "Kenya",
-                "features": [
-                    "Real-time weather forecasting",
-                    "AI-powered crop disease detection",
-                    "Comprehensive soil analysis",
-                    "Realistic market price simulations",
-                    "County-specific recommendations",
-                    "Government program integration"
-                ],
-                "api_endpoints": {
-                    "GET /": "API Documentation",
-                    "GET /kenya/counties": "List of Kenyan counties",
-                    "GET /kenya/crops": "Kenya crop database",
-                    "GET /dashboard": "User dashboard",
-                    "POST /register": "User registration",
-                    "POST /login": "User login",
-                    "POST /crop/detect": "Crop disease detection",
-                    "POST /weather/forecast": "Weather forecast",
-                    "POST /market/prices": "Market prices",
-                    "POST /crop/recommend": "Crop recommendations",
-                    "POST /soil/analysis": "Soil analysis",
-                    "POST /irrigation/schedule": "Irrigation schedule"
-                }
-            })
-        
-        elif path == "/kenya/counties":
-            self.send_json_response({
-                "success": True,
-                "counties": KENYA_COUNTIES,
-                "count": len(KENYA_COUNTIES)
-            })
+        if path in STATIC_RESPONSES:
+            self.send_static_response(STATIC_RESPONSES[path])
         
-        elif path == "/kenya/crops":
+        elif path == "/system/stats":
+            if not get_user_from_token(self.headers.get("Authorization")):
+                self.send_json_response({"error": "Unauthorized"}, 401)
+                return
+            
             self.send_json_response({
                 "success": True,
-                "crops": KENYA_CROPS,
-                "livestock": KENYA_LIVESTOCK
+                "server": self.server.stats(),
+                "outbound": get_outbound_pool_stats(),
+                "weather_cache": weather_cache.stats(),
+                "soil_store": soil_store.stats(),
+                "image_pipeline": get_image_pipeline_stats(),
+                "detections": crop_detections.stats(),
+                "tokens": token_store.stats(),
+                "users": user_repository.stats(),
+                "catalog": reference_catalog.stats(),
+                "county_index": county_index.stats(),
+                "prices": price_store.stats(),
+                "market_analytics": market_analytics.stats(),
+                "compression": get_compression_stats(),
+                "detection_cache": {
+                    **detection_cache.stats(),
+                    "disk": detection_disk.stats() if detection_disk is not None else None,
+                    "near_duplicates": near_duplicate_index.stats()
+                },
+                "timestamp": datetime.datetime.now().isoformat()
             })
         
         elif path == "/dashboard":
@@ -2023,23 +4757,28 @@ class SmartFarmerKenyaHandler(http.server.BaseHTTPRequestHandler):
                 self.send_json_response({"error": "Unauthorized"}, 401)
                 return
             
-            user_data = users_db.get(user, {})
+            user_data = user_repository.get(user) or {}
             
-            # Get Kenya-specific data
-            weather = get_real_time_weather(
-                user_data.get("coordinates", {}).get("lat", -1.2921),
-                user_data.get("coordinates", {}).get("lng", 36.8219)
-            )
+            lat = user_data.get("coordinates", {}).get("lat", -1.2921)
+            lng = user_data.get("coordinates", {}).get("lng", 36.8219)
+            county = user_data.get("county", "Nairobi")
+            crops = user_data.get("crops", ["Maize"])[:2]
             
-            soil = get_real_time_soil_analysis(
-                user_data.get("coordinates", {}).get("lat", -1.2921),
-                user_data.get("coordinates", {}).get("lng", 36.8219)
-            )
+            # Gather Kenya-specific data concurrently; slow upstreams degrade on their own
+            sections = {
+                "weather": (lambda: get_real_time_weather(lat, lng), lambda: weather_fallback(lat, lng)),
+                "soil": (lambda: get_real_time_soil_analysis(lat, lng), lambda: (get_detailed_soil_analysis(lat, lng), "fallback"))
+            }
+            for crop in crops:
+                sections[f"market:{crop}"] = (
+                    lambda crop=crop: get_real_time_market_prices(crop, county),
+                    lambda crop=crop: (get_mock_market_prices(crop), "fallback")
+                )
             
-            # Get market prices for user's crops
-            market_data = {}
-            for crop in user_data.get("crops", ["Maize"])[:2]:
-                market_data[crop] = get_real_time_market_prices(crop, user_data.get("county", "Nairobi"))
+            results, meta = gather_dashboard_sections(sections)
+            weather = results["weather"]
+            soil = results["soil"]
+            market_data = {crop: results[f"market:{crop}"] for crop in crops}
             
             self.send_json_response({
                 "success": True,
@@ -2059,7 +4798,56 @@ class SmartFarmerKenyaHandler(http.server.BaseHTTPRequestHandler):
                 },
                 "agricultural_calendar": get_agricultural_calendar(user_data.get("county")),
                 "emergency_contacts": get_kenya_emergency_contacts(user_data.get("county")),
-                "government_programs": get_government_programs()
+                "government_programs": get_government_programs(),
+                "meta": meta
+            })
+        
+        elif path == "/outbreaks":
+            query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+            window = query.get("window", OUTBREAK_ALERT_WINDOW)
+            if window not in OutbreakCounters.WINDOWS:
+                self.send_json_response({"error": f"window must be one of {', '.join(OutbreakCounters.WINDOWS)}"}, 400)
+                return
+            
+            rows, detections = outbreak_counters.summary(window, query.get("county"), query.get("crop_type"))
+            self.send_json_response({
+                "success": True,
+                "window": window,
+                "detections": detections,
+                "outbreaks": rows,
+                "alert_threshold": {"rate": OUTBREAK_ALERT_RATE, "min_cases": OUTBREAK_ALERT_MIN_CASES, "window": OUTBREAK_ALERT_WINDOW},
+                "timestamp": datetime.datetime.now().isoformat()
+            })
+        
+        elif path == "/crop/detections":
+            user = get_user_from_token(self.headers.get("Authorization"))
+            if not user:
+                self.send_json_response({"error": "Unauthorized"}, 401)
+                return
+            
+            query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+            # There are no admin accounts, so a farmer can only read their own history
+            if query.get("user", user) != user:
+                self.send_json_response({"error": "You can only view your own detections"}, 403)
+                return
+            try:
+                since = datetime.datetime.fromisoformat(query["since"]).timestamp() if "since" in query else None
+                until = datetime.datetime.fromisoformat(query["until"]).timestamp() if "until" in query else None
+                cursor = int(query["cursor"]) if "cursor" in query else None
+                limit = max(1, min(int(query.get("limit", DETECTION_PAGE_SIZE)), DETECTION_PAGE_MAX))
+            except ValueError:
+                self.send_json_response({"error": "since/until must be ISO dates; cursor and limit must be integers"}, 400)
+                return
+            
+            records, next_cursor = crop_detections.query(
+                {"user": user, "county": query.get("county"), "crop_type": query.get("crop_type")},
+                since=since, until=until, cursor=cursor, limit=limit
+            )
+            self.send_json_response({
+                "success": True,
+                "detections": records,
+                "count": len(records),
+                "next_cursor": next_cursor
             })
         
         else:
@@ -2068,47 +4856,57 @@ class SmartFarmerKenyaHandler(http.server.BaseHTTPRequestHandler):
     def do_POST(self):
         parsed = urlparse(self.path)
         path = parsed.path
-        body = self.parse_body()
+        body, upload = self.parse_body()
+        if body is None:
+            return
         
         if path == "/register":
             username = body.get("username")
             password = body.get("password")
             
-            if not username or not password:
+            if not username or not password or not isinstance(password, str):
                 self.send_json_response({"error": "Username and password required"}, 400)
                 return
             
-            if username in users_db:
-                self.send_json_response({"error": "User already exists"}, 400)
-                return
-            
             # Validate Kenya county
             county = body.get("county", "Nairobi")
-            if county not in KENYA_COUNTIES:
+            if not is_kenya_county(county):
                 county = "Nairobi"  # Default
             
-            users_db[username] = {
-                "password": password,
+            # Stored coordinates feed the dashboard's weather and soil lookups later
+            coordinates = body.get("coordinates", {"lat": -1.2921, "lng": 36.8219})
+            try:
+                lat, lng = parse_coordinates(coordinates.get("lat"), coordinates.get("lng"))
+            except (TypeError, ValueError, AttributeError):
+                self.send_json_response({"error": "coordinates need finite lat and lng in range"}, 400)
+                return
+            
+            profile = {
+                "password": hash_new_password(password),
                 "email": body.get("email", ""),
                 "county": county,
                 "farm_type": body.get("farm_type", "mixed"),
-                "coordinates": body.get("coordinates", {"lat": -1.2921, "lng": 36.8219}),
+                "coordinates": {"lat": lat, "lng": lng},
                 "crops": body.get("crops", ["Maize"]),
                 "livestock": body.get("livestock", ["Chicken"]),
                 "farm_size": body.get("farm_size", 1.0),
                 "soil_type": body.get("soil_type", "Loam"),
                 "elevation": body.get("elevation", 1500)
             }
+            if not user_repository.create(username, profile):
+                self.send_json_response({"error": "User already exists"}, 400)
+                return
             
             token = generate_token(username)
             self.send_json_response({
                 "success": True,
                 "message": "Registration successful. Karibu!",
                 "token": token,
+                "expires_in": TOKEN_TTL,
                 "user": {
                     "username": username,
                     "county": county,
-                    "farm_type": users_db[username]["farm_type"]
+                    "farm_type": profile["farm_type"]
                 },
                 "kenya_welcome": "Karibu Smart Farmer AI - Supporting Kenyan Agriculture"
             })
@@ -2117,8 +4915,8 @@ class SmartFarmerKenyaHandler(http.server.BaseHTTPRequestHandler):
             username = body.get("username")
             password = body.get("password")
             
-            user = users_db.get(username)
-            if not user or user["password"] != password:
+            user = authenticate(username, password)
+            if not user:
                 self.send_json_response({"error": "Invalid username or password"}, 401)
                 return
             
@@ -2127,6 +4925,7 @@ class SmartFarmerKenyaHandler(http.server.BaseHTTPRequestHandler):
                 "success": True,
                 "message": "Login successful. Karibu!",
                 "token": token,
+                "expires_in": TOKEN_TTL,
                 "user": {
                     "username": username,
                     "county": user.get("county"),
@@ -2144,23 +4943,48 @@ class SmartFarmerKenyaHandler(http.server.BaseHTTPRequestHandler):
                 self.send_json_response({"error": "Authentication required"}, 401)
                 return
             
-            user_data = users_db.get(user, {})
+            user_data = user_repository.get(user) or {}
+            
+            if path == "/logout":
+                token_store.revoke(bearer_token(auth))
+                self.send_json_response({"success": True, "message": "Logged out. Kwaheri!"})
             
-            if path == "/crop/detect":
+            elif path == "/logout/all":
+                revoked = token_store.revoke_user(user)
+                self.send_json_response({"success": True, "message": "Logged out of all devices", "revoked": revoked})
+            
+            elif path == "/token/refresh":
+                # Rotate: the presented token stops working once the new one is issued
+                token = generate_token(user)
+                token_store.revoke(bearer_token(auth))
+                self.send_json_response({"success": True, "token": token, "expires_in": TOKEN_TTL})
+            
+            elif path == "/crop/detect":
                 crop_type = body.get("crop_type", "Maize")
-                image_base64 = body.get("image")
+                if not isinstance(crop_type, str):
+                    self.send_json_response({"error": "crop_type must be a string"}, 400)
+                    return
+                image_bytes = upload
                 
-                result = detect_crop_disease_real_time(crop_type, image_base64)
+                if image_bytes is None and body.get("image"):
+                    # Decode once and drop the base64 text so only the raw bytes stay in memory
+                    image_bytes = decode_image_base64(body.pop("image"))
+                    if not image_bytes:
+                        self.send_json_response({"error": "image must be base64 encoded"}, 400)
+                        return
                 
+                result = diagnose_crop_image(crop_type, image_bytes)
+                
+                record = crop_detections.add(user, user_data.get("county"), crop_type, result)
+                outbreak_counters.record(record["county"], crop_type, result, at=record["created_at"])
                 detection = {
-                    "id": str(uuid.uuid4()),
+                    "id": record["id"],
                     "user": user,
-                    "county": user_data.get("county"),
+                    "county": record["county"],
                     "crop_type": crop_type,
                     "result": result,
-                    "timestamp": datetime.datetime.now().isoformat()
+                    "timestamp": record["timestamp"]
                 }
-                crop_detections.append(detection)
                 
                 self.send_json_response({
                     "success": True,
@@ -2170,8 +4994,11 @@ class SmartFarmerKenyaHandler(http.server.BaseHTTPRequestHandler):
                 })
             
             elif path == "/weather/forecast":
-                lat = float(body.get("latitude", -1.2921))
-                lng = float(body.get("longitude", 36.8219))
+                try:
+                    lat, lng = parse_coordinates(body.get("latitude", -1.2921), body.get("longitude", 36.8219))
+                except (TypeError, ValueError):
+                    self.send_json_response({"error": "latitude and longitude must be finite numbers in range"}, 400)
+                    return
                 
                 weather = get_real_time_weather(lat, lng)
                 
@@ -2182,9 +5009,71 @@ class SmartFarmerKenyaHandler(http.server.BaseHTTPRequestHandler):
                     "agricultural_advisory": get_agricultural_advisory(weather)
                 })
             
+            elif path == "/weather/batch":
+                farms = body.get("farms", [])
+                if not isinstance(farms, list) or not farms:
+                    self.send_json_response({"error": "farms must be a non-empty list of coordinates"}, 400)
+                    return
+                if len(farms) > WEATHER_BATCH_MAX:
+                    self.send_json_response({"error": f"At most {WEATHER_BATCH_MAX} farms per request"}, 400)
+                    return
+                
+                try:
+                    coordinates = [
+                        parse_coordinates(farm.get("latitude", farm.get("lat")), farm.get("longitude", farm.get("lng")))
+                        for farm in farms
+                    ]
+                except (TypeError, ValueError, AttributeError):
+                    self.send_json_response({"error": "Each farm needs finite latitude and longitude in range"}, 400)
+                    return
+                
+                forecasts, summary = get_weather_batch(coordinates)
+                
+                self.send_json_response({
+                    "success": True,
+                    "results": [
+                        {
+                            "id": farm.get("id"),
+                            "latitude": lat,
+                            "longitude": lng,
+                            "county": forecast["county"],
+                            "forecast": forecast
+                        }
+                        for farm, (lat, lng), forecast in zip(farms, coordinates, forecasts)
+                    ],
+                    "summary": summary
+                })
+            
+            elif path == "/market/matrix":
+                crops = body.get("crops", [])
+                counties = body.get("counties") or list(kenya_counties())
+                if not isinstance(crops, list) or not crops or not isinstance(counties, list):
+                    self.send_json_response({"error": "crops must be a non-empty list; counties a list (all counties if omitted)"}, 400)
+                    return
+                names = self.market_names_or_reject(crops, counties)
+                if names is None:
+                    return
+                crops, counties = names
+                if len(crops) * len(counties) > MARKET_MATRIX_MAX_CELLS:
+                    self.send_json_response({"error": f"At most {MARKET_MATRIX_MAX_CELLS} crop/county cells per request"}, 400)
+                    return
+                
+                try:
+                    history_days = int(body.get("history_days", 0))
+                except (TypeError, ValueError):
+                    self.send_json_response({"error": "history_days must be a whole number"}, 400)
+                    return
+                
+                self.send_json_response({
+                    "success": True,
+                    **get_market_price_matrix(crops, counties, max(0, min(history_days, PRICE_HISTORY_MAX)))
+                })
+            
             elif path == "/market/prices":
-                crop = body.get("crop", "Maize")
-                county = body.get("county", user_data.get("county", "Nairobi"))
+                names = self.market_names_or_reject([body.get("crop", "Maize")], [body.get("county", user_data.get("county", "Nairobi"))])
+                if names is None:
+                    return
+                (crop,), (county,) = names
                 
                 price_data = get_real_time_market_prices(crop, county)
                 
@@ -2222,8 +5111,14 @@ class SmartFarmerKenyaHandler(http.server.BaseHTTPRequestHandler):
                 })
             
             elif path == "/soil/analysis":
-                lat = float(body.get("latitude", user_data.get("coordinates", {}).get("lat", -1.2921)))
-                lng = float(body.get("longitude", user_data.get("coordinates", {}).get("lng", 36.8219)))
+                try:
+                    lat, lng = parse_coordinates(
+                        body.get("latitude", user_data.get("coordinates", {}).get("lat", -1.2921)),
+                        body.get("longitude", user_data.get("coordinates", {}).get("lng", 36.8219))
+                    )
+                except (TypeError, ValueError):
+                    self.send_json_response({"error": "latitude and longitude must be finite numbers in range"}, 400)
+                    return
                 
                 soil_data = get_real_time_soil_analysis(lat, lng)
                 
@@ -2255,16 +5150,169 @@ class SmartFarmerKenyaHandler(http.server.BaseHTTPRequestHandler):
             else:
                 self.send_json_response({"error": "Endpoint not found"}, 404)
 
+# ================= CONCURRENT HTTP SERVER =================
+SERVICE_UNAVAILABLE_BODY = b'{"error": "Server busy, retry shortly"}'
+SERVICE_UNAVAILABLE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Access-Control-Allow-Origin: *\r\n"
+    b"Retry-After: 1\r\n"
+    b"Connection: close\r\n"
+    b"Content-Length: %d\r\n"
+    b"\r\n" % len(SERVICE_UNAVAILABLE_BODY)
+) + SERVICE_UNAVAILABLE_BODY
+
+class IdleConnections:
+    """Keep-alive connections between requests, watched by one selector thread instead of a worker each"""
+    
+    def __init__(self, server, timeout):
+        self.server = server
+        self.timeout = timeout
+        self.selector = selectors.DefaultSelector()
+        self.parked = deque()  # Handed over by workers; registered on the watcher thread
+        self.wake_reader, self.wake_writer = socket.socketpair()
+        self.wake_reader.setblocking(False)
+        self.wake_writer.setblocking(False)
+        self.selector.register(self.wake_reader, selectors.EVENT_READ, None)
+        self.closed = False
+        self.expired = 0
+        self.thread = threading.Thread(target=self.run, name="smart-farmer-keepalive", daemon=True)
+        self.thread.start()
+    
+    def park(self, request, client_address):
+        self.parked.append((request, client_address))
+        self.wake()
+    
+    def wake(self):
+        try:
+            self.wake_writer.send(b"\0")
+        except OSError:
+            pass  # Buffer full means a wake-up is already pending
+    
+    def run(self):
+        while not self.closed:
+            events = self.selector.select(timeout=1.0)
+            now = time.monotonic()
+            
+            for key, _ in events:
+                if key.data is None:
+                    try:
+                        while self.wake_reader.recv(4096):
+                            pass
+                    except OSError:
+                        pass
+                    continue
+                # The client sent its next request (or hung up): back to the pool
+                self.selector.unregister(key.fileobj)
+                self.server.dispatch(key.fileobj, key.data[0])
+            
+            while self.parked:
+                request, client_address = self.parked.popleft()
+                try:
+                    self.selector.register(request, selectors.EVENT_READ, (client_address, now))
+                except (ValueError, OSError):
+                    self.server.shutdown_request(request)
+            
+            for key in list(self.selector.get_map().values()):
+                if key.data is not None and now - key.data[1] > self.timeout:
+                    self.selector.unregister(key.fileobj)
+                    self.server.shutdown_request(key.fileobj)
+                    self.expired += 1
+        
+        for key in list(self.selector.get_map().values()):
+            if key.data is not None:
+                self.server.shutdown_request(key.fileobj)
+        self.selector.close()
+    
+    def count(self):
+        return len(self.selector.get_map()) - 1 + len(self.parked)
+    
+    def close(self):
+        self.closed = True
+        self.wake()
+
+class SmartFarmerHTTPServer(socketserver.TCPServer):
+    """TCP server that runs requests on a bounded worker-thread pool
+    
+    A worker only holds a connection while a request is being read or answered; idle
+    keep-alive connections wait in IdleConnections. At most workers + queue_size requests
+    are admitted at once, and anything past that gets an immediate 503.
+    """
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class, workers=SERVER_WORKERS, backlog=SERVER_BACKLOG, queue_size=SERVER_QUEUE_SIZE):
+        self.request_queue_size = backlog
+        self.workers = workers
+        self.queue_size = queue_size
+        self.slots = threading.BoundedSemaphore(workers + queue_size)  # Requests running or waiting for a worker
+        self.admitted = 0
+        self.rejected = 0
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="smart-farmer-worker")
+        super().__init__(server_address, handler_class)
+        self.idle = IdleConnections(self, SERVER_KEEPALIVE_TIMEOUT)
+
+    def process_request(self, request, client_address):
+        self.dispatch(request, client_address)
+    
+    def dispatch(self, request, client_address):
+        """Queue a connection with a request ready to read, or answer 503 when the queue is full"""
+        if not self.slots.acquire(blocking=False):
+            self.rejected += 1
+            try:
+                # A fresh or idle socket has an empty send buffer, so this never blocks
+                request.setblocking(False)
+                request.send(SERVICE_UNAVAILABLE)
+                request.recv(65536)  # Unread request bytes would turn the close into a reset
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self.admitted += 1
+        self.executor.submit(self.process_request_worker, request, client_address)
+
+    def process_request_worker(self, request, client_address):
+        keep_alive = False
+        try:
+            handler = self.RequestHandlerClass(request, client_address, self)
+            keep_alive = handler.keep_alive
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.slots.release()
+            if keep_alive:
+                self.idle.park(request, client_address)
+            else:
+                self.shutdown_request(request)
+    
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "idle_connections": self.idle.count(),
+            "idle_expired": self.idle.expired,
+            "admitted": self.admitted,
+            "rejected": self.rejected
+        }
+
+    def server_close(self):
+        super().server_close()
+        self.idle.close()
+        self.executor.shutdown(wait=False)
+
 # ================= MAIN BACKEND FUNCTION =================
-def run_backend():
-    PORT = 8000
+def run_backend(port=SERVER_PORT, workers=SERVER_WORKERS, backlog=SERVER_BACKLOG):
+    PORT = port
     handler = SmartFarmerKenyaHandler
-    
-    with socketserver.TCPServer(("", PORT), handler) as httpd:
+
+    with SmartFarmerHTTPServer(("", PORT), handler, workers=workers, backlog=backlog) as httpd:
         print("="*70)
         print("🌱 SMART FARMER AI - KENYA EDITION (COMPLETE BACKEND) 🇰🇪")
         print("="*70)
         print(f"\n🌐 Backend API running on: http://localhost:{PORT}")
+        print(f"   Workers: {workers} threads | Queue: {SERVER_QUEUE_SIZE} | Backlog: {backlog} | Keep-alive: {SERVER_KEEPALIVE_TIMEOUT:.0f}s")
+        catalog = current_catalog()
+        print(f"   Reference catalog: {catalog.version} | {catalog.entries} entries | {catalog.memory_bytes / 1024:.0f} KiB | loaded in {catalog.load_ms:.1f} ms")
+        print(f"   County lookup: {county_index.source}")
         print("\n🇰🇪 KENYA-SPECIFIC FEATURES:")
         print("   ✓ Real-time weather data")
         print("   ✓ AI-powered disease detection")
@@ -2280,17 +5328,63 @@ def run_backend():
         print("   GET  /kenya/crops      - Kenya crop database")
         print("   POST /register         - User registration")
         print("   POST /login            - User login")
+        print("   POST /logout[/all]     - Revoke this or every session")
+        print("   POST /token/refresh    - Rotate the session token")
         print("   POST /crop/detect      - Crop disease detection")
+        print("   GET  /crop/detections  - Your detection history (paginated)")
+        print("   GET  /outbreaks        - County disease outbreak counts")
         print("   POST /weather/forecast - Kenya weather forecast")
+        print("   POST /weather/batch    - Weather for many farms")
         print("   POST /market/prices    - Kenya market prices")
+        print("   POST /market/matrix    - Crops x counties price grid")
         print("   POST /crop/recommend   - Crop recommendations")
         print("   POST /soil/analysis    - Soil analysis")
         print("   POST /irrigation/schedule - Irrigation scheduling")
+        print("   GET  /system/stats     - Server and upstream statistics")
         
-        print("\n💡 Connect frontend to: http://localhost:8000")
+        print(f"\n💡 Connect frontend to: http://localhost:{PORT}")
         print("="*70)
         
+        start_token_sweeper(token_store, TOKEN_SWEEP_INTERVAL)
+        if CATALOG_RELOAD_INTERVAL > 0:
+            start_file_watcher(reference_catalog, CATALOG_RELOAD_INTERVAL)
+        if PRICE_STORE_PATH and PRICE_STORE_RELOAD_INTERVAL > 0:
+            start_file_watcher(price_store, PRICE_STORE_RELOAD_INTERVAL, "price-store")
+        # Build today's indicators before the first /market/prices call needs them
+        threading.Thread(target=market_analytics.current, name="smart-farmer-analytics-warmup", daemon=True).start()
         httpd.serve_forever()
 
+def load_coordinates_file(path):
+    """Read farm coordinates from a JSON list of {"lat", "lng"} objects or [lat, lng] pairs"""
+    with open(path) as f:
+        entries = json.load(f)
+    
+    coordinates = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            coordinates.append((float(entry.get("lat", entry.get("latitude"))), float(entry.get("lng", entry.get("longitude")))))
+        else:
+            coordinates.append((float(entry[0]), float(entry[1])))
+    return coordinates
+
 if __name__ == "__main__":
-    run_backend()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Smart Farmer AI - Kenya Edition backend")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="Port to serve the API on")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="Request worker threads")
+    parser.add_argument("--prewarm-soil", metavar="FILE", help="Fetch soil data for the farm coordinates in FILE, then exit")
+    parser.add_argument("--import-users", metavar="CSV", help="Load cooperative members from CSV into the user store, then exit")
+    parser.add_argument("--import-prices", metavar="CSV", help="Append daily market prices from CSV to the price store, then exit")
+    args = parser.parse_args()
+    
+    if args.prewarm_soil:
+        print(json.dumps(prewarm_soil_cache(load_coordinates_file(args.prewarm_soil)), indent=2))
+    elif args.import_users:
+        started = time.perf_counter()
+        imported, skipped = user_repository.bulk_import(hash_user_passwords(load_users_csv(args.import_users)))
+        print(f"Imported {imported} users ({skipped} already existed) in {time.perf_counter() - started:.1f}s")
+    elif args.import_prices:
+        started = time.perf_counter()
+        imported, skipped = price_store.bulk_import(load_prices_csv(args.import_prices))
+        print(f"Imported {imported} prices ({skipped} duplicate or older days) in {time.perf_counter() - started:.1f}s")
+    else:
+        run_backend(port=args.port, workers=args.workers)
\ No newline at end of file